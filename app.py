@@ -1,8 +1,9 @@
 from dash import html, dcc
 from dash.dependencies import Input, Output
-from pages import page1, page2
+from pages import page1, page2, page3
 from callbacks.page1_callbacks import register_callbacks as register_page1_callbacks
 from callbacks.page2_callbacks import register_callbacks as register_page2_callbacks
+from callbacks.page3_callbacks import register_callbacks as register_page3_callbacks
 
 def configure_layout_and_routes(app):
     # Layout principal avec un menu de navigation
@@ -57,6 +58,7 @@ def configure_layout_and_routes(app):
                         children=[
                             dcc.Link('3D Mesh Visualizer', href='/', className='nav-link'),
                             dcc.Link('Colormap Builder', href='/page2', className='nav-link'),
+                            dcc.Link('Comparaison', href='/page3', className='nav-link'),
                         ],
                     ),
                 ],
@@ -77,10 +79,13 @@ def configure_layout_and_routes(app):
     @app.callback(Output('page-content', 'children'), Input('url', 'pathname'))
     def display_page(pathname):
         if pathname == '/page2':
-            return page2.layout
+            return page2.layout()
+        elif pathname == '/page3':
+            return page3.layout()
         else:  # Page par défaut
-            return page1.layout
+            return page1.layout()
 
     # Enregistrement des callbacks
     register_page1_callbacks(app)
     register_page2_callbacks(app)
+    register_page3_callbacks(app)
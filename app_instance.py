@@ -1,6 +1,19 @@
-from dash import Dash
+import os
+import diskcache
+from dash import Dash, DiskcacheManager
 import dash_bootstrap_components as dbc
+import metrics
+
+# Les callbacks longs (lecture des fichiers importés) s'exécutent dans des processus séparés,
+# leur progression et leur résultat transitent par ce cache disque
+JOBS_CACHE_DIRECTORY = os.environ.get('NEUROMESH_JOBS_DIR', './.jobs_cache')
+background_callback_manager = DiskcacheManager(diskcache.Cache(JOBS_CACHE_DIRECTORY))
+
 # Initialise une instance unique de l'application Dash
-app = Dash(__name__, suppress_callback_exceptions=True,external_stylesheets=[dbc.themes.BOOTSTRAP])
+app = Dash(__name__, suppress_callback_exceptions=True,external_stylesheets=[dbc.themes.BOOTSTRAP],
+           background_callback_manager=background_callback_manager)
 
 app.title = "Neuro Mesh"
+
+# Route /metrics et mesure des réponses (si NEUROMESH_METRICS=1)
+metrics.init_app(app.server)
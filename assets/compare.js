@@ -0,0 +1,159 @@
+// Page 3 : grille de comparaison assemblée dans le navigateur.
+// La géométrie du maillage commun (compare-geometry) et l'intensité de chaque panneau
+// (compare-panels) sont décodées une seule fois puis réutilisées par toutes les traces :
+// déplacer le slider ou changer de colormap ne renvoie aucun tableau.
+(function () {
+    var TYPED_ARRAYS = {
+        i1: Int8Array, u1: Uint8Array, i2: Int16Array, u2: Uint16Array,
+        i4: Int32Array, u4: Uint32Array, f4: Float32Array, f8: Float64Array,
+    };
+    var GEOMETRY_FIELDS = ['x', 'y', 'z', 'i', 'j', 'k'];
+    var LIGHTING = {ambient: 0.3, diffuse: 0.7, specular: 0.1, roughness: 0.8, fresnel: 0.5};
+
+    // Tableaux décodés par clé de contenu (géométrie et panneaux affichés)
+    var decoded = {};
+    // Dernière caméra synchronisée, pour ignorer l'événement produit par la synchronisation
+    var lastCamera = null;
+
+    function decode(spec) {
+        // Listes JSON (transport 'json') : utilisées telles quelles
+        if (!spec || !spec.bdata) {
+            return spec;
+        }
+        var binary = atob(spec.bdata);
+        var bytes = new Uint8Array(binary.length);
+        for (var i = 0; i < binary.length; i++) {
+            bytes[i] = binary.charCodeAt(i);
+        }
+        return new TYPED_ARRAYS[spec.dtype](bytes.buffer);
+    }
+
+    function cached(key, spec, used) {
+        used[key] = true;
+        if (!(key in decoded)) {
+            decoded[key] = decode(spec);
+        }
+        return decoded[key];
+    }
+
+    function linspace(start, stop, count) {
+        var values = [];
+        for (var i = 0; i < count; i++) {
+            values.push(start + (stop - start) * i / (count - 1));
+        }
+        return values;
+    }
+
+    function buildFigure(geometry, panels, order, range, colorscale, camera) {
+        var layout = {
+            uirevision: 'compare',
+            margin: {l: 0, r: 0, t: 10, b: 0},
+            showlegend: false,
+            annotations: [],
+        };
+        if (!geometry || !panels || !order || !order.length || !range) {
+            layout.xaxis = layout.yaxis = {visible: false};
+            return {data: [], layout: layout};
+        }
+
+        var used = {};
+        var shared = {};
+        GEOMETRY_FIELDS.forEach(function (name) {
+            shared[name] = cached(geometry.key + ':' + name, geometry[name], used);
+        });
+
+        var shown = order.filter(function (key) { return key in panels; });
+        var cols = Math.ceil(Math.sqrt(shown.length));
+        var rows = Math.ceil(shown.length / cols);
+        layout.height = 450 * rows;
+        var ticks = linspace(range[0], range[1], 6);
+
+        var data = shown.map(function (key, index) {
+            var panel = panels[key];
+            var scene = index ? 'scene' + (index + 1) : 'scene';
+            var col = index % cols;
+            var row = Math.floor(index / cols);
+            var domain = {x: [col / cols, (col + 1) / cols], y: [1 - (row + 1) / rows, 1 - row / rows]};
+            layout[scene] = {
+                domain: domain,
+                aspectmode: 'data',
+                xaxis: {visible: false}, yaxis: {visible: false}, zaxis: {visible: false},
+            };
+            // Caméra commune (synchronisée par syncCameras) : conservée quand la figure est reconstruite
+            if (camera) {
+                layout[scene].camera = camera;
+            }
+            layout.annotations.push({
+                text: panel.name, showarrow: false, xref: 'paper', yref: 'paper',
+                x: (domain.x[0] + domain.x[1]) / 2, y: domain.y[1], yanchor: 'top',
+            });
+            // Intensité éventuellement quantifiée : bornes exprimées dans l'espace des codes
+            var toCode = function (value) { return (value - panel.offset) / panel.scale; };
+            return Object.assign({
+                type: 'mesh3d',
+                scene: scene,
+                intensity: cached(key + ':' + geometry.key, panel.intensity, used),
+                intensitymode: 'vertex',
+                cmin: toCode(range[0]),
+                cmax: toCode(range[1]),
+                colorscale: colorscale,
+                showscale: index === 0,
+                colorbar: {
+                    title: {text: 'Scalars'}, thickness: 30, len: 0.9,
+                    tickvals: ticks.map(toCode),
+                    ticktext: ticks.map(function (t) { return t.toFixed(2); }),
+                },
+                flatshading: false,
+                lighting: LIGHTING,
+                lightposition: {x: 100, y: 200, z: 300},
+                hoverinfo: 'skip',
+            }, shared);
+        });
+
+        // Libérer les tableaux des panneaux retirés et des anciennes géométries
+        Object.keys(decoded).forEach(function (key) {
+            if (!used[key]) {
+                delete decoded[key];
+            }
+        });
+        return {data: data, layout: layout};
+    }
+
+    function syncCameras(relayoutData) {
+        var noUpdate = window.dash_clientside.no_update;
+        if (!relayoutData) {
+            return noUpdate;
+        }
+        var moved = Object.keys(relayoutData).filter(function (key) {
+            return /^scene\d*\.camera$/.test(key);
+        });
+        // Plusieurs caméras modifiées : événement produit par la synchronisation elle-même
+        if (moved.length !== 1) {
+            return noUpdate;
+        }
+        var camera = relayoutData[moved[0]];
+        var serialized = JSON.stringify(camera);
+        var graph = document.querySelector('#compare-graph .js-plotly-plot');
+        if (serialized === lastCamera || !graph) {
+            return noUpdate;
+        }
+        lastCamera = serialized;
+        var update = {};
+        Object.keys(graph.layout).forEach(function (key) {
+            if (/^scene\d*$/.test(key) && key + '.camera' !== moved[0]) {
+                update[key + '.camera'] = camera;
+            }
+        });
+        if (Object.keys(update).length) {
+            window.Plotly.relayout(graph, update);
+        }
+        return camera;
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        compare: {
+            build_figure: buildFigure,
+            sync_cameras: syncCameras,
+        },
+    });
+})();
@@ -0,0 +1,317 @@
+"""
+Rendu en lot, sans navigateur, de maillages texturés en images PNG/SVG (rapports de QC).
+
+Le manifeste JSON liste les rendus à produire ; chaque entrée reprend les options de la
+page 1 (colormap, plage, isolignes...) et une liste de vues de caméra :
+
+    {
+        "defaults": {"colormap": "Viridis", "views": ["left", "right"], "format": "png"},
+        "items": [
+            {"name": "sub-01", "mesh": "sub-01/lh.white.gii", "texture": "sub-01/lh.thickness.gii"},
+            {"mesh": "sub-02/lh.white.gii", "texture": "sub-02/lh.thickness.gii",
+             "colormap": "RdBu", "center_colormap_on_zero": true,
+             "views": ["top", {"eye": {"x": 1.2, "y": 1.2, "z": 0.6}}]}
+        ]
+    }
+
+Une liste d'entrées seule est aussi acceptée. Les chemins relatifs sont résolus depuis
+le répertoire du manifeste. Les images sont écrites dans `<sortie>/<name>_<vue>.<format>`.
+
+    python batch_render.py manifest.json -o qc_images -j 8
+
+Les entrées sont réparties sur un pool de processus ; chaque processus garde un serveur
+kaleido local ouvert et exporte toutes les vues d'une entrée en un seul appel. Une image
+dont les fichiers d'entrée et les options n'ont pas changé depuis le dernier rendu
+(voir INDEX_FILE) n'est pas recalculée.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import colormap_registry
+import fonctions as fct
+
+# Index des rendus déjà faits, dans le répertoire de sortie : {chemin de l'image: signature}
+INDEX_FILE = '.batch_render.json'
+
+# Vues prédéfinies (caméra Plotly) ; une vue peut aussi être un dict caméra complet
+CAMERA_VIEWS = {
+    'left': dict(eye=dict(x=-2, y=0, z=0), up=dict(x=0, y=0, z=1)),
+    'right': dict(eye=dict(x=2, y=0, z=0), up=dict(x=0, y=0, z=1)),
+    'front': dict(eye=dict(x=0, y=2, z=0), up=dict(x=0, y=0, z=1)),
+    'back': dict(eye=dict(x=0, y=-2, z=0), up=dict(x=0, y=0, z=1)),
+    'top': dict(eye=dict(x=0, y=0, z=2), up=dict(x=0, y=1, z=0)),
+    'bottom': dict(eye=dict(x=0, y=0, z=-2), up=dict(x=0, y=1, z=0)),
+}
+
+# Options d'une entrée du manifeste et leurs valeurs par défaut
+DEFAULT_OPTIONS = dict(
+    colormap='Viridis',
+    use_black_intervals=False,
+    center_colormap_on_zero=False,
+    show_contours=False,
+    contour_levels=None,
+    apply_to_faces=False,
+    face_reducer='max',
+    color_mode='intensity',
+    color_min=None,
+    color_max=None,
+    frame=0,
+    lod=0,
+    views=['left', 'right'],
+    format='png',
+    width=1000,
+    height=900,
+    scale=1,
+)
+
+# Maillage du dernier rendu de ce processus : les entrées d'un même sujet ou d'un
+# maillage gabarit commun ne le relisent pas
+_last_mesh = {}
+
+
+def load_manifest(path):
+    """
+    Lire le manifeste et retourner la liste des entrées complétées par les options par défaut.
+
+    :raises ValueError: Si une entrée n'a pas de maillage ou utilise une option inconnue.
+    """
+    with open(path, 'r') as file:
+        manifest = json.load(file)
+    if isinstance(manifest, list):
+        manifest = {'items': manifest}
+    base = os.path.dirname(os.path.abspath(path))
+    defaults = dict(DEFAULT_OPTIONS, **manifest.get('defaults', {}))
+
+    entries = []
+    for index, item in enumerate(manifest.get('items', [])):
+        entry = dict(defaults, **item)
+        unknown = set(entry) - set(DEFAULT_OPTIONS) - {'name', 'mesh', 'texture'}
+        if unknown:
+            raise ValueError(f"Entrée {index} : options inconnues {sorted(unknown)}")
+        if not entry.get('mesh'):
+            raise ValueError(f"Entrée {index} : maillage manquant")
+        for key in ('mesh', 'texture'):
+            if entry.get(key):
+                entry[key] = os.path.join(base, entry[key])
+        if not entry.get('name'):
+            source = entry.get('texture') or entry['mesh']
+            entry['name'] = os.path.basename(source).split('.')[0]
+        entries.append(entry)
+    return entries
+
+
+def view_name(view, index):
+    """Nom de fichier d'une vue : son nom prédéfini ou 'view<index>'."""
+    return view if isinstance(view, str) else f'view{index}'
+
+
+def plan_outputs(entry, output_directory):
+    """Retourne [(vue, chemin de l'image)] pour une entrée."""
+    return [
+        (view, os.path.join(output_directory, f"{entry['name']}_{view_name(view, i)}.{entry['format']}"))
+        for i, view in enumerate(entry['views'])
+    ]
+
+
+def entry_signature(entry):
+    """
+    Signature des fichiers d'entrée (taille, date de modification), des options d'une entrée
+    et du contenu de sa colormap (une colormap personnalisée peut changer sous le même nom).
+
+    Une image n'est recalculée que si la signature enregistrée à son dernier rendu diffère.
+    """
+    stamps = {}
+    for key in ('mesh', 'texture'):
+        if entry.get(key):
+            stat = os.stat(entry[key])
+            stamps[key] = [stat.st_size, stat.st_mtime_ns]
+    try:
+        colorscale = colormap_registry.get_registry().compile(
+            entry['colormap'], entry['use_black_intervals'])['colorscale']
+    except Exception:
+        # Colormap inconnue : le rendu de l'entrée échouera et sera signalé
+        colorscale = None
+    payload = json.dumps([entry, stamps, colorscale], sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def render_entry(entry, outputs):
+    """
+    Rendre les vues d'une entrée (exécuté dans un processus du pool).
+
+    :param entry: Entrée du manifeste (voir load_manifest).
+    :param outputs: Liste [(vue, chemin)] des images à écrire.
+    :return: Nombre d'images écrites.
+    """
+    import plotly.io as pio
+
+    mesh = _last_mesh.get(entry['mesh'])
+    if mesh is None:
+        mesh = fct.load_mesh(entry['mesh'])
+        _last_mesh.clear()
+        _last_mesh[entry['mesh']] = mesh
+    vertices, faces = np.asarray(mesh.vertices), np.asarray(mesh.faces)
+
+    scalars = None
+    if entry.get('texture'):
+        if entry['frame']:
+            frames = fct.read_gii_frames(entry['texture'])
+            scalars = None if frames is None else frames[entry['frame']]
+        else:
+            scalars = fct.read_gii_file(entry['texture'])
+        if scalars is None:
+            raise ValueError(f"Texture illisible : {entry['texture']}")
+        if len(scalars) != len(vertices):
+            raise ValueError(f"La texture ({len(scalars)} valeurs) ne correspond pas au maillage "
+                             f"({len(vertices)} sommets)")
+
+    color_min, color_max = entry['color_min'], entry['color_max']
+    if scalars is not None:
+        color_min = float(np.nanmin(scalars)) if color_min is None else color_min
+        color_max = float(np.nanmax(scalars)) if color_max is None else color_max
+
+    lod_pyramid = None
+    if entry['lod']:
+        lod_pyramid = fct.get_lod_pyramid(vertices, faces, mesh.metadata.get('content_hash'))
+
+    registry = colormap_registry.get_registry()
+    fig = fct.plot_mesh_with_colorbar(
+        vertices, faces, scalars,
+        color_min=color_min,
+        color_max=color_max,
+        show_contours=entry['show_contours'],
+        contour_levels=entry['contour_levels'],
+        colormap=entry['colormap'],
+        use_black_intervals=entry['use_black_intervals'],
+        center_colormap_on_zero=entry['center_colormap_on_zero'],
+        local_colormaps=registry.colormaps(),
+        lut=registry.compile(entry['colormap'], entry['use_black_intervals']),
+        apply_to_faces=entry['apply_to_faces'],
+        face_reducer=entry['face_reducer'],
+        color_mode=entry['color_mode'],
+        lod_pyramid=lod_pyramid,
+        lod=entry['lod'],
+        hover_mode='none',
+    )
+
+    figures = []
+    for view, _ in outputs:
+        camera = CAMERA_VIEWS[view] if isinstance(view, str) else view
+        fig.update_layout(scene_camera=camera)
+        figures.append(fig.to_dict())
+    pio.write_images(
+        figures,
+        [path for _, path in outputs],
+        format=entry['format'],
+        width=entry['width'],
+        height=entry['height'],
+        scale=entry['scale'],
+    )
+    return len(outputs)
+
+
+def _start_worker():
+    """Initialisation d'un processus du pool : serveur kaleido réutilisé par tous ses rendus."""
+    try:
+        import kaleido
+        kaleido.start_sync_server(silence_warnings=True)
+    except (ImportError, AttributeError):
+        # kaleido < 1.1 : chaque export démarre son propre navigateur
+        pass
+
+
+def read_index(output_directory):
+    try:
+        with open(os.path.join(output_directory, INDEX_FILE), 'r') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def write_index(output_directory, index):
+    path = os.path.join(output_directory, INDEX_FILE)
+    with open(path + '.tmp', 'w') as file:
+        json.dump(index, file, indent=1, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def run(entries, output_directory, jobs=None, force=False):
+    """
+    Rendre toutes les entrées en parallèle et afficher la progression et le débit.
+
+    :param entries: Entrées du manifeste (voir load_manifest).
+    :param output_directory: Répertoire des images.
+    :param jobs: Nombre de processus (tous les cœurs si None).
+    :param force: Recalculer aussi les images à jour.
+    :return: Tuple (images écrites, images à jour ignorées, entrées en échec).
+    """
+    os.makedirs(output_directory, exist_ok=True)
+    index = {} if force else read_index(output_directory)
+
+    # Seules les images absentes ou dont la signature a changé sont rendues
+    pending, skipped = [], 0
+    for entry in entries:
+        signature = entry_signature(entry)
+        outputs = [
+            (view, path) for view, path in plan_outputs(entry, output_directory)
+            if index.get(path) != signature or not os.path.exists(path)
+        ]
+        skipped += len(entry['views']) - len(outputs)
+        if outputs:
+            pending.append((entry, outputs, signature))
+    print(f"{len(pending)} entrées à rendre, {skipped} images déjà à jour.")
+
+    written, failed = 0, []
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_start_worker) as executor:
+            futures = {
+                executor.submit(render_entry, entry, outputs): (entry, outputs, signature)
+                for entry, outputs, signature in pending
+            }
+            for done, future in enumerate(as_completed(futures), 1):
+                entry, outputs, signature = futures[future]
+                try:
+                    written += future.result()
+                except Exception as e:
+                    failed.append(entry['name'])
+                    print(f"[{done}/{len(pending)}] {entry['name']} : échec ({e})", file=sys.stderr)
+                    continue
+                for _, path in outputs:
+                    index[path] = signature
+                elapsed = time.perf_counter() - start
+                print(f"[{done}/{len(pending)}] {entry['name']} : {len(outputs)} images "
+                      f"({written / elapsed:.2f} images/s)")
+    finally:
+        write_index(output_directory, index)
+
+    elapsed = time.perf_counter() - start
+    rate = written / elapsed if elapsed > 0 else 0.0
+    print(f"{written} images en {elapsed:.1f} s ({rate:.2f} images/s), "
+          f"{skipped} à jour, {len(failed)} entrées en échec.")
+    return written, skipped, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rendu en lot de maillages texturés en images.")
+    parser.add_argument('manifest', help="Manifeste JSON des rendus (voir la documentation du module).")
+    parser.add_argument('-o', '--output', default='./renders', help="Répertoire des images.")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="Nombre de processus (par défaut : tous les cœurs).")
+    parser.add_argument('--force', action='store_true', help="Recalculer aussi les images à jour.")
+    args = parser.parse_args(argv)
+
+    entries = load_manifest(args.manifest)
+    _, _, failed = run(entries, args.output, args.jobs, args.force)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
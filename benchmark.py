@@ -0,0 +1,257 @@
+"""
+Mesures de performance : lecture, construction de la figure et taille des données envoyées.
+
+Des icosphères synthétiques (10 242 à 2 621 442 sommets selon les subdivisions) et leurs
+textures sont écrites en GIfTI dans un répertoire temporaire, puis on mesure :
+
+- load_mesh et read_gii_file, sans cache, à la création du cache et depuis le cache ;
+- plot_mesh_with_colorbar, scalars sur les sommets ou sur les faces, pour chaque type de
+  colormap (Plotly, traits noirs, personnalisée) et chaque mode de coloration ;
+- la sérialisation JSON de la figure (celle de Dash) et sa taille en octets.
+
+Chaque cas est chronométré `repeat` fois (minimum et médiane), puis rejoué une fois sous
+tracemalloc pour le pic de mémoire. Les résultats sont écrits en JSON ; `--compare` les
+confronte à un fichier précédent pour repérer les régressions :
+
+    python benchmark.py -o bench/avant.json
+    python benchmark.py -o bench/apres.json --compare bench/avant.json
+"""
+import argparse
+import base64
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+
+import numpy as np
+
+import fonctions as fct
+import mesh_cache
+
+DEFAULT_SUBDIVISIONS = (5, 6, 7, 8, 9)
+DEFAULT_REPEAT = 3
+
+# Colormap personnalisée (format des fichiers de ./custom_colormap)
+CUSTOM_COLORMAP = {
+    'data': [
+        {'min': 0.0, 'max': 0.25, 'color': '#2c7bb6'},
+        {'min': 0.25, 'max': 0.5, 'color': '#abd9e9'},
+        {'min': 0.5, 'max': 0.75, 'color': '#fdae61'},
+        {'min': 0.75, 'max': 1.0, 'color': '#d7191c'},
+    ],
+    'mincolormap': 0.0,
+    'maxcolormap': 1.0,
+}
+# Types de colormap : (nom, traits noirs, colormaps locales)
+COLORMAPS = {
+    'plotly': ('Viridis', False, None),
+    'stripes': ('Viridis', True, None),
+    'custom': ('bench_custom', False, {'bench_custom': CUSTOM_COLORMAP}),
+}
+
+
+def icosphere(subdivisions):
+    """Icosphère unité (sommets float32, faces int32) et texture lisse sur ses sommets."""
+    import trimesh
+
+    mesh = trimesh.creation.icosphere(subdivisions=subdivisions)
+    vertices = np.asarray(mesh.vertices, dtype=np.float32)
+    faces = np.asarray(mesh.faces, dtype=np.int32)
+    x, y, z = vertices.T
+    texture = (np.sin(3 * x) * np.cos(2 * y) + z ** 2).astype(np.float32)
+    return vertices, faces, texture
+
+
+def write_gifti(path, darrays):
+    """
+    Écrire un fichier GIfTI minimal (encodage GZipBase64Binary).
+
+    :param darrays: Liste de (intention, tableau) ; les tableaux sont écrits en RowMajorOrder.
+    """
+    types = {np.dtype(np.float32): 'NIFTI_TYPE_FLOAT32', np.dtype(np.int32): 'NIFTI_TYPE_INT32'}
+    with open(path, 'w') as file:
+        file.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                   f'<GIFTI Version="1.0" NumberOfDataArrays="{len(darrays)}">\n<MetaData/>\n')
+        for intent, array in darrays:
+            array = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder('<'))
+            dims = ' '.join(f'Dim{i}="{n}"' for i, n in enumerate(array.shape))
+            data = base64.b64encode(zlib.compress(array.tobytes(), 1)).decode('ascii')
+            file.write(f'<DataArray Intent="{intent}" DataType="{types[array.dtype.newbyteorder("=")]}" '
+                       f'ArrayIndexingOrder="RowMajorOrder" Dimensionality="{array.ndim}" {dims} '
+                       f'Encoding="GZipBase64Binary" Endian="LittleEndian" ExternalFileName="" '
+                       f'ExternalFileOffset="">\n<MetaData/>\n<Data>{data}</Data>\n</DataArray>\n')
+        file.write('</GIFTI>\n')
+
+
+def measure(function, repeat=DEFAULT_REPEAT, setup=None):
+    """
+    Chronométrer `function` puis mesurer son pic de mémoire.
+
+    :param setup: Fonction appelée avant chaque exécution, hors chronométrage (ex. vider un cache).
+    :return: Tuple (résultat du dernier appel, dict des mesures).
+    """
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+        del result
+    if setup is not None:
+        setup()
+    tracemalloc.start()
+    try:
+        result = function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, dict(min_s=min(times), median_s=statistics.median(times), peak_bytes=peak)
+
+
+def serialize_figure(fig):
+    """Sérialiser une figure comme Dash le fait pour la réponse d'un callback."""
+    import plotly.io as pio
+
+    return pio.json.to_json_plotly(fig.to_plotly_json())
+
+
+def benchmark_scale(subdivisions, directory, repeat, transport, log):
+    """Mesurer tous les cas pour une icosphère ; retourne la liste des résultats."""
+    vertices, faces, texture = icosphere(subdivisions)
+    label = f"{len(vertices)} sommets"
+    mesh_path = os.path.join(directory, f'ico{subdivisions}.surf.gii')
+    texture_path = os.path.join(directory, f'ico{subdivisions}.func.gii')
+    write_gifti(mesh_path, [('NIFTI_INTENT_POINTSET', vertices), ('NIFTI_INTENT_TRIANGLE', faces)])
+    write_gifti(texture_path, [('NIFTI_INTENT_NONE', texture)])
+    cache = mesh_cache.get_cache()
+
+    def clear_cache():
+        for key in (cache.key_for(mesh_path), cache.key_for(texture_path)):
+            for kind in ('mesh', 'frames'):
+                shutil.rmtree(cache.entry_path(key, kind), ignore_errors=True)
+
+    results = []
+
+    def record(case, stats, **extra):
+        entry = dict(case=case, subdivisions=subdivisions, vertices=len(vertices), faces=len(faces),
+                     **stats, **extra)
+        results.append(entry)
+        log(f"{label:>16} | {case:<40} | {stats['min_s'] * 1e3:9.1f} ms | "
+            f"{stats['peak_bytes'] / 2 ** 20:8.1f} Mo" +
+            (f" | {extra['payload_bytes'] / 2 ** 20:7.2f} Mo envoyés" if 'payload_bytes' in extra else ''))
+
+    for name, reader, path in (('load_mesh', fct.load_mesh, mesh_path),
+                               ('read_gii_file', fct.read_gii_file, texture_path)):
+        _, stats = measure(lambda: reader(path, use_cache=False), repeat)
+        record(f'{name}/sans cache', stats)
+        _, stats = measure(lambda: reader(path), repeat, setup=clear_cache)
+        record(f'{name}/écriture du cache', stats)
+        _, stats = measure(lambda: reader(path), repeat)
+        record(f'{name}/depuis le cache', stats)
+
+    for apply_to_faces in (False, True):
+        for colormap_type, (colormap, stripes, local_colormaps) in COLORMAPS.items():
+            for color_mode in fct.COLOR_MODES:
+                case = f"figure/{'faces' if apply_to_faces else 'sommets'}/{colormap_type}/{color_mode}"
+                fig, stats = measure(lambda: fct.plot_mesh_with_colorbar(
+                    vertices, faces, texture,
+                    colormap=colormap,
+                    use_black_intervals=stripes,
+                    local_colormaps=local_colormaps,
+                    apply_to_faces=apply_to_faces,
+                    color_mode=color_mode,
+                    transport=transport,
+                ), repeat)
+                record(case, stats)
+                payload, stats = measure(lambda: serialize_figure(fig), repeat)
+                record(case.replace('figure/', 'json/', 1), stats, payload_bytes=len(payload))
+    return results
+
+
+def environment():
+    """Versions et machine, pour ne comparer que des mesures comparables."""
+    import plotly
+
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return dict(
+        python=platform.python_version(),
+        numpy=np.__version__,
+        plotly=plotly.__version__,
+        machine=platform.machine(),
+        processor=platform.processor(),
+        cpu_count=os.cpu_count(),
+        commit=commit,
+        date=time.strftime('%Y-%m-%dT%H:%M:%S'),
+    )
+
+
+def compare(results, reference_path, threshold=1.25):
+    """
+    Afficher le rapport de temps (et de taille envoyée) de chaque cas par rapport à une référence.
+
+    :return: Liste des cas plus lents que `threshold` fois la référence.
+    """
+    with open(reference_path, 'r') as file:
+        reference = {(r['case'], r['vertices']): r for r in json.load(file)['results']}
+    regressions = []
+    print(f"\nComparaison avec {reference_path} (temps minimal, nouveau / référence) :")
+    for result in results:
+        previous = reference.get((result['case'], result['vertices']))
+        if previous is None:
+            continue
+        ratio = result['min_s'] / previous['min_s'] if previous['min_s'] else float('inf')
+        line = f"{result['vertices']:>9} | {result['case']:<40} | x{ratio:5.2f}"
+        if 'payload_bytes' in result and previous.get('payload_bytes'):
+            line += f" | taille x{result['payload_bytes'] / previous['payload_bytes']:5.2f}"
+        if ratio > threshold:
+            line += '  <-- plus lent'
+            regressions.append(result['case'])
+        print(line)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mesures de performance sur des icosphères synthétiques.")
+    parser.add_argument('-o', '--output', default='./benchmark_results.json', help="Fichier JSON des résultats.")
+    parser.add_argument('-s', '--subdivisions', type=int, nargs='+', default=list(DEFAULT_SUBDIVISIONS),
+                        help="Subdivisions des icosphères (5 : 10 242 sommets, 9 : 2 621 442 sommets).")
+    parser.add_argument('-r', '--repeat', type=int, default=DEFAULT_REPEAT, help="Répétitions par cas.")
+    parser.add_argument('-t', '--transport', default=fct.DEFAULT_TRANSPORT,
+                        choices=list(fct.TRANSPORT_PRESETS), help="Encodage des tableaux (voir fct.TRANSPORT_PRESETS).")
+    parser.add_argument('--compare', help="Résultats précédents à comparer.")
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help="Rapport de temps au-delà duquel un cas est signalé comme régression.")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix='neuromesh-bench-') as directory:
+        # Cache des maillages isolé, pour ne pas polluer (ni profiter de) celui de l'application
+        mesh_cache._default_cache = mesh_cache.MeshCache(os.path.join(directory, 'cache'))
+        for subdivisions in args.subdivisions:
+            results += benchmark_scale(subdivisions, directory, args.repeat, args.transport, print)
+
+    output = dict(environment=environment(), transport=args.transport, repeat=args.repeat, results=results)
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as file:
+        json.dump(output, file, indent=1)
+    print(f"\nRésultats écrits dans {args.output}")
+
+    if args.compare:
+        return 1 if compare(results, args.compare, args.threshold) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
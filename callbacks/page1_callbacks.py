@@ -1,27 +1,448 @@
 from dash.dependencies import Input, Output, State
 import dash_uploader as du
 import fonctions as fct
+import colormap_registry
+import metrics
+import session_store
+import surface_analysis
+import upload_store
 import numpy as np
 import os
-from dash import callback_context
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dash import callback_context, html, no_update, Patch
 
 
-# Charger les colormaps locales
-local_colormaps = fct.load_local_colormaps('./custom_colormap')
+DEFAULT_MESH_PATH = './data/mesh.gii'
 
-UPLOAD_DIRECTORY = "./uploaded_files/"
-if not os.path.exists(UPLOAD_DIRECTORY):
-    os.makedirs(UPLOAD_DIRECTORY)
+# Envoyer uniquement les propriétés modifiées (Patch) quand la géométrie ne change pas
+USE_PARTIAL_UPDATES = True
+
+# Encodage des tableaux envoyés au navigateur (voir fct.TRANSPORT_PRESETS)
+TRANSPORT = os.environ.get('NEUROMESH_TRANSPORT', fct.DEFAULT_TRANSPORT)
+
+# Niveau de détail utilisé pendant la lecture d'une série (voir fct.LOD_LEVELS)
+LOD_INTERACTION = len(fct.LOD_LEVELS) - 1
+
+# Options du lissage de la texture (voir smoothing_options)
+SMOOTHING_INPUTS = ('smoothing-method', 'smoothing-weights', 'smoothing-iterations', 'smoothing-fwhm')
+# Entrées qui ne modifient que la coloration du maillage
+STYLE_INPUTS = {
+    'range-slider', 'toggle-triangle', 'toggle-contours', 'toggle-black-intervals',
+    'colormap-dropdown', 'toggle-center-colormap', 'hover-mode', 'frame-slider', 'face-reducer',
+    'isoline-levels',
+} | set(SMOOTHING_INPUTS)
+# Propriétés à renvoyer à chaque mise à jour de style
+STYLE_KEYS = ('cmin', 'cmax', 'colorscale', 'colorbar')
+# Propriétés de survol (voir fct.compute_hover)
+HOVER_KEYS = ('hoverinfo', 'hovertext', 'customdata', 'hovertemplate')
+# Propriétés qui ne changent que si les scalars affichés changent (sommets <-> faces)
+INTENSITY_KEYS = ('intensity', 'intensitymode') + HOVER_KEYS
+# Propriétés à renvoyer à chaque mise à jour en mode 'vertexcolor' (voir fct.COLOR_MODES)
+COLOR_KEYS = ('vertexcolor', 'facecolor', 'colorbar_marker')
+# Trace des isolignes, à renvoyer seulement si elles changent (voir fct.isolines)
+ISOLINE_KEYS = ('isolines',)
+
+
+# Nombre de frames suivantes préparées à l'avance pendant la lecture d'une série
+FRAME_PREFETCH = 4
+_frame_executor = ThreadPoolExecutor(max_workers=2)
+_frame_styles = OrderedDict()  # (frame, options d'affichage) -> Future du style Mesh3d
+_frame_styles_lock = threading.Lock()
+# Factorisations de la distance géodésique (plusieurs secondes) : pool séparé, la lecture
+# d'une série n'attend pas derrière elles
+_geodesic_executor = ThreadPoolExecutor(max_workers=1)
+
+
+def get_frame_style(n_frames, frame_index, options_key, compute_style):
+    """
+    Retourne le style Mesh3d d'une frame et prépare en tâche de fond celui des suivantes.
+
+    :param n_frames: Nombre de frames de la texture.
+    :param frame_index: Frame à afficher.
+    :param options_key: Tuple hashable identifiant la texture et les options d'affichage.
+    :param compute_style: Fonction frame -> style (fct.compute_mesh_style).
+    """
+    with _frame_styles_lock:
+        for offset in range(FRAME_PREFETCH + 1):
+            frame = (frame_index + offset) % n_frames
+            key = (frame, options_key)
+            if key in _frame_styles:
+                _frame_styles.move_to_end(key)
+            else:
+                _frame_styles[key] = _frame_executor.submit(compute_style, frame)
+            if offset == 0:
+                # Gardé localement : l'entrée peut être évincée par une autre requête
+                future = _frame_styles[key]
+        while len(_frame_styles) > 4 * (FRAME_PREFETCH + 1):
+            _frame_styles.popitem(last=False)
+    return future.result()
+
+
+def build_style_patch(style, keys):
+    """Construire un Patch Dash ne modifiant que les propriétés `keys` du Mesh3d."""
+    patched_figure = Patch()
+    for key in keys:
+        if key == 'colorbar_marker':
+            # Barre de couleur portée par la trace auxiliaire du mode 'vertexcolor'
+            patched_figure['data'][fct.COLORBAR_TRACE]['marker'] = style[key]
+        elif key == 'isolines':
+            # Trace des isolignes remplacée en entier
+            patched_figure['data'][fct.ISOLINES_TRACE] = style[key]
+        else:
+            patched_figure['data'][0][key] = style[key]
+    return patched_figure
+
+
+def parse_levels(text):
+    """
+    Lire les niveaux d'isolignes saisis (ex. "0.5, 1, 2").
+
+    :return: Tuple trié des niveaux, ou None (niveaux automatiques) si rien n'est saisi.
+    :raises ValueError: Si une valeur n'est pas un nombre fini.
+    """
+    values = (text or '').replace(';', ' ').replace(',', ' ').split()
+    if not values:
+        return None
+    levels = np.unique(np.array(values, dtype=float))
+    if not np.isfinite(levels).all():
+        raise ValueError(f"Niveaux d'isolignes invalides : {text}")
+    return tuple(levels.tolist())
+
+
+def smoothing_options(method, weights, iterations, fwhm):
+    """
+    Paramètres du lissage de la texture (voir surface_analysis.smooth_scalars).
+
+    :return: Tuple (méthode, poids, itérations ou FWHM en mm), ou None sans lissage.
+    """
+    if method == 'iterative' and iterations and int(iterations) > 0:
+        return method, weights, int(iterations)
+    if method == 'heat' and fwhm and float(fwhm) > 0:
+        return method, weights, float(fwhm)
+    return None
+
+
+def slider_marks(value_min, value_max):
+    """Graduations du slider de plage (clés float natives, sérialisables en JSON)."""
+    return {float(i): f"{i:.2f}" for i in np.linspace(value_min, value_max, 5)}
+
+
+def cluster_table(clusters, max_rows=surface_analysis.MAX_DISPLAYED_CLUSTERS):
+    """Tableau des régions au-dessus du seuil (les plus grandes en premier)."""
+    if not clusters:
+        return "Aucune région au-dessus du seuil."
+    header = html.Tr([html.Th(title) for title in ("Région", "Sommets", "Aire", "Pic")])
+    rows = [
+        html.Tr([
+            html.Td(cluster['label'] + 1),
+            html.Td(cluster['vertices']),
+            html.Td(f"{cluster['area']:.2f}"),
+            html.Td(f"{cluster['peak']:.3f}"),
+        ])
+        for cluster in clusters[:max_rows]
+    ]
+    caption = f"{len(clusters)} région(s)"
+    if len(clusters) > max_rows:
+        caption += f", {max_rows} plus grandes affichées"
+    return [html.Div(caption), html.Table([header] + rows, style={"width": "100%"})]
+
+
+# État par session navigateur (maillage, texture, plage par défaut)
+store = session_store.create_store('page1')
+# Colormaps personnalisées (custom_colormap et page 2), relues quand leurs fichiers changent
+registry = colormap_registry.get_registry()
+
+
+# Champs d'état d'une session sans texture
+NO_TEXTURE = dict(frames=None, texture_key=None, stats=None, default_min=0.0, default_max=1.0)
+
+
+def mesh_state(path):
+    """Charger un maillage et retourner les champs d'état correspondants (texture réinitialisée)."""
+    mesh = fct.load_mesh(path)
+    return dict(
+        mesh_key=mesh.metadata.get('content_hash'),
+        vertices=mesh.vertices,
+        faces=mesh.faces,
+        **NO_TEXTURE,
+    )
+
+
+def get_session_state(session_id):
+    """
+    Retourne l'état de la session, avec le maillage par défaut pour une nouvelle session.
+
+    Un état incomplet (champ illisible, ex. pendant sa réécriture par un autre worker)
+    n'est jamais mélangé à d'autres données : sans maillage, la session repart du maillage
+    par défaut sans texture ; sans frames, la texture est retirée.
+    """
+    state = store.get(session_id)
+    if 'vertices' not in state or 'faces' not in state:
+        state = store.update(session_id, **mesh_state(DEFAULT_MESH_PATH))
+    elif state.get('texture_key') is not None and state.get('frames') is None:
+        state = store.update(session_id, **NO_TEXTURE)
+    return state
+
+
+def get_lod(state):
+    """Pyramide LOD du maillage de la session (construite une fois par maillage)."""
+    return fct.get_lod_pyramid(state['vertices'], state['faces'], state['mesh_key'])
+
+
+def scalars_key(state, frame_index, smoothing=None):
+    """Identifiant des scalars d'une frame sur le maillage de la session (cache des scalars affichés)."""
+    return state['mesh_key'], state.get('texture_key'), frame_index or 0, smoothing
+
+
+def current_scalars(state, frame_index, smoothing=None):
+    """
+    Scalars de la frame affichée, lissés selon `smoothing` (voir smoothing_options), ou None sans texture.
+
+    :raises ValueError: Si le lissage demandé est impossible sur ce maillage.
+    """
+    frames = state.get('frames')
+    if frames is None:
+        return None
+    frame_index = min(frame_index or 0, len(frames) - 1)
+    scalars = frames[frame_index]
+    if smoothing is None:
+        return scalars
+    return surface_analysis.smooth_scalars(
+        state['vertices'], state['faces'], scalars, *smoothing,
+        content_hash=state['mesh_key'], scalars_key=scalars_key(state, frame_index))
+
+
+def smoothed_scalars(state, frame_index, smoothing):
+    """
+    Scalars de la frame avec le lissage demandé, ou sans lissage s'il est impossible.
+
+    :return: Tuple (scalars, lissage appliqué, message d'erreur ou None).
+    """
+    try:
+        return current_scalars(state, frame_index, smoothing), smoothing, None
+    except ValueError as e:
+        return current_scalars(state, frame_index), None, f"{e} (texture non lissée)"
+
+
+def parse_upload(kind, file_name, upload_id, set_progress):
+    """
+    Lire un fichier importé et remplir le cache des maillages (exécuté en tâche de fond).
+
+    Le hash du contenu a été calculé pendant l'envoi (voir upload_store) : un fichier déjà
+    importé retrouve directement ses tableaux dans le cache, sans être relu. Le résultat est
+    petit (chemin et hash du contenu) : le callback d'affichage recharge ensuite les tableaux
+    depuis le cache en memory-map.
+
+    :param kind: 'mesh' ou 'texture'.
+    :param upload_id: Identifiant du composant d'import (reçu enregistré par upload_store).
+    :param set_progress: Fonction (étape, nombre d'étapes, message) fournie par Dash.
+    """
+    receipt = upload_store.get_store().receipt(upload_id, file_name)
+    if receipt is None:
+        return dict(kind=kind, name=file_name, error=f"Fichier importé introuvable : {file_name}.")
+    path = receipt['path']
+    job = dict(kind=kind, name=file_name, path=path, key=receipt['key'])
+    steps = 3
+    fct.mesh_cache.get_cache().remember(path, job['key'])
+
+    if kind == 'mesh':
+        set_progress((1, steps, f"Lecture du maillage {file_name}..."))
+        try:
+            mesh = fct.load_mesh(path)
+        except RuntimeError as e:
+            return dict(job, error=str(e))
+        set_progress((2, steps, "Construction des niveaux de détail..."))
+        fct.get_lod_pyramid(mesh.vertices, mesh.faces, job['key'])
+    else:
+        set_progress((1, steps, f"Lecture de la texture {file_name}..."))
+        frames = fct.read_gii_frames(path)
+        if frames is None:
+            return dict(job, error=f"Impossible de lire la texture {file_name}.")
+        set_progress((2, steps, "Calcul des statistiques de la texture..."))
+        fct.texture_stats(path, frames)
+    return job
 
 
 def register_callbacks(app):
-    global current_mesh, current_vertices, current_faces, current_scalars, default_min, default_max
-    current_mesh = fct.load_mesh('./data/mesh.gii')
-    current_vertices, current_faces = current_mesh.vertices, current_mesh.faces
-    current_scalars = None  # Pas de texture par défaut
-    default_min, default_max = 0, 1
+    du.configure_upload(app, upload_store.UPLOAD_DIRECTORY, use_upload_id=True,
+                        http_request_handler=upload_store.UploadHandler)
+
+    @app.callback(
+        Output('upload-job', 'data'),
+        [Input('upload-mesh', 'isCompleted'), Input('upload-texture', 'isCompleted')],
+        [
+            State('upload-mesh', 'fileNames'), State('upload-texture', 'fileNames'),
+            State('upload-mesh', 'upload_id'), State('upload-texture', 'upload_id'),
+        ],
+        background=True,
+        progress=[Output('job-progress', 'value'), Output('job-progress', 'max'), Output('job-status', 'children')],
+        running=[(Output('job-panel', 'style'), {"width": "100%", "marginTop": "10px"}, {"display": "none"})],
+        cancel=[Input('cancel-job-btn', 'n_clicks')],
+        prevent_initial_call=True,
+    )
+    def run_upload_job(set_progress, mesh_uploaded, texture_uploaded, mesh_files, texture_files,
+                       mesh_upload_id, texture_upload_id):
+        """Lire le fichier importé dans un processus séparé, sans bloquer les workers Dash."""
+        if callback_context.triggered_id == 'upload-mesh':
+            if mesh_uploaded and mesh_files:
+                return parse_upload('mesh', mesh_files[0], mesh_upload_id, set_progress)
+        elif texture_uploaded and texture_files:
+            return parse_upload('texture', texture_files[0], texture_upload_id, set_progress)
+        return no_update
+
+    @app.callback(
+        Output('lod-level', 'value'),
+        Input('full-resolution-btn', 'n_clicks'),
+        prevent_initial_call=True,
+    )
+    def show_full_resolution(n_clicks):
+        return 0
 
-    du.configure_upload(app, UPLOAD_DIRECTORY, use_upload_id=False)
+    @app.callback(
+        [
+            Output('play-interval', 'disabled'),
+            Output('play-btn', 'children'),
+            Output('lod-level', 'value', allow_duplicate=True),
+            Output('lod-before-playback', 'data'),
+        ],
+        Input('play-btn', 'n_clicks'),
+        [State('play-interval', 'disabled'), State('lod-level', 'value'), State('lod-before-playback', 'data')],
+        prevent_initial_call=True,
+    )
+    def toggle_playback(n_clicks, disabled, lod_level, lod_before_playback):
+        """Lecture d'une série au niveau grossier (LOD_INTERACTION), niveau choisi rétabli à la pause."""
+        if disabled:
+            return False, "Pause", LOD_INTERACTION, lod_level
+        restored = lod_before_playback if lod_before_playback is not None else 0
+        return True, "Lecture", restored, None
+
+    @app.callback(
+        Output('frame-slider', 'value'),
+        Input('play-interval', 'n_intervals'),
+        [State('frame-slider', 'value'), State('frame-slider', 'max')],
+        prevent_initial_call=True,
+    )
+    def advance_frame(n_intervals, frame_index, max_frame):
+        if not max_frame:
+            return no_update
+        return (frame_index + 1) % (max_frame + 1)
+
+    @app.callback(
+        [Output('roi-threshold', 'min'), Output('roi-threshold', 'max'), Output('roi-threshold', 'value')],
+        [Input('range-slider', 'min'), Input('range-slider', 'max')],
+        State('range-slider', 'value'),
+    )
+    def sync_roi_threshold(value_min, value_max, value_range):
+        """Seuil des régions sur la plage de la texture, initialisé au haut de la plage de couleurs."""
+        return value_min, value_max, value_range[1]
+
+    @app.callback(
+        [Output('roi-graph', 'figure'), Output('roi-table', 'children')],
+        [
+            Input('toggle-roi', 'value'),
+            Input('roi-threshold', 'value'),
+            Input('roi-two-sided', 'value'),
+            Input('roi-min-size', 'value'),
+            Input('frame-slider', 'value'),
+            # Modifié par update_figure après chaque import, une fois l'état de session à jour
+            Input('frame-slider', 'max'),
+        ] + [Input(component_id, 'value') for component_id in SMOOTHING_INPUTS],
+        State('session-id', 'data'),
+    )
+    @metrics.timed('update_clusters')
+    def update_clusters(toggle_roi, threshold, two_sided, min_size, frame_index, max_frame,
+                        smoothing_method, smoothing_weights, smoothing_iterations, smoothing_fwhm, session_id):
+        """
+        Régions connexes au-dessus du seuil sur le maillage complet (texture lissée si demandé).
+
+        L'adjacence des sommets est construite une fois par maillage (voir
+        surface_analysis.get_mesh_topology) : déplacer le seuil ne recalcule que les composantes.
+        """
+        if 'on' not in toggle_roi:
+            return surface_analysis.plot_clusters(None, None, None, []), None
+        state = get_session_state(session_id)
+        smoothing = smoothing_options(smoothing_method, smoothing_weights, smoothing_iterations, smoothing_fwhm)
+        scalars, _, _ = smoothed_scalars(state, frame_index, smoothing)
+        if scalars is None or threshold is None:
+            return surface_analysis.plot_clusters(None, None, None, []), "Importer une texture pour extraire des régions."
+        vertices, faces = np.asarray(state['vertices']), np.asarray(state['faces'])
+        topology = surface_analysis.get_mesh_topology(vertices, faces, state['mesh_key'])
+        labels, clusters = surface_analysis.threshold_clusters(
+            faces, scalars, threshold, topology, min_vertices=max(int(min_size or 1), 1),
+            two_sided='on' in two_sided)
+        return (surface_analysis.plot_clusters(vertices, faces, labels, clusters, transport=TRANSPORT),
+                cluster_table(clusters))
+
+    @app.callback(
+        Output('upload-status', 'children', allow_duplicate=True),
+        Input('toggle-geodesic', 'value'),
+        State('session-id', 'data'),
+        prevent_initial_call=True,
+    )
+    def prepare_geodesic(toggle_geodesic, session_id):
+        """Factoriser en tâche de fond les systèmes de la distance géodésique du maillage affiché."""
+        if 'on' not in toggle_geodesic:
+            return no_update
+        state = get_session_state(session_id)
+        _geodesic_executor.submit(surface_analysis.geodesic_solver, state['vertices'], state['faces'], state['mesh_key'])
+        return "Cliquer un sommet du maillage pour afficher la distance géodésique."
+
+    @app.callback(
+        Output('upload-job', 'data', allow_duplicate=True),
+        Input('3d-mesh', 'clickData'),
+        [State('toggle-geodesic', 'value'), State('session-id', 'data')],
+        prevent_initial_call=True,
+    )
+    def select_geodesic_source(click_data, toggle_geodesic, session_id):
+        """
+        Sommet cliqué (le plus proche en pleine résolution, quel que soit le niveau de détail affiché).
+
+        La carte des distances est calculée par update_figure, comme une texture importée.
+        """
+        if 'on' not in toggle_geodesic or not click_data:
+            return no_update
+        point = click_data['points'][0]
+        if point.get('curveNumber', 0) != 0:
+            return no_update
+        state = get_session_state(session_id)
+        source = surface_analysis.nearest_vertex(state['vertices'], (point['x'], point['y'], point['z']))
+        return dict(kind='geodesic', name=f"sommet {source}", source=source,
+                    key=f"geodesic:{state['mesh_key']}:{source}")
+
+    @app.callback(
+        Output('hover-info', 'children'),
+        Input('3d-mesh', 'hoverData'),
+        [
+            State('hover-mode', 'value'),
+            State('toggle-triangle', 'value'),
+            State('face-reducer', 'value'),
+            State('lod-level', 'value'),
+            State('frame-slider', 'value'),
+        ] + [State(component_id, 'value') for component_id in SMOOTHING_INPUTS] + [
+            State('session-id', 'data'),
+        ],
+        prevent_initial_call=True,
+    )
+    def lookup_hover_value(hover_data, hover_mode, toggle_triangle, face_reducer, lod_level, frame_index,
+                           smoothing_method, smoothing_weights, smoothing_iterations, smoothing_fwhm,
+                           session_id):
+        """Afficher la valeur survolée, lue côté serveur (mode de survol 'lookup')."""
+        if hover_mode != 'lookup' or not hover_data:
+            return None
+        state = store.get(session_id)
+        smoothing = smoothing_options(smoothing_method, smoothing_weights, smoothing_iterations, smoothing_fwhm)
+        scalars, smoothing, _ = smoothed_scalars(state, frame_index, smoothing)
+        if scalars is None:
+            return None
+        _, scalars = fct.display_scalars(
+            state['faces'], scalars, 'on' in toggle_triangle, get_lod(state), lod_level,
+            face_reducer, state['vertices'], scalars_key(state, frame_index, smoothing))
+        point_number = hover_data['points'][0].get('pointNumber')
+        if point_number is None or point_number >= len(scalars):
+            return None
+        return f"Valeur : {float(scalars[point_number]):.2f}"
 
     @app.callback(
         [
@@ -31,79 +452,132 @@ def register_callbacks(app):
             Output('range-slider', 'max'),
             Output('range-slider', 'value'),
             Output('range-slider', 'marks'),
+            Output('frame-slider', 'max'),
+            Output('texture-histogram', 'figure'),
         ],
         [
-            Input('upload-mesh', 'isCompleted'),
-            Input('upload-texture', 'isCompleted'),
+            Input('upload-job', 'data'),
             Input('range-slider', 'value'),
             Input('toggle-triangle', 'value'),
             Input('toggle-contours', 'value'),
             Input('toggle-black-intervals', 'value'),
             Input('colormap-dropdown', 'value'),
             Input('toggle-center-colormap', 'value'),
-        ],
-        [
-            State('upload-mesh', 'fileNames'),
-            State('upload-texture', 'fileNames'),
-        ],
+            Input('lod-level', 'value'),
+            Input('hover-mode', 'value'),
+            Input('frame-slider', 'value'),
+            Input('color-mode', 'value'),
+            Input('face-reducer', 'value'),
+            Input('isoline-levels', 'value'),
+        ] + [Input(component_id, 'value') for component_id in SMOOTHING_INPUTS],
+        State('session-id', 'data'),
     )
+    @metrics.timed('update_figure')
     def update_figure(
-        mesh_uploaded, texture_uploaded, value_range, toggle_triangle, toggle_contours,
-        toggle_black_intervals, selected_colormap, center_colormap,
-        mesh_files, texture_files
+        upload_job, value_range, toggle_triangle, toggle_contours,
+        toggle_black_intervals, selected_colormap, center_colormap, lod_level, hover_mode, frame_index,
+        color_mode, face_reducer, isoline_levels, smoothing_method, smoothing_weights, smoothing_iterations,
+        smoothing_fwhm, session_id
     ):
-        global current_mesh, current_vertices, current_faces, current_scalars, default_min, default_max
-
         triggered = callback_context.triggered
         feedback = None
+        state = get_session_state(session_id)
+        local_colormaps = registry.colormaps()
+        levels_error = None
+        try:
+            contour_levels = parse_levels(isoline_levels)
+        except ValueError as e:
+            contour_levels, levels_error = None, f"{e} (niveaux automatiques utilisés)"
+        smoothing = smoothing_options(smoothing_method, smoothing_weights, smoothing_iterations, smoothing_fwhm)
+
+        # Options d'affichage communes à toutes les branches
+        plot_options = dict(
+            colormap=selected_colormap,
+            local_colormaps=local_colormaps,  # Passer les colormaps locales ici
+            lut=registry.compile(selected_colormap, 'on' in toggle_black_intervals),
+            show_contours='on' in toggle_contours,
+            center_colormap_on_zero='on' in center_colormap,
+            use_black_intervals='on' in toggle_black_intervals,
+            apply_to_faces='on' in toggle_triangle,
+            face_reducer=face_reducer,
+            transport=TRANSPORT,
+            lod=lod_level,
+            hover_mode=hover_mode,
+            color_mode=color_mode,
+            contour_levels=contour_levels,
+        )
+
+        # Fichier importé lu par la tâche de fond : les tableaux sont dans le cache
+        upload_triggered = any("upload-job" in t["prop_id"] for t in triggered) and upload_job
+        if upload_triggered and upload_job.get('error'):
+            return no_update, upload_job['error'], no_update, no_update, no_update, no_update, no_update, no_update
 
         # Handle new mesh upload
-        if any("upload-mesh" in t["prop_id"] for t in triggered):
-            if mesh_uploaded and mesh_files:
-                uploaded_file = os.path.join(UPLOAD_DIRECTORY, mesh_files[0])
-                current_mesh = fct.load_mesh(uploaded_file)
-                current_vertices, current_faces = current_mesh.vertices, current_mesh.faces
-                current_scalars = None  # Reset texture
-                default_min, default_max = 0, 1  # Reset slider range
-                feedback = f"Maillage {mesh_files[0]} chargé avec succès."
-                return (
-                    fct.plot_mesh_with_colorbar(current_vertices, current_faces, None),
-                    feedback,
-                    default_min,
-                    default_max,
-                    [default_min, default_max],
-                    {i: f"{i:.2f}" for i in np.linspace(default_min, default_max, 5)},
-                )
+        if upload_triggered and upload_job['kind'] == 'mesh':
+            state = store.update(session_id, **mesh_state(upload_job['path']))
+            default_min, default_max = state['default_min'], state['default_max']  # Reset slider range
+            feedback = f"Maillage {upload_job['name']} chargé avec succès."
+            return (
+                fct.plot_mesh_with_colorbar(
+                    state['vertices'], state['faces'], None, lod_pyramid=get_lod(state), **plot_options),
+                feedback,
+                default_min,
+                default_max,
+                [default_min, default_max],
+                slider_marks(default_min, default_max),
+                0,
+                fct.plot_texture_histogram(),
+            )
 
-        # Handle new texture upload
-        if any("upload-texture" in t["prop_id"] for t in triggered):
-            if texture_uploaded and texture_files:
-                uploaded_file = os.path.join(UPLOAD_DIRECTORY, texture_files[0])
-                current_scalars = fct.read_gii_file(uploaded_file)
-                feedback = f"Texture {texture_files[0]} chargée avec succès."
-
-                # Update slider and colorbar range based on new texture
-                default_min, default_max = np.min(current_scalars), np.max(current_scalars)
-                slider_marks = {i: f"{i:.2f}" for i in np.linspace(default_min, default_max, 5)}
-                return (
-                    fct.plot_mesh_with_colorbar(
-                        current_vertices,
-                        current_faces,
-                        current_scalars,
-                        color_min=default_min,
-                        color_max=default_max,
-                        colormap=selected_colormap,
-                        local_colormaps=local_colormaps,  # Passer les colormaps locales ici
-                        show_contours='on' in toggle_contours,
-                        center_colormap_on_zero='on' in center_colormap,
-                        use_black_intervals='on' in toggle_black_intervals,
-                    ),
-                    feedback,
-                    default_min,
-                    default_max,
-                    [default_min, default_max],
-                    slider_marks,
-                )
+        # Handle new texture upload, or geodesic distance from a clicked vertex (shown as a texture)
+        if upload_triggered and upload_job['kind'] in ('texture', 'geodesic'):
+            if upload_job['kind'] == 'texture':
+                frames = fct.read_gii_frames(upload_job['path'])
+                feedback = f"Texture {upload_job['name']} chargée avec succès."
+                if len(frames) > 1:
+                    feedback += f" ({len(frames)} frames)"
+
+                # Slider sur toute la plage des valeurs, plage de couleurs robuste (percentiles) :
+                # les statistiques ont été calculées par la tâche de fond
+                stats = fct.texture_stats(upload_job['path'], frames)
+                color_range = [stats['robust_min'], stats['robust_max']]
+            else:
+                frames = surface_analysis.geodesic_distance(
+                    state['vertices'], state['faces'], upload_job['source'], state['mesh_key'])[None]
+                stats = fct.compute_texture_stats(frames)
+                color_range = [stats['min'], stats['max']]
+                feedback = f"Distance géodésique depuis le {upload_job['name']} (max {stats['max']:.1f} mm)."
+            default_min, default_max = stats['min'], stats['max']
+            state = store.update(
+                session_id,
+                frames=frames,
+                texture_key=upload_job['key'],
+                stats=stats,
+                default_min=default_min,
+                default_max=default_max,
+            )
+            scalars, smoothing, smoothing_error = smoothed_scalars(state, 0, smoothing)
+            if smoothing_error:
+                feedback += f" {smoothing_error}"
+            return (
+                fct.plot_mesh_with_colorbar(
+                    state['vertices'],
+                    state['faces'],
+                    scalars,
+                    color_min=color_range[0],
+                    color_max=color_range[1],
+                    lod_pyramid=get_lod(state),
+                    scalars_key=scalars_key(state, 0, smoothing),
+                    **plot_options,
+                ),
+                feedback,
+                default_min,
+                default_max,
+                color_range,
+                slider_marks(default_min, default_max),
+                len(frames) - 1,
+                fct.plot_texture_histogram(stats, *color_range),
+            )
 
         # Generate figure with current data
         feedback = None
@@ -111,19 +585,84 @@ def register_callbacks(app):
             feedback = f"Application de la colormap personnalisée : {selected_colormap}"
         else:
             feedback = f"Application de la colormap : {selected_colormap}"
+        if levels_error:
+            feedback = levels_error
+
+        frames = state.get('frames')
+        if frames is not None:
+            frame_index = min(frame_index or 0, len(frames) - 1)
+        scalars, smoothing, smoothing_error = smoothed_scalars(state, frame_index, smoothing)
+        if smoothing_error:
+            feedback = smoothing_error
+        plot_options.update(lod_pyramid=get_lod(state))
+
+        triggered_ids = {t["prop_id"].split(".")[0] for t in triggered}
+        if USE_PARTIAL_UPDATES and triggered_ids and triggered_ids <= STYLE_INPUTS:
+            # La géométrie est déjà côté client : n'envoyer que la coloration
+            if scalars is None:
+                return no_update, feedback, no_update, no_update, no_update, no_update, no_update, no_update
+
+            def compute_style(frame):
+                return fct.compute_mesh_style(
+                    state['faces'],
+                    current_scalars(state, frame, smoothing),
+                    color_min=value_range[0],
+                    color_max=value_range[1],
+                    vertices=state['vertices'],
+                    scalars_key=scalars_key(state, frame, smoothing),
+                    **plot_options,
+                )
+
+            if 'frame-slider' in triggered_ids:
+                # Lecture d'une série : style de la frame préparé à l'avance
+                options_key = (
+                    state['texture_key'], state['mesh_key'], tuple(value_range),
+                    selected_colormap, tuple(toggle_contours), tuple(center_colormap),
+                    tuple(toggle_black_intervals), tuple(toggle_triangle), face_reducer, lod_level, hover_mode,
+                    color_mode, contour_levels, smoothing, TRANSPORT,
+                )
+                style = get_frame_style(len(frames), frame_index, options_key, compute_style)
+            else:
+                style = compute_style(frame_index)
 
+            # Les scalars affichés changent : nouvelle frame, lissage, sommets <-> faces, autre réduction
+            smoothing_changed = bool(triggered_ids & set(SMOOTHING_INPUTS))
+            scalars_changed = bool(triggered_ids & {'frame-slider', 'toggle-triangle'}) or smoothing_changed or (
+                'face-reducer' in triggered_ids and 'on' in toggle_triangle)
+            if color_mode == 'vertexcolor':
+                # Les couleurs changent à chaque mise à jour
+                keys = COLOR_KEYS
+                if scalars_changed or 'hover-mode' in triggered_ids:
+                    keys += HOVER_KEYS
+            else:
+                keys = STYLE_KEYS
+                if scalars_changed:
+                    # Seule l'intensité change pendant la lecture d'une série
+                    keys += INTENSITY_KEYS
+                elif 'hover-mode' in triggered_ids:
+                    keys += HOVER_KEYS
+            # Les isolignes ne dépendent que de la texture, de la frame, du lissage et des niveaux
+            if 'toggle-contours' in triggered_ids or ('on' in toggle_contours and (
+                    smoothing_changed or triggered_ids & {'frame-slider', 'isoline-levels'})):
+                keys += ISOLINE_KEYS
+            histogram = no_update
+            if 'range-slider' in triggered_ids:
+                # Plage sélectionnée sur l'histogramme (voir fct.plot_texture_histogram)
+                histogram = Patch()
+                histogram['layout']['shapes'][0]['y0'] = value_range[0]
+                histogram['layout']['shapes'][0]['y1'] = value_range[1]
+            return (build_style_patch(style, keys), feedback, no_update, no_update, no_update, no_update, no_update,
+                    histogram)
+
+        default_min, default_max = state['default_min'], state['default_max']
         fig = fct.plot_mesh_with_colorbar(
-            current_vertices,
-            current_faces,
-            current_scalars,
+            state['vertices'],
+            state['faces'],
+            scalars,
             color_min=value_range[0],
             color_max=value_range[1],
-            colormap=selected_colormap,
-            local_colormaps=local_colormaps,  # Passer les colormaps locales ici
-            show_contours='on' in toggle_contours,
-            center_colormap_on_zero='on' in center_colormap,
-            use_black_intervals='on' in toggle_black_intervals,
-            apply_to_faces='on' in toggle_triangle
+            scalars_key=scalars_key(state, frame_index, smoothing),
+            **plot_options,
         )
         return (
             fig,
@@ -131,5 +670,7 @@ def register_callbacks(app):
             default_min,
             default_max,
             value_range,
-            {i: f"{i:.2f}" for i in np.linspace(default_min, default_max, 5)},
+            slider_marks(default_min, default_max),
+            no_update,
+            fct.plot_texture_histogram(state.get('stats'), *value_range),
         )
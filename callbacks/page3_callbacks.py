@@ -0,0 +1,155 @@
+from dash import ClientsideFunction, Input, Output, State, Patch, no_update
+import numpy as np
+import os
+import fonctions as fct
+import colormap_registry
+from callbacks.page1_callbacks import TRANSPORT, slider_marks
+
+# Colormaps personnalisées (custom_colormap et page 2), relues quand leurs fichiers changent
+registry = colormap_registry.get_registry()
+
+
+def geometry_key(mesh_key, lod):
+    """Identifiant de la géométrie affichée : contenu du maillage et niveau de détail."""
+    return f"{mesh_key}:{lod}"
+
+
+def load_geometry(mesh_path, lod):
+    """
+    Charger le maillage commun au niveau de détail demandé.
+
+    :return: Tuple (clé de la géométrie, sommets complets, pyramide LOD, sommets et faces affichés).
+    """
+    mesh = fct.load_mesh(mesh_path)
+    vertices, faces = np.asarray(mesh.vertices), np.asarray(mesh.faces)
+    mesh_key = mesh.metadata.get('content_hash')
+    lod_pyramid = fct.get_lod_pyramid(vertices, faces, mesh_key)
+    lod_vertices, lod_faces, _ = fct.select_lod(vertices, faces, None, lod_pyramid, lod)
+    return geometry_key(mesh_key, lod), vertices, lod_pyramid, lod_vertices, lod_faces
+
+
+def build_panel(texture_path, vertices, lod_pyramid, lod):
+    """
+    Intensité d'une texture sur la géométrie affichée (première frame).
+
+    :return: Panneau : nom, intensité encodée selon TRANSPORT et son offset/scale de quantification.
+    :raises ValueError: Si la texture est illisible ou ne correspond pas au maillage.
+    """
+    frames = fct.read_gii_frames(texture_path)
+    if frames is None:
+        raise ValueError(f"Texture illisible : {os.path.basename(texture_path)}")
+    if frames.shape[1] != len(vertices):
+        raise ValueError(f"{os.path.basename(texture_path)} : {frames.shape[1]} valeurs pour "
+                         f"{len(vertices)} sommets")
+    _, _, scalars = fct.select_lod(vertices, None, frames[0], lod_pyramid, lod)
+    intensity, offset, scale = fct.encode_scalars(scalars, TRANSPORT)
+    return dict(
+        name=os.path.basename(texture_path),
+        intensity=intensity,
+        offset=offset,
+        scale=scale,
+    )
+
+
+def texture_range(texture_path):
+    """Bornes complètes et robustes des valeurs (statistiques en cache, voir fct.texture_stats)."""
+    stats = fct.texture_stats(texture_path)
+    return stats['min'], stats['max'], stats['robust_min'], stats['robust_max']
+
+
+def register_callbacks(app):
+    @app.callback(
+        [
+            Output('compare-geometry', 'data'),
+            Output('compare-geometry-key', 'data'),
+            Output('compare-panels', 'data'),
+            Output('compare-order', 'data'),
+            Output('compare-range', 'min'),
+            Output('compare-range', 'max'),
+            Output('compare-range', 'value'),
+            Output('compare-range', 'marks'),
+            Output('compare-status', 'children'),
+        ],
+        [
+            Input('compare-mesh', 'value'),
+            Input('compare-textures', 'value'),
+            Input('compare-lod', 'value'),
+        ],
+        [
+            State('compare-geometry-key', 'data'),
+            State('compare-order', 'data'),
+        ],
+    )
+    def update_panels(mesh_path, texture_paths, lod, client_geometry_key, client_order):
+        """
+        Envoyer la géométrie (si le navigateur ne l'a pas déjà) et l'intensité des nouveaux panneaux.
+
+        Les panneaux sont identifiés par le hash du contenu de leur texture ; ceux déjà présents
+        côté navigateur ne sont pas renvoyés : compare-panels est modifié par un Patch
+        (ajouts et suppressions uniquement).
+        """
+        try:
+            key, vertices, lod_pyramid, lod_vertices, lod_faces = load_geometry(mesh_path, lod)
+        except RuntimeError as e:
+            return (no_update,) * 8 + (f"{os.path.basename(mesh_path)} : {e}",)
+        geometry_changed = key != client_geometry_key
+        geometry = dict(key=key, **fct.encode_geometry(lod_vertices, lod_faces, TRANSPORT)) if geometry_changed else no_update
+
+        known = set() if geometry_changed else set(client_order or [])
+        panels = {} if geometry_changed else Patch()
+        cache = fct.mesh_cache.get_cache()
+        order, shown_paths, errors = [], [], []
+        for texture_path in texture_paths or []:
+            panel_key = cache.key_for(texture_path)
+            if panel_key not in known:
+                try:
+                    panels[panel_key] = build_panel(texture_path, vertices, lod_pyramid, lod)
+                except ValueError as e:
+                    errors.append(str(e))
+                    continue
+                known.add(panel_key)
+            order.append(panel_key)
+            shown_paths.append(texture_path)
+        if not geometry_changed:
+            for panel_key in set(client_order or []) - set(order):
+                del panels[panel_key]
+
+        status = f"{len(order)} texture(s) sur {os.path.basename(mesh_path)}."
+        if errors:
+            status += " Ignorées : " + " ; ".join(errors)
+        if not order or set(order) == set(client_order or []):
+            # Mêmes textures : la plage choisie est conservée
+            return geometry, key, panels, order, no_update, no_update, no_update, no_update, status
+        ranges = np.array([texture_range(texture_path) for texture_path in shown_paths])
+        value_min, value_max = float(ranges[:, 0].min()), float(ranges[:, 1].max())
+        value = [float(ranges[:, 2].min()), float(ranges[:, 3].max())]
+        return (geometry, key, panels, order, value_min, value_max, value,
+                slider_marks(value_min, value_max), status)
+
+    @app.callback(
+        Output('compare-colorscale', 'data'),
+        [Input('compare-colormap', 'value'), Input('compare-black-intervals', 'value')],
+    )
+    def update_colorscale(colormap, black_intervals):
+        return registry.compile(colormap, 'on' in black_intervals)['colorscale']
+
+    # Figure assemblée dans le navigateur : déplacer le slider ne fait aucun aller-retour serveur
+    app.clientside_callback(
+        ClientsideFunction(namespace='compare', function_name='build_figure'),
+        Output('compare-graph', 'figure'),
+        [
+            Input('compare-geometry', 'data'),
+            Input('compare-panels', 'data'),
+            Input('compare-order', 'data'),
+            Input('compare-range', 'value'),
+            Input('compare-colorscale', 'data'),
+        ],
+        State('compare-camera', 'data'),
+    )
+
+    # Une rotation dans un panneau est appliquée à tous les autres
+    app.clientside_callback(
+        ClientsideFunction(namespace='compare', function_name='sync_cameras'),
+        Output('compare-camera', 'data'),
+        Input('compare-graph', 'relayoutData'),
+    )
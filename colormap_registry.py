@@ -0,0 +1,171 @@
+"""
+Registre des colormaps personnalisées.
+
+Les fichiers JSON de ./custom_colormap sont lus une fois, puis relus seulement quand leur
+date de modification change. Les colormaps enregistrées depuis la page 2 sont dans le
+stockage SQLite partagé (voir colormap_store) : seule leur liste est relue quand le
+compteur de révision du stockage change, chaque colormap n'est lue qu'à la première
+utilisation. Ces vérifications sont espacées d'au moins `check_interval` secondes : les
+callbacks ne relisent pas le disque à chaque appel, et une colormap enregistrée depuis un
+autre worker apparaît sans redémarrage.
+
+Les colormaps compilées (voir fct.compile_colormap) sont mises en cache par
+(nom, traits noirs) et invalidées quand le fichier source change.
+"""
+import json
+import os
+import threading
+import time
+from collections.abc import Mapping
+
+import colormap_store
+import fonctions as fct
+
+DEFAULT_DIRECTORY = './custom_colormap'
+# Préfixe des colormaps enregistrées depuis la page 2 (leurs noms recoupent ceux de custom_colormap)
+SAVED_PREFIX = 'saved:'
+CHECK_INTERVAL = 2.0
+
+
+class ColormapView(Mapping):
+    """{nom: colormap} du registre ; les colormaps enregistrées sont lues à la demande."""
+
+    def __init__(self, registry):
+        self._registry = registry
+
+    def __getitem__(self, name):
+        return self._registry.get(name)
+
+    def __contains__(self, name):
+        return name in self._registry._versions
+
+    def __iter__(self):
+        return iter(self._registry._versions)
+
+    def __len__(self):
+        return len(self._registry._versions)
+
+
+class ColormapRegistry:
+    """
+    Colormaps personnalisées, relues à la demande selon la date de modification des fichiers.
+
+    :param directory: Répertoire des colormaps (un fichier JSON par colormap).
+    :param store: Stockage des colormaps enregistrées depuis la page 2 (colormap_store.get_store()
+                  par défaut).
+    :param check_interval: Délai minimal (s) entre deux vérifications du disque.
+    """
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, store=None, check_interval=CHECK_INTERVAL):
+        self.directory = directory
+        self.store = store or colormap_store.get_store()
+        self.check_interval = check_interval
+        self._files = {}  # chemin -> (mtime_ns, {nom: colormap})
+        self._colormaps = {}  # nom -> colormap ({'data': [...], 'mincolormap', 'maxcolormap'}) déjà lue
+        self._versions = {}  # nom -> mtime_ns du fichier source, ou date d'enregistrement
+        self._revision = None  # révision du stockage lors de la dernière lecture de sa liste
+        self._compiled = {}  # (nom, traits noirs) -> (version, colormap compilée)
+        self._last_check = None
+        self._lock = threading.Lock()
+
+    def _source_files(self):
+        try:
+            names = sorted(os.listdir(self.directory))
+        except FileNotFoundError:
+            names = []
+        return [os.path.join(self.directory, name) for name in names if name.endswith('.json')]
+
+    def _parse(self, path):
+        """Lire un fichier source et retourner {nom: colormap}."""
+        with open(path, 'r') as file:
+            data = json.load(file)
+        return {os.path.splitext(os.path.basename(path))[0]: data}
+
+    def refresh(self, force=False):
+        """
+        Relire les fichiers ajoutés, modifiés ou supprimés, et la liste des colormaps enregistrées
+        si le stockage a changé, depuis la dernière vérification.
+        """
+        now = time.monotonic()
+        if not force and self._last_check is not None and now - self._last_check < self.check_interval:
+            return
+        with self._lock:
+            files = {}
+            for path in self._source_files():
+                try:
+                    mtime = os.stat(path).st_mtime_ns
+                except FileNotFoundError:
+                    continue
+                previous = self._files.get(path)
+                if previous is not None and previous[0] == mtime:
+                    files[path] = previous
+                    continue
+                try:
+                    files[path] = (mtime, self._parse(path))
+                except (OSError, json.JSONDecodeError) as e:
+                    print(f"Erreur JSON dans {path} : {e}")
+
+            revision = self.store.revision()
+            if files != self._files or revision != self._revision:
+                colormaps, versions = {}, {}
+                for mtime, entries in files.values():
+                    for name, colormap in entries.items():
+                        colormaps[name] = colormap
+                        versions[name] = mtime
+                # Colormaps enregistrées : liste seulement, celles déjà lues sont conservées
+                for entry in self.store.list():
+                    name = SAVED_PREFIX + entry['name']
+                    versions[name] = entry['created']
+                    if name in self._colormaps and self._versions.get(name) == entry['created']:
+                        colormaps[name] = self._colormaps[name]
+                self._files, self._colormaps, self._versions = files, colormaps, versions
+                self._revision = revision
+            self._last_check = now
+
+    def get(self, name):
+        """
+        Retourne une colormap (à ne pas modifier), lue dans le stockage à la première utilisation.
+
+        :raises KeyError: Si le nom est inconnu.
+        """
+        colormap = self._colormaps.get(name)
+        if colormap is None:
+            if name not in self._versions or not name.startswith(SAVED_PREFIX):
+                raise KeyError(name)
+            colormap = self.store.get(name[len(SAVED_PREFIX):])
+            self._colormaps[name] = colormap
+        return colormap
+
+    def colormaps(self):
+        """Retourne {nom: colormap} (à ne pas modifier), voir ColormapView."""
+        self.refresh()
+        return ColormapView(self)
+
+    def names(self):
+        """Noms proposés dans la page 1 : colorscales Plotly puis colormaps personnalisées et enregistrées."""
+        self.refresh()
+        return fct.get_predefined_colorscale_names() + list(self._versions)
+
+    def compile(self, name, use_black_intervals=False):
+        """Retourne la colormap compilée (voir fct.compile_colormap), recompilée si sa source a changé."""
+        colormaps = self.colormaps()
+        key = (name, bool(use_black_intervals))
+        version = self._versions.get(name)
+        cached = self._compiled.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        local = {name: colormaps[name]} if name in colormaps else None
+        lut = fct.compile_colormap(name, use_black_intervals, local)
+        self._compiled[key] = (version, lut)
+        return lut
+
+
+_default_registry = None
+
+
+def get_registry():
+    """Retourne le registre partagé (créé au premier appel)."""
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = ColormapRegistry()
+    return _default_registry
@@ -0,0 +1,183 @@
+"""
+Stockage des colormaps enregistrées depuis la page 2 (SQLite en mode WAL).
+
+- Écritures atomiques : chaque enregistrement est une transaction IMMEDIATE, un seul
+  écrivain à la fois quel que soit le worker ; les lectures ne sont jamais bloquées (WAL).
+- Noms uniques : le nom suivant ('colormap_NN') est attribué dans la transaction, et la
+  colonne est UNIQUE.
+- Liste des noms et des métadonnées sans désérialiser les colormaps ; chaque colormap
+  n'est lue qu'à la demande (get).
+- Compteur 'revision' incrémenté à chaque écriture : une seule requête suffit aux autres
+  workers pour savoir si la liste a changé (voir colormap_registry).
+
+Au premier accès, les colormaps de l'ancien saved_colormaps.json sont importées.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+SAVED_COLORMAPS_DB = os.environ.get('NEUROMESH_COLORMAP_DB', './saved_colormaps.db')
+LEGACY_JSON_FILE = './saved_colormaps.json'
+NAME_PREFIX = 'colormap_'
+# Attente maximale (s) du verrou d'écriture tenu par un autre worker
+BUSY_TIMEOUT = 10.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS colormaps (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE,
+    created REAL NOT NULL,
+    mincolormap REAL,
+    maxcolormap REAL,
+    n_intervals INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('revision', 0);
+"""
+
+
+class ColormapStore:
+    """
+    Colormaps enregistrées ({'data': [...], 'mincolormap', 'maxcolormap'}), indexées par nom.
+
+    :param path: Fichier SQLite.
+    :param legacy_file: Ancien fichier JSON importé au premier accès (None pour ne rien importer).
+    """
+
+    def __init__(self, path=SAVED_COLORMAPS_DB, legacy_file=LEGACY_JSON_FILE):
+        self.path = path
+        self.legacy_file = legacy_file
+        self._local = threading.local()
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+    def _connect(self):
+        """Connexion du thread courant (une par thread et par processus)."""
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection, self._local.pid = connection, os.getpid()
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    self._initialize(connection)
+                    self._initialized = True
+        return connection
+
+    @contextmanager
+    def _transaction(self, connection):
+        """Transaction d'écriture : le verrou est pris dès le début (BEGIN IMMEDIATE)."""
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def _initialize(self, connection):
+        """Créer le schéma et importer l'ancien fichier JSON (une seule fois, tous workers confondus)."""
+        connection.executescript(SCHEMA)
+        if not self.legacy_file or not os.path.exists(self.legacy_file):
+            return
+        with self._transaction(connection):
+            imported = connection.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone()
+            if imported:
+                return
+            try:
+                with open(self.legacy_file, 'r') as file:
+                    legacy = json.load(file)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Erreur JSON dans {self.legacy_file} : {e}")
+                legacy = {}
+            for name, colormap in legacy.items():
+                self._insert(connection, name, colormap, ignore_existing=True)
+            connection.execute("INSERT INTO meta (key, value) VALUES ('legacy_imported', 1)")
+            self._bump_revision(connection)
+
+    @staticmethod
+    def _insert(connection, name, colormap, ignore_existing=False):
+        verb = 'INSERT OR IGNORE' if ignore_existing else 'INSERT'
+        connection.execute(
+            f"{verb} INTO colormaps (name, created, mincolormap, maxcolormap, n_intervals, data) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (name, time.time(), colormap.get('mincolormap'), colormap.get('maxcolormap'),
+             len(colormap['data']), json.dumps(colormap)),
+        )
+
+    @staticmethod
+    def _bump_revision(connection):
+        connection.execute("UPDATE meta SET value = value + 1 WHERE key = 'revision'")
+
+    def revision(self):
+        """Numéro de version de la liste, incrémenté à chaque écriture."""
+        row = self._connect().execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()
+        return row[0]
+
+    def list(self):
+        """Métadonnées des colormaps dans l'ordre d'enregistrement, sans lire leurs intervalles."""
+        rows = self._connect().execute(
+            "SELECT name, created, mincolormap, maxcolormap, n_intervals FROM colormaps ORDER BY id")
+        return [
+            dict(name=name, created=created, mincolormap=low, maxcolormap=high, n_intervals=count)
+            for name, created, low, high, count in rows
+        ]
+
+    def names(self):
+        """Noms des colormaps dans l'ordre d'enregistrement."""
+        return [row[0] for row in self._connect().execute("SELECT name FROM colormaps ORDER BY id")]
+
+    def get(self, name):
+        """
+        Lire une colormap.
+
+        :raises KeyError: Si aucune colormap ne porte ce nom.
+        """
+        row = self._connect().execute("SELECT data FROM colormaps WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise KeyError(name)
+        return json.loads(row[0])
+
+    def save(self, colormap, name=None):
+        """
+        Enregistrer une colormap, sous le nom 'colormap_NN' suivant si `name` n'est pas donné.
+
+        :return: Nom attribué.
+        :raises ValueError: Si `name` est déjà utilisé.
+        """
+        connection = self._connect()
+        with self._transaction(connection):
+            if name is None:
+                index = 0
+                for (existing,) in connection.execute(
+                        "SELECT name FROM colormaps WHERE substr(name, 1, ?) = ?", (len(NAME_PREFIX), NAME_PREFIX)):
+                    suffix = existing[len(NAME_PREFIX):]
+                    if suffix.isdigit():
+                        index = max(index, int(suffix))
+                name = f"{NAME_PREFIX}{index + 1:02d}"
+            try:
+                self._insert(connection, name, colormap)
+            except sqlite3.IntegrityError:
+                raise ValueError(f"Une colormap nommée {name} existe déjà.") from None
+            self._bump_revision(connection)
+        return name
+
+
+_default_store = None
+
+
+def get_store():
+    """Retourne le stockage partagé (créé au premier appel)."""
+    global _default_store
+    if _default_store is None:
+        _default_store = ColormapStore()
+    return _default_store
@@ -1,22 +1,21 @@
 import numpy as np
 import plotly.colors as pc
-import nibabel as nib
-import trimesh
-import plotly.graph_objects as go
 import json
-import os
-from matplotlib.colors import to_rgba
+import base64
+import threading
+import mesh_cache
+import gifti_stream
+import metrics
 
-def get_colorscale_names(local_directory='./custom_colormap'):
+# trimesh, matplotlib et plotly.graph_objects sont importés dans les fonctions
+# qui les utilisent : leur import coûte plusieurs centaines de ms au démarrage d'un worker.
+
+def get_predefined_colorscale_names():
+    """Noms des colorscales Plotly proposées (10 séquentielles, 10 divergentes, 10 cycliques)."""
     sequential_names = [name for name in pc.sequential.__dict__.keys() if '__' not in name and 'swatches' not in name and '_r' not in name]
     diverging_names = [name for name in pc.diverging.__dict__.keys() if '__' not in name and 'swatches' not in name and '_r' not in name]
     cyclical_names = [name for name in pc.cyclical.__dict__.keys() if '__' not in name and 'swatches' not in name and '_r' not in name]
-    
-    local_colormaps = load_local_colormaps(local_directory)
-    local_names = list(local_colormaps.keys())
-    print(f"Local colormaps détectées : {local_names}")  # Débogage
-    predefined_colormaps = np.hstack([sequential_names[0:10], diverging_names[0:10], cyclical_names[0:10], local_names])    
-    return predefined_colormaps
+    return sequential_names[0:10] + diverging_names[0:10] + cyclical_names[0:10]
 
 
 # Fonction pour convertir des couleurs RGB en hexadécimal
@@ -34,38 +33,11 @@ def convert_rgb_to_hex_if_needed(colormap):
 
 # Création d'une colormap avec des traits noirs
 def create_colormap_with_black_stripes(base_colormap, num_intervals=10, black_line_width=0.01):
-    temp_c = pc.get_colorscale(base_colormap)
-    temp_c_2 = [ii[1] for ii in temp_c]
-    old_colormap = convert_rgb_to_hex_if_needed(temp_c_2)
-    custom_colormap = []
-    base_intervals = np.linspace(0, 1, len(old_colormap))
-
-    for i in range(len(old_colormap) - 1):
-        custom_colormap.append([base_intervals[i], old_colormap[i]])
-        if i % (len(old_colormap) // num_intervals) == 0:
-            black_start = base_intervals[i]
-            black_end = min(black_start + black_line_width, 1)
-            custom_colormap.append([black_start, 'rgb(0, 0, 0)'])
-            custom_colormap.append([black_end, old_colormap[i]])
-    custom_colormap.append([1, old_colormap[-1]])
-    return custom_colormap
-
-# Charger les colormaps locales depuis un répertoire
-def load_local_colormaps(directory):
-    local_colormaps = {}
-    for filename in os.listdir(directory):
-        if filename.endswith(".json"):
-            filepath = os.path.join(directory, filename)
-            with open(filepath, "r") as file:
-                try:
-                    data = json.load(file)
-                    name = os.path.splitext(filename)[0]
-                    local_colormaps[name] = data
-                    print(f"Chargé : {name} depuis {filepath}")  # Debug
-                except json.JSONDecodeError as e:
-                    print(f"Erreur JSON dans {filepath} : {e}")
-    return local_colormaps
-
+    """
+    Colorscale Plotly avec `num_intervals` traits noirs de largeur `black_line_width`,
+    répartis uniformément sur [0, 1] quel que soit le nombre de couleurs de la base.
+    """
+    return compile_named_colormap(base_colormap, stripes=(num_intervals, black_line_width))['colorscale']
 
 # Conversion d'une colormap locale en format Plotly
 def convert_custom_colormap_to_plotly(colors):
@@ -77,137 +49,969 @@ def convert_custom_colormap_to_plotly(colors):
     """
     if not colors:
         return []
+    return compile_interval_colormap(colors)['colorscale']
 
-    total_range = colors[-1]["max"] - colors[0]["min"]
-    colorscale = []
 
-    for entry in colors:
-        # Positions normalisées pour Plotly
-        normalized_min = (entry["min"] - colors[0]["min"]) / total_range
-        normalized_max = (entry["max"] - colors[0]["min"]) / total_range
+# Fonction pour charger un maillage GIFTI
+@metrics.timed('load_mesh')
+def load_mesh(gifti_file, use_cache=True, lod_levels=None):
+    """
+    Charge un fichier GIfTI et retourne un objet Trimesh.
+
+    Les tableaux décodés sont mis en cache par hash du contenu (voir mesh_cache) : un
+    fichier déjà vu est rechargé en memory-map sans repasser par le décodage GIfTI.
 
-        # Ajouter les couleurs aux positions normalisées
-        colorscale.append([normalized_min, entry["color"]])
-        colorscale.append([normalized_max, entry["color"]])
-        
-    return colorscale
+    :param gifti_file: Chemin vers le fichier GIfTI.
+    :param use_cache: Utiliser le cache disque des maillages décodés.
+    :param lod_levels: Si fourni, construit la pyramide LOD (voir get_lod_pyramid) et la place
+                       dans mesh.metadata['lod_pyramid'].
+    :return: Objet trimesh.Trimesh contenant les sommets, les faces et les métadonnées.
+    :raises ValueError: Si le fichier GIfTI ne contient pas les intentions requises.
+    """
+    import trimesh
 
+    try:
+        cache = mesh_cache.get_cache() if use_cache else None
+        if cache is not None:
+            key = cache.key_for(gifti_file)
+            cached = cache.get(key, 'mesh')
+            if cached is not None:
+                arrays, metadata = cached
+                metadata.update(filename=gifti_file, content_hash=key)
+                mesh = trimesh.Trimesh(faces=arrays['faces'], vertices=arrays['vertices'],
+                                       metadata=metadata, process=False)
+                if lod_levels:
+                    mesh.metadata['lod_pyramid'] = get_lod_pyramid(
+                        mesh.vertices, mesh.faces, mesh.metadata.get('content_hash'), lod_levels)
+                return mesh
+
+        # Lire en flux uniquement les data arrays POINTSET et TRIANGLE
+        metadata, darrays = gifti_stream.read_gifti(
+            gifti_file, intents=('NIFTI_INTENT_POINTSET', 'NIFTI_INTENT_TRIANGLE'))
 
-#def interpolate_color(color1, color2, t):
+        # Extraire les coordonnées des sommets (POINTSET)
+        pointset_array = [d['data'] for d in darrays if d['intent'] == 'NIFTI_INTENT_POINTSET']
+        if not pointset_array:
+            raise ValueError("Le fichier GIfTI ne contient pas d'intention POINTSET.")
+        coords = pointset_array[0]
+
+        # Extraire les indices des triangles (TRIANGLE)
+        triangle_array = [d['data'] for d in darrays if d['intent'] == 'NIFTI_INTENT_TRIANGLE']
+        if not triangle_array:
+            raise ValueError("Le fichier GIfTI ne contient pas d'intention TRIANGLE.")
+        faces = triangle_array[0]
+
+        # Créer et retourner l'objet Trimesh
+        mesh = trimesh.Trimesh(faces=faces, vertices=coords, metadata=metadata, process=False)
+        if cache is not None:
+            # Stocker les tableaux au format interne de Trimesh pour éviter toute copie au rechargement
+            cache.put(key, 'mesh', {'vertices': mesh.vertices, 'faces': mesh.faces}, metadata)
+            mesh.metadata['content_hash'] = key
+        mesh.metadata['filename'] = gifti_file
+        if lod_levels:
+            mesh.metadata['lod_pyramid'] = get_lod_pyramid(
+                mesh.vertices, mesh.faces, mesh.metadata.get('content_hash'), lod_levels)
+        return mesh
+
+    except Exception as e:
+        raise RuntimeError(f"Erreur lors du chargement du fichier GIfTI : {e}")
+
+
+# Fonction pour lire toutes les data arrays d'une texture GIFTI (séries temporelles, cartes multiples)
+@metrics.timed('read_gii_frames')
+def read_gii_frames(file_path, use_cache=True):
     """
-    Interpole entre deux couleurs en utilisant un ratio t (0 <= t <= 1).
-    :param color1: Couleur de départ en format hex ou nom CSS.
-    :param color2: Couleur d'arrivée en format hex ou nom CSS.
-    :param t: Ratio d'interpolation (0 = color1, 1 = color2).
-    :return: Couleur interpolée en format hex.
+    Lire toutes les data arrays d'une texture GIfTI en un seul bloc.
+
+    Les fichiers à plusieurs data arrays (série temporelle IRMf, plusieurs cartes de
+    contraste) donnent une frame par data array ; une data array unique de forme
+    (N, T) donne T frames. Les data arrays sont lues en flux (voir gifti_stream) et
+    copiées une à une dans le bloc préalloué. Via le cache, le bloc est rechargé en memory-map.
+
+    :param file_path: Chemin vers le fichier GIfTI.
+    :param use_cache: Utiliser le cache disque des textures décodées.
+    :return: Tableau (n_frames, n_sommets), ou None en cas d'erreur.
     """
-    rgba1 = to_rgba(color1)  # Convertir la couleur en format RGBA
-    rgba2 = to_rgba(color2)
-    rgba_interp = [(1 - t) * c1 + t * c2 for c1, c2 in zip(rgba1, rgba2)]
-    return f"rgba({int(rgba_interp[0]*255)}, {int(rgba_interp[1]*255)}, {int(rgba_interp[2]*255)}, {rgba_interp[3]})"
+    try:
+        cache = mesh_cache.get_cache() if use_cache else None
+        if cache is not None:
+            key = cache.key_for(file_path)
+            cached = cache.get(key, 'frames')
+            if cached is not None:
+                return cached[0]['frames']
+
+        frames = None
+        for darray in gifti_stream.iter_data_arrays(file_path):
+            data = darray['data']
+            if darray['count'] == 1 and data.ndim == 2:
+                frames = np.ascontiguousarray(data.T)
+                break
+            if frames is None:
+                frames = np.empty((darray['count'] or 1, data.size), dtype=data.dtype)
+            if darray['index'] >= len(frames) or data.size != frames.shape[1]:
+                raise ValueError("Data arrays de tailles incohérentes dans la texture.")
+            frames[darray['index']] = np.ravel(data)
+        if frames is None:
+            raise ValueError("La texture ne contient aucune data array.")
+        if cache is not None:
+            frames = cache.put(key, 'frames', {'frames': frames})[0]['frames']
+        return frames
+    except Exception as e:
+        print(f"Erreur lors du chargement de la texture : {e}")
+        return None
+
+
+# Fonction pour lire un fichier GIFTI (scalars.gii)
+@metrics.timed('read_gii_file')
+def read_gii_file(file_path, use_cache=True):
+    """Lire la première data array d'une texture GIfTI (voir read_gii_frames)."""
+    frames = read_gii_frames(file_path, use_cache)
+    return None if frames is None else frames[0]
 
 
-#def convert_custom_colormap_to_plotly(colors, steps=50):
+# Statistiques des textures : percentiles de la plage robuste et nombre de classes de l'histogramme
+STATS_PERCENTILES = (2, 98)
+HISTOGRAM_BINS = 64
+
+
+def compute_texture_stats(frames, bins=HISTOGRAM_BINS, percentiles=STATS_PERCENTILES):
     """
-    Convertir une colormap personnalisée en colorscale compatible Plotly
-    avec des transitions lisses entre les couleurs, en passant par les centres des plages.
-    
-    :param colors: Liste de dicts contenant 'min', 'max', et 'color'.
-    :param steps: Nombre de pas pour interpoler entre chaque transition.
-    :return: Liste de [position_normalisée, couleur] pour Plotly.
+    Statistiques des valeurs finies d'une texture (toutes frames confondues).
+
+    :param frames: Tableau des valeurs (n_frames, n_sommets) ou (n_sommets,).
+    :return: dict avec 'count', 'nan_count' (valeurs non finies), 'min', 'max', 'mean', 'std',
+             'percentiles' ({'2': ..., '98': ...}), 'robust_min'/'robust_max' (premier et
+             dernier percentile), 'histogram' (effectifs) et 'edges' (bornes des classes).
     """
-    if not colors:
-        return []
+    values = np.ravel(frames)
+    finite = values[np.isfinite(values)]
+    stats = dict(count=int(values.size), nan_count=int(values.size - finite.size))
+    if not finite.size:
+        stats.update(min=0.0, max=1.0, mean=0.0, std=0.0, robust_min=0.0, robust_max=1.0,
+                     percentiles={str(p): 0.0 for p in percentiles},
+                     histogram=np.zeros(bins, dtype=np.int64), edges=np.linspace(0.0, 1.0, bins + 1))
+        return stats
+
+    finite = finite.astype(np.float64, copy=False)
+    value_min, value_max = float(finite.min()), float(finite.max())
+    histogram, edges = np.histogram(finite, bins=bins, range=(value_min, value_max))
+    mean = float(finite.mean())
+    std = float(finite.std())
+    # Dernière utilisation de `finite` : le tri partiel peut se faire sur place
+    values_at = np.percentile(finite, percentiles, overwrite_input=True)
+    stats.update(
+        min=value_min,
+        max=value_max,
+        mean=mean,
+        std=std,
+        percentiles={str(p): float(v) for p, v in zip(percentiles, values_at)},
+        robust_min=float(values_at[0]),
+        robust_max=float(values_at[-1]),
+        histogram=histogram,
+        edges=edges,
+    )
+    return stats
+
+
+def texture_stats(file_path, frames=None, use_cache=True):
+    """
+    Statistiques d'une texture (voir compute_texture_stats), calculées une seule fois.
+
+    Elles sont enregistrées dans le cache des maillages avec le hash du contenu : la tâche
+    de fond qui lit un fichier importé les calcule, les callbacks les relisent ensuite
+    sans reparcourir les valeurs.
+
+    :param frames: Valeurs déjà lues (sinon lues avec read_gii_frames).
+    :return: dict des statistiques, ou None si la texture est illisible.
+    """
+    cache = mesh_cache.get_cache() if use_cache else None
+    if cache is not None:
+        key = cache.key_for(file_path)
+        cached = cache.get(key, 'stats')
+        if cached is not None:
+            arrays, stats = cached
+            return dict(stats, **arrays)
+
+    if frames is None:
+        frames = read_gii_frames(file_path, use_cache)
+        if frames is None:
+            return None
+    stats = compute_texture_stats(frames)
+    if cache is not None:
+        arrays = {name: stats.pop(name) for name in ('histogram', 'edges')}
+        arrays, stats = cache.put(key, 'stats', arrays, stats)
+        stats = dict(stats, **arrays)
+    return stats
+
+
+# Pyramide de niveaux de détail (LOD) : fraction des sommets conservée à chaque niveau.
+# Le niveau 0 est toujours le maillage complet.
+LOD_LEVELS = (1.0, 0.25, 0.05)
+# En dessous de ce nombre de sommets, les niveaux grossiers réutilisent le maillage complet
+LOD_MIN_VERTICES = 50000
+LOD_CACHE_SIZE = 4
+_lod_cache = {}
+
+
+def triangle_areas(vertices, faces):
+    """Aires des triangles (vectorisé)."""
+    v0 = vertices[faces[:, 0]]
+    cross = np.cross(vertices[faces[:, 1]] - v0, vertices[faces[:, 2]] - v0)
+    return 0.5 * np.linalg.norm(cross, axis=1)
+
+
+def clean_decimated_faces(faces):
+    """Supprimer les triangles dégénérés et les doublons produits par une décimation."""
+    faces = faces[(faces[:, 0] != faces[:, 1]) & (faces[:, 1] != faces[:, 2]) & (faces[:, 0] != faces[:, 2])]
+    _, first = np.unique(np.sort(faces, axis=1), axis=0, return_index=True)
+    return faces[np.sort(first)]
+
+
+def build_lod_mapping(labels, n_coarse):
+    """
+    Matrice creuse (n_coarse, n_fine) moyennant les sommets fins sur leur sommet grossier.
+
+    :param labels: Tableau (n_fine,) donnant le sommet grossier de chaque sommet fin.
+    """
+    from scipy import sparse
+
+    counts = np.bincount(labels, minlength=n_coarse).astype(np.float64)
+    weights = 1.0 / counts[labels]
+    return sparse.csr_matrix((weights, (labels, np.arange(len(labels)))), shape=(n_coarse, len(labels)))
+
+
+def decimate_vertex_clustering(vertices, faces, target_vertices):
+    """
+    Décimer un maillage en regroupant ses sommets sur une grille régulière.
+
+    La taille des cellules est choisie pour que la surface en occupe environ
+    `target_vertices` ; chaque cellule devient un sommet placé au barycentre.
+
+    :return: Tuple (sommets, faces, labels) où labels donne le sommet grossier de chaque sommet fin.
+    """
+    cell = np.sqrt(triangle_areas(vertices, faces).sum() / max(target_vertices, 1))
+    cells = np.floor((vertices - vertices.min(axis=0)) / cell).astype(np.int64)
+    dims = cells.max(axis=0) + 1
+    cell_keys = cells[:, 0] + dims[0] * (cells[:, 1] + dims[1] * cells[:, 2])
+    _, labels = np.unique(cell_keys, return_inverse=True)
+    labels = labels.ravel()
+
+    counts = np.bincount(labels)
+    coarse_vertices = np.stack(
+        [np.bincount(labels, weights=vertices[:, d]) / counts for d in range(3)], axis=1
+    )
+    return coarse_vertices, clean_decimated_faces(labels[faces]), labels
+
+
+def decimate_quadric(vertices, faces, target_vertices):
+    """
+    Décimer un maillage par contraction d'arêtes (erreur quadrique).
+
+    Nécessite le paquet optionnel `fast_simplification` utilisé par trimesh. Chaque
+    sommet fin est rattaché au sommet grossier le plus proche.
+
+    :return: Même format que decimate_vertex_clustering.
+    """
+    import trimesh
+    from scipy.spatial import cKDTree
+
+    mesh = trimesh.Trimesh(vertices=vertices, faces=faces, process=False)
+    # Un maillage triangulé fermé a environ deux fois plus de faces que de sommets
+    simplified = mesh.simplify_quadric_decimation(face_count=2 * target_vertices)
+    _, labels = cKDTree(simplified.vertices).query(vertices)
+    return np.asarray(simplified.vertices), np.asarray(simplified.faces), labels
+
+
+def build_lod_pyramid(vertices, faces, levels=LOD_LEVELS, method='clustering', content_hash=None):
+    """
+    Construire une pyramide de niveaux de détail.
+
+    :param vertices: Tableau (N, 3) des sommets du maillage complet.
+    :param faces: Tableau (M, 3) des triangles du maillage complet.
+    :param levels: Fraction des sommets conservée à chaque niveau (le premier vaut 1).
+    :param method: 'clustering' (regroupement de sommets) ou 'quadric' (si fast_simplification est installé).
+    :param content_hash: Hash du maillage ; si fourni, les niveaux sont lus/écrits dans le cache disque.
+    :return: Liste de dicts {'vertices', 'faces', 'mapping'} ; mapping (matrice creuse) ré-échantillonne
+             une texture des sommets complets vers le niveau (None pour le maillage complet).
+    """
+    decimate = decimate_quadric if method == 'quadric' else decimate_vertex_clustering
+    cache = mesh_cache.get_cache() if content_hash else None
+
+    pyramid = [dict(vertices=vertices, faces=faces, mapping=None)]
+    for fraction in levels[1:]:
+        if len(vertices) < LOD_MIN_VERTICES:
+            pyramid.append(pyramid[0])
+            continue
+
+        kind = f'lod-{method}-{fraction:g}'
+        cached = cache.get(content_hash, kind) if cache is not None else None
+        if cached is None:
+            coarse_vertices, coarse_faces, labels = decimate(vertices, faces, int(len(vertices) * fraction))
+            arrays = {'vertices': coarse_vertices, 'faces': coarse_faces, 'labels': labels}
+            if cache is not None:
+                cache.put(content_hash, kind, arrays)
+        else:
+            arrays = cached[0]
+
+        pyramid.append(dict(
+            vertices=arrays['vertices'],
+            faces=arrays['faces'],
+            mapping=build_lod_mapping(np.asarray(arrays['labels']), len(arrays['vertices'])),
+        ))
+    return pyramid
+
+
+def get_lod_pyramid(vertices, faces, content_hash=None, levels=LOD_LEVELS, method='clustering'):
+    """
+    Retourne la pyramide LOD d'un maillage, construite une seule fois par maillage.
+
+    Les pyramides des derniers maillages sont gardées en mémoire ; avec le hash du contenu
+    du maillage (mesh.metadata['content_hash']), les niveaux sont aussi enregistrés sur disque.
+    """
+    if content_hash is None:
+        return build_lod_pyramid(vertices, faces, levels, method)
+
+    cache_key = (content_hash, tuple(levels), method)
+    if cache_key not in _lod_cache:
+        if len(_lod_cache) >= LOD_CACHE_SIZE:
+            _lod_cache.pop(next(iter(_lod_cache)))
+        _lod_cache[cache_key] = build_lod_pyramid(vertices, faces, levels, method, content_hash=content_hash)
+    return _lod_cache[cache_key]
+
+
+def select_lod(vertices, faces, scalars=None, lod_pyramid=None, lod=0):
+    """
+    Retourne (sommets, faces, scalars) du niveau de détail demandé.
+
+    Les scalars définis sur les sommets du maillage complet sont ré-échantillonnés
+    sur le niveau via sa matrice de correspondance.
+    """
+    if not lod_pyramid or not lod:
+        return vertices, faces, scalars
+    level = lod_pyramid[min(lod, len(lod_pyramid) - 1)]
+    if scalars is not None and level['mapping'] is not None:
+        scalars = level['mapping'] @ np.asarray(scalars, dtype=np.float64)
+    return level['vertices'], level['faces'], scalars
+
+
+# Préréglages de transport : compromis précision / taille des tableaux envoyés au navigateur.
+# - geometry : type des coordonnées des sommets (None = liste JSON float64 comme avant)
+# - indices : type des indices des triangles ('auto' = uint16 si possible, sinon int32)
+# - scalars : type des valeurs de texture ('uint8'/'uint16' = quantification linéaire)
+TRANSPORT_PRESETS = {
+    'json': dict(geometry=None, indices=None, scalars=None),
+    'float32': dict(geometry='float32', indices='auto', scalars='float32'),
+    'uint16': dict(geometry='float32', indices='auto', scalars='uint16'),
+    'uint8': dict(geometry='float32', indices='auto', scalars='uint8'),
+}
+DEFAULT_TRANSPORT = 'float32'
+
+# Codes dtype du format typed-array de Plotly.js
+TYPED_ARRAY_CODES = {
+    'int8': 'i1', 'uint8': 'u1', 'int16': 'i2', 'uint16': 'u2',
+    'int32': 'i4', 'uint32': 'u4', 'float32': 'f4', 'float64': 'f8',
+}
+
+
+def get_transport(transport):
+    """Retourne la configuration de transport (nom de préréglage ou dict)."""
+    if transport is None:
+        return TRANSPORT_PRESETS[DEFAULT_TRANSPORT]
+    if isinstance(transport, dict):
+        return transport
+    if transport not in TRANSPORT_PRESETS:
+        raise ValueError(f"Transport inconnu : {transport}. Choix possibles : {list(TRANSPORT_PRESETS)}")
+    return TRANSPORT_PRESETS[transport]
+
+
+def encode_typed_array(array, dtype):
+    """
+    Encoder un tableau numpy au format typed-array base64 de Plotly ({'dtype', 'bdata'}).
+
+    Le navigateur décode directement le buffer binaire, sans parser une liste JSON de nombres.
+
+    :param array: Tableau numpy à encoder.
+    :param dtype: Type cible (ex. 'float32', 'uint16').
+    :return: Dict {'dtype', 'bdata'} (+ 'shape' pour les tableaux multidimensionnels).
+    """
+    dtype = np.dtype(dtype)
+    array = np.ascontiguousarray(array, dtype=dtype.newbyteorder('<'))
+    spec = dict(dtype=TYPED_ARRAY_CODES[dtype.name], bdata=base64.b64encode(array.data).decode('ascii'))
+    if array.ndim > 1:
+        spec['shape'] = ','.join(str(n) for n in array.shape)
+    return spec
+
+
+def encode_geometry(vertices, faces, transport=None):
+    """
+    Encoder la géométrie d'un maillage (x, y, z, i, j, k) selon la configuration de transport.
+
+    :param vertices: Tableau (N, 3) des coordonnées des sommets.
+    :param faces: Tableau (M, 3) des indices des triangles.
+    :param transport: Nom de préréglage de TRANSPORT_PRESETS ou dict de configuration.
+    :return: Dict des propriétés x, y, z, i, j, k du Mesh3d.
+    """
+    config = get_transport(transport)
+    geometry_dtype = config['geometry']
+    indices_dtype = config['indices']
+    if indices_dtype == 'auto':
+        indices_dtype = 'uint16' if len(vertices) <= np.iinfo(np.uint16).max + 1 else 'int32'
+
+    def encode(array, dtype):
+        return array if dtype is None else encode_typed_array(array, dtype)
+
+    return dict(
+        x=encode(vertices[:, 0], geometry_dtype),
+        y=encode(vertices[:, 1], geometry_dtype),
+        z=encode(vertices[:, 2], geometry_dtype),
+        i=encode(faces[:, 0], indices_dtype),
+        j=encode(faces[:, 1], indices_dtype),
+        k=encode(faces[:, 2], indices_dtype),
+    )
+
+
+def quantize_scalars(scalars, dtype='uint16'):
+    """
+    Quantifier linéairement des scalars sur des entiers non signés.
+
+    Les valeurs vérifient scalars ≈ offset + codes * scale ; les NaN sont codés à 0.
+
+    :param scalars: Tableau des valeurs à quantifier.
+    :param dtype: 'uint8' ou 'uint16'.
+    :return: Tuple (codes, offset, scale).
+    """
+    levels = np.iinfo(dtype).max
+    finite = np.isfinite(scalars)
+    if not finite.any():
+        return np.zeros(len(scalars), dtype=dtype), 0.0, 1.0
+    offset = float(np.min(scalars, where=finite, initial=np.inf))
+    scale = (float(np.max(scalars, where=finite, initial=-np.inf)) - offset) / levels or 1.0
+    codes = np.rint((np.where(finite, scalars, offset) - offset) / scale)
+    return np.clip(codes, 0, levels).astype(dtype), offset, scale
+
+
+def encode_scalars(scalars, transport=None):
+    """
+    Encoder des scalars selon la configuration de transport.
+
+    :return: Tuple (intensité encodée, offset, scale) ; les valeurs réelles valent
+             offset + intensité * scale (offset=0, scale=1 sans quantification).
+    """
+    scalars_dtype = get_transport(transport)['scalars']
+    if scalars_dtype is None:
+        return scalars, 0.0, 1.0
+    if np.issubdtype(np.dtype(scalars_dtype), np.integer):
+        codes, offset, scale = quantize_scalars(scalars, scalars_dtype)
+        return encode_typed_array(codes, scalars_dtype), offset, scale
+    return encode_typed_array(scalars, scalars_dtype), 0.0, 1.0
+
+
+# Réductions sommets -> faces ('area' : moyenne pondérée par l'aire associée à chaque sommet)
+FACE_REDUCERS = ('max', 'min', 'mean', 'median', 'area')
+
+
+def vertex_areas(vertices, faces):
+    """Aire associée à chaque sommet : un tiers de l'aire de chaque triangle incident."""
+    thirds = np.repeat(triangle_areas(vertices, faces) / 3, 3)
+    return np.bincount(np.ravel(faces), weights=thirds, minlength=len(vertices))
 
-    # Calculer la plage totale
-    total_range = colors[-1]["max"] - colors[0]["min"]
+
+def scalars_vertices_to_faces(scalars, faces, reducer='max', vertices=None):
+    """
+    Convertit les scalars définis sur les sommets en scalars définis sur les faces.
+
+    Les valeurs des trois sommets sont lues colonne par colonne dans des tampons de
+    taille M et combinées en place, sans construire le tableau (M, 3).
+
+    :param reducer: Réduction de FACE_REDUCERS.
+    :param vertices: Coordonnées des sommets, nécessaires pour la réduction 'area'.
+    """
+    if reducer not in FACE_REDUCERS:
+        raise ValueError(f"Réduction inconnue : {reducer}")
+    scalars = np.asarray(scalars)
+    if reducer == 'area':
+        if vertices is None:
+            raise ValueError("La réduction 'area' nécessite les coordonnées des sommets.")
+        weights = vertex_areas(vertices, faces)
+        weighted = weights * scalars
+        values, total = np.take(weighted, faces[:, 0]), np.take(weights, faces[:, 0])
+        buffer = np.empty_like(values)
+        for column in (1, 2):
+            values += np.take(weighted, faces[:, column], out=buffer)
+            total += np.take(weights, faces[:, column], out=buffer)
+        return np.divide(values, total, out=values, where=total > 0)
+
+    dtype = np.result_type(scalars.dtype, np.float32) if reducer == 'mean' else scalars.dtype
+    result = np.take(scalars, faces[:, 0]).astype(dtype, copy=False)
+    second = np.take(scalars, faces[:, 1]).astype(dtype, copy=False)
+    if reducer == 'median':
+        # médiane(a, b, c) = max(min(a, b), min(max(a, b), c))
+        upper = np.maximum(result, second)
+        np.minimum(result, second, out=result)
+        np.minimum(upper, np.take(scalars, faces[:, 2], out=second), out=upper)
+        return np.maximum(result, upper, out=result)
+    combine = {'max': np.maximum, 'min': np.minimum, 'mean': np.add}[reducer]
+    combine(result, second, out=result)
+    combine(result, np.take(scalars, faces[:, 2], out=second), out=result)
+    if reducer == 'mean':
+        result /= 3
+    return result
+
+
+# Moteur de colormaps : chaque colormap (nommée, à traits noirs ou par intervalles) est
+# compilée une fois en table de correspondance (LUT) constante par morceaux, aux bornes
+# exactes. Les couleurs par sommet s'obtiennent alors par simple indexation.
+LUT_SIZE = 256
+STRIPE_COUNT = 10
+STRIPE_WIDTH = 0.01
+COMPILED_COLORMAPS_SIZE = 64
+_compiled_colormaps = {}
+BLACK = np.array([0, 0, 0, 255], dtype=np.uint8)
+
+
+def parse_color(color):
+    """Convertir une couleur (hex, 'rgb(...)', 'rgba(...)' ou nom CSS) en RGBA uint8."""
+    color = color.strip()
+    if color.startswith('#') and len(color) in (7, 9):
+        values = [int(color[i:i + 2], 16) for i in range(1, len(color), 2)]
+        return values + [255] * (4 - len(values))
+    if color.startswith('rgb'):
+        values = [float(v) for v in color[color.index('(') + 1:color.rindex(')')].split(',')]
+        alpha = values[3] if len(values) == 4 else 1.0
+        return [round(v) for v in values[:3]] + [round(alpha * 255)]
+    from matplotlib.colors import to_rgba
+    return [round(v * 255) for v in to_rgba(color)]
+
+
+def parse_colors(colors):
+    """Convertir une liste de couleurs en tableau (n, 4) RGBA uint8."""
+    return np.array([parse_color(color) for color in colors], dtype=np.uint8).reshape(-1, 4)
+
+
+def rgba_to_string(rgba):
+    return f'rgba({rgba[0]}, {rgba[1]}, {rgba[2]}, {rgba[3] / 255:g})'
+
+
+def compile_interval_colormap(intervals):
+    """
+    Compiler une colormap par intervalles (liste de dicts 'min', 'max', 'color').
+
+    Les bornes des morceaux sont exactement celles des intervalles, normalisées sur [0, 1].
+    """
+    start = intervals[0]["min"]
+    total_range = (intervals[-1]["max"] - start) or 1
+    edges = np.array([entry["min"] for entry in intervals] + [intervals[-1]["max"]], dtype=np.float64)
+    edges = (edges - start) / total_range
     colorscale = []
+    for entry, low, high in zip(intervals, edges[:-1], edges[1:]):
+        colorscale.append([float(low), entry["color"]])
+        colorscale.append([float(high), entry["color"]])
+    return dict(
+        edges=edges,
+        colors=parse_colors([entry["color"] for entry in intervals]),
+        uniform=False,
+        colorscale=colorscale,
+    )
 
-    for i in range(len(colors) - 1):
-        current = colors[i]
-        next_entry = colors[i + 1]
 
-        # Calculer les centres des plages
-        current_center = (current["min"] + current["max"]) / 2
-        next_center = (next_entry["min"] + next_entry["max"]) / 2
+def compile_named_colormap(colormap, size=LUT_SIZE, stripes=None):
+    """
+    Compiler une colorscale Plotly nommée en LUT de `size` morceaux égaux.
 
-        # Positions normalisées pour les centres
-        normalized_current_center = (current_center - colors[0]["min"]) / total_range
-        normalized_next_center = (next_center - colors[0]["min"]) / total_range
+    :param stripes: (nombre, largeur) de traits noirs répartis uniformément sur [0, 1],
+                    ou None. Les bornes des traits sont ajoutées telles quelles aux morceaux.
+    """
+    scale = pc.get_colorscale(colormap)
+    positions = np.array([position for position, _ in scale], dtype=np.float64)
+    stops = parse_colors([color for _, color in scale]).astype(np.float64)
 
-        # Interpoler entre les couleurs depuis le centre courant vers le centre suivant
-        for step in range(steps + 1):
-            t = step / steps
-            interp_position = (
-                normalized_current_center + t * (normalized_next_center - normalized_current_center)
-            )
-            interp_color = interpolate_color(current["color"], next_entry["color"], t)
-            colorscale.append([interp_position, interp_color])
+    def sample(t):
+        return np.stack([np.interp(t, positions, stops[:, k]) for k in range(4)], axis=1)
 
-    # Ajouter la couleur de la première plage au début et de la dernière à la fin
-    first_entry = colors[0]
-    last_entry = colors[-1]
-    colorscale.insert(0, [0.0, first_entry["color"]])  # Début avec la couleur initiale
-    colorscale.append([1.0, last_entry["color"]])     # Fin avec la couleur finale
+    edges = np.linspace(0, 1, size + 1)
+    if stripes is None:
+        colors = np.rint(sample((edges[:-1] + edges[1:]) / 2)).astype(np.uint8)
+        return dict(edges=edges, colors=colors, uniform=True, colorscale=scale)
 
-    return colorscale
+    count, width = stripes
+    starts = np.arange(count) / count
+    ends = np.minimum(starts + width, 1)
+    edges = np.union1d(edges, np.concatenate([starts, ends]))
+    centers = (edges[:-1] + edges[1:]) / 2
+    colors = np.rint(sample(centers)).astype(np.uint8)
+    stripe = np.searchsorted(starts, centers, side='right') - 1
+    colors[centers < ends[stripe]] = BLACK
 
+    # Colorscale compacte : arrêts de la base hors des traits + deux arrêts par borne de trait
+    start_set, end_set = set(starts.tolist()), set(ends.tolist())
+    points = np.union1d(positions, np.concatenate([starts, ends]))
+    point_colors = np.rint(sample(points)).astype(np.uint8)
+    point_stripe = np.searchsorted(starts, points, side='right') - 1
+    black = rgba_to_string(BLACK)
+    colorscale = []
+    for point, rgba, stripe_index in zip(points.tolist(), point_colors, point_stripe):
+        color = rgba_to_string(rgba)
+        if point in start_set:
+            colorscale += [[point, color], [point, black]]
+        elif point in end_set:
+            colorscale += [[point, black], [point, color]]
+        elif point >= ends[stripe_index]:
+            colorscale.append([point, color])
+    return dict(edges=edges, colors=colors, uniform=False, colorscale=colorscale)
 
 
-# Fonction pour charger un maillage GIFTI
-def load_mesh(gifti_file):
+def compile_colormap(colormap='jet', use_black_intervals=False, local_colormaps=None, size=LUT_SIZE):
     """
-    Charge un fichier GIfTI et retourne un objet Trimesh.
-    
-    :param gifti_file: Chemin vers le fichier GIfTI.
-    :return: Objet trimesh.Trimesh contenant les sommets, les faces et les métadonnées.
-    :raises ValueError: Si le fichier GIfTI ne contient pas les intentions requises.
+    Retourne la LUT compilée d'une colormap (mise en cache).
+
+    :return: dict avec
+        'edges' : bornes (K + 1,) des K morceaux sur [0, 1] ;
+        'colors' : couleurs RGBA (K, 4) uint8 des morceaux ;
+        'uniform' : True si les morceaux sont de largeur égale (indexation directe) ;
+        'colorscale' : colorscale Plotly équivalente, pour le mode intensité et la barre de couleur.
     """
-    try:
-        # Charger le fichier GIfTI
-        g = nib.load(gifti_file)
-        
-        # Extraire les coordonnées des sommets (POINTSET)
-        pointset_code = nib.nifti1.intent_codes['NIFTI_INTENT_POINTSET']
-        pointset_array = g.get_arrays_from_intent(pointset_code)
-        if not pointset_array:
-            raise ValueError("Le fichier GIfTI ne contient pas d'intention POINTSET.")
-        coords = pointset_array[0].data
+    local = local_colormaps.get(colormap) if local_colormaps else None
+    key = (colormap, bool(use_black_intervals), size, json.dumps(local, sort_keys=True) if local else None)
+    lut = _compiled_colormaps.get(key)
+    if lut is None:
+        if local is not None:
+            lut = compile_interval_colormap(local["data"])
+        elif use_black_intervals:
+            lut = compile_named_colormap(colormap, size, stripes=(STRIPE_COUNT, STRIPE_WIDTH))
+        else:
+            lut = compile_named_colormap(colormap, size)
+        lut['hex'] = np.array(['#{:02x}{:02x}{:02x}'.format(*rgba[:3]) for rgba in lut['colors'].tolist()])
+        if len(_compiled_colormaps) >= COMPILED_COLORMAPS_SIZE:
+            _compiled_colormaps.pop(next(iter(_compiled_colormaps)))
+        _compiled_colormaps[key] = lut
+    return lut
 
-        # Extraire les indices des triangles (TRIANGLE)
-        triangle_code = nib.nifti1.intent_codes['NIFTI_INTENT_TRIANGLE']
-        triangle_array = g.get_arrays_from_intent(triangle_code)
-        if not triangle_array:
-            raise ValueError("Le fichier GIfTI ne contient pas d'intention TRIANGLE.")
-        faces = triangle_array[0].data
 
-        # Extraire les métadonnées
-        metadata = dict(g.meta.metadata)  # Convertir en dictionnaire classique
-        metadata['filename'] = gifti_file
+def lut_indices(values, lut, color_min, color_max):
+    """Indice du morceau de LUT de chaque valeur ; les valeurs hors [color_min, color_max] sont saturées."""
+    span = color_max - color_min
+    t = (np.asarray(values, dtype=np.float64) - color_min) / (span if span else 1.0)
+    np.nan_to_num(t, copy=False, nan=0.0)
+    np.clip(t, 0.0, 1.0, out=t)
+    n_colors = len(lut['colors'])
+    if lut['uniform']:
+        indices = (t * n_colors).astype(np.intp)
+    else:
+        indices = np.searchsorted(lut['edges'], t, side='right') - 1
+    return np.clip(indices, 0, n_colors - 1, out=indices)
 
-        # Créer et retourner l'objet Trimesh
-        return trimesh.Trimesh(faces=faces, vertices=coords, metadata=metadata, process=False)
 
-    except Exception as e:
-        raise RuntimeError(f"Erreur lors du chargement du fichier GIfTI : {e}")
+def map_colors(values, lut, color_min, color_max):
+    """Couleurs hexadécimales des valeurs, pour vertexcolor/facecolor du Mesh3d."""
+    return lut['hex'][lut_indices(values, lut, color_min, color_max)].tolist()
 
 
-# Fonction pour lire un fichier GIFTI (scalars.gii)
-def read_gii_file(file_path):
-    try:
-        gifti_img = nib.load(file_path)
-        scalars = gifti_img.darrays[0].data
-        return scalars
-    except Exception as e:
-        print(f"Erreur lors du chargement de la texture : {e}")
-        return None
+def compute_colorscale(colormap='jet', use_black_intervals=False, local_colormaps=None):
+    """Retourne une colormap adaptée selon les paramètres."""
+    return compile_colormap(colormap, use_black_intervals, local_colormaps)['colorscale']
+
+
+# Scalars affichés (niveau de détail, sommets ou faces) des dernières textures
+DISPLAY_SCALARS_CACHE_SIZE = 32
+_display_scalars_cache = {}
+_display_scalars_lock = threading.Lock()
+
+
+def display_scalars(faces, scalars=None, apply_to_faces=False, lod_pyramid=None, lod=0,
+                    face_reducer='max', vertices=None, scalars_key=None):
+    """
+    Retourne (faces, scalars) tels qu'affichés : niveau de détail choisi puis,
+    si demandé, conversion des scalars des sommets vers les faces.
+
+    Avec `scalars_key`, identifiant hashable du contenu des scalars sur ce maillage
+    (ex. (hash du maillage, hash de la texture, frame)), le résultat est mis en cache :
+    repasser des sommets aux faces ne coûte plus rien après le premier calcul.
+    """
+    key = None
+    if scalars is not None and scalars_key is not None:
+        key = (scalars_key, lod if lod_pyramid else 0, face_reducer if apply_to_faces else None)
+        cached = _display_scalars_cache.get(key)
+        if cached is not None:
+            return cached
+
+    vertices, faces, scalars = select_lod(vertices, faces, scalars, lod_pyramid, lod)
+    if scalars is not None and apply_to_faces:
+        scalars = scalars_vertices_to_faces(scalars, faces, face_reducer, vertices)
+
+    if key is not None:
+        with _display_scalars_lock:
+            if len(_display_scalars_cache) >= DISPLAY_SCALARS_CACHE_SIZE:
+                _display_scalars_cache.pop(next(iter(_display_scalars_cache)))
+            _display_scalars_cache[key] = (faces, scalars)
+    return faces, scalars
 
 
+# Isolignes : nombre de niveaux automatiques, et isolignes des dernières textures
+ISOLINE_COUNT = 10
+ISOLINES_CACHE_SIZE = 16
+_isolines_cache = {}
+_isolines_lock = threading.Lock()
+# Arêtes (a, b) de chaque triangle, dans l'ordre des colonnes de faces
+_TRIANGLE_EDGES = np.array([[0, 1], [1, 2], [2, 0]])
 
 
+def isoline_levels(color_min, color_max, count=ISOLINE_COUNT):
+    """`count` niveaux régulièrement espacés strictement entre color_min et color_max."""
+    return tuple(np.linspace(color_min, color_max, count + 2)[1:-1].tolist())
+
+
+def extract_isolines(vertices, faces, scalars, levels):
+    """
+    Extraire les isolignes d'un champ scalaire défini sur les sommets (marching triangles).
+
+    Pour chaque niveau, toutes les faces traversées sont traitées d'un bloc : un sommet est
+    « au-dessus » si sa valeur est >= niveau, une face est traversée si ses sommets ne sont
+    pas tous du même côté, et les deux arêtes qui changent de côté donnent le segment par
+    interpolation linéaire.
+
+    :param vertices: Tableau (N, 3) des coordonnées des sommets.
+    :param faces: Tableau (M, 3) des indices des triangles.
+    :param scalars: Tableau (N,) des valeurs aux sommets (les NaN ne produisent aucun segment).
+    :param levels: Valeurs des isolignes.
+    :return: Tableau (3 * S, 3) float32 : pour chaque segment, ses deux extrémités puis une
+             ligne de NaN qui coupe la ligne tracée (une seule trace Scatter3d suffit).
+    """
+    values = np.asarray(scalars, dtype=np.float64)[faces]  # (M, 3)
+    face_min, face_max = values.min(axis=1), values.max(axis=1)
+    segments = []
+    for level in levels:
+        crossed = np.flatnonzero((face_min < level) & (level <= face_max))
+        if not len(crossed):
+            continue
+        face_values = values[crossed]  # (K, 3)
+        a = face_values[:, _TRIANGLE_EDGES[:, 0]]
+        b = face_values[:, _TRIANGLE_EDGES[:, 1]]
+        crosses = (a >= level) != (b >= level)  # exactement deux arêtes par face
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = np.where(crosses, (level - a) / (b - a), 0.0)
+        corners = vertices[faces[crossed]]  # (K, 3, 3)
+        start = corners[:, _TRIANGLE_EDGES[:, 0]]
+        points = start + t[..., None] * (corners[:, _TRIANGLE_EDGES[:, 1]] - start)
+        # Indices des deux arêtes traversées (les True en premier)
+        edges = np.argsort(~crosses, axis=1, kind='stable')[:, :2]
+        segment = np.full((len(crossed), 3, 3), np.nan, dtype=np.float32)
+        segment[:, :2] = np.take_along_axis(points, edges[..., None], axis=1)
+        segments.append(segment.reshape(-1, 3))
+    if not segments:
+        return np.empty((0, 3), dtype=np.float32)
+    return np.concatenate(segments)
+
+
+def isolines(vertices, faces, scalars, levels=None, lod_pyramid=None, lod=0, scalars_key=None):
+    """
+    Retourne les points des isolignes (voir extract_isolines) au niveau de détail choisi.
+
+    Sans `levels`, ISOLINE_COUNT niveaux répartis entre le minimum et le maximum des scalars.
+    Avec `scalars_key` (voir display_scalars), le résultat est mis en cache par
+    (texture, niveau de détail, niveaux) : changer de plage de couleurs ou de colormap
+    ne relance pas l'extraction.
+    """
+    if levels is None:
+        finite = np.isfinite(scalars)
+        if not finite.any():
+            return np.empty((0, 3), dtype=np.float32)
+        levels = isoline_levels(float(np.min(scalars, where=finite, initial=np.inf)),
+                                float(np.max(scalars, where=finite, initial=-np.inf)))
+    levels = tuple(float(level) for level in levels)
+
+    key = None
+    if scalars_key is not None:
+        key = (scalars_key, lod if lod_pyramid else 0, levels)
+        cached = _isolines_cache.get(key)
+        if cached is not None:
+            return cached
+
+    vertices, faces, scalars = select_lod(vertices, faces, scalars, lod_pyramid, lod)
+    points = extract_isolines(vertices, faces, scalars, levels)
+
+    if key is not None:
+        with _isolines_lock:
+            if len(_isolines_cache) >= ISOLINES_CACHE_SIZE:
+                _isolines_cache.pop(next(iter(_isolines_cache)))
+            _isolines_cache[key] = points
+    return points
+
+
+def isolines_trace(points=None, transport=None):
+    """
+    Trace Scatter3d (dict) des isolignes, masquée si `points` est None.
+
+    La trace est toujours présente dans la figure (voir ISOLINES_TRACE) pour pouvoir
+    être remplacée par un Patch sans décaler les autres traces.
+    """
+    trace = dict(type='scatter3d', mode='lines', line=dict(color='black', width=3),
+                 hoverinfo='skip', showlegend=False, visible=points is not None)
+    if points is None:
+        return dict(trace, x=[], y=[], z=[])
+    dtype = get_transport(transport)['geometry']
+    for axis, name in enumerate('xyz'):
+        column = points[:, axis]
+        if dtype is None:
+            # JSON : les coupures sont des null
+            trace[name] = [None if np.isnan(value) else value for value in column.tolist()]
+        else:
+            trace[name] = encode_typed_array(column, dtype)
+    return trace
+
+
+# Modes de survol :
+# - 'text' : une chaîne formatée par sommet (hovertext), coûteux à construire et à envoyer
+# - 'template' : hovertemplate sur les valeurs envoyées en binaire (customdata float32)
+# - 'lookup' : aucune donnée par sommet ; la valeur est lue côté serveur depuis hoverData
+# - 'none' : pas de survol
+HOVER_MODES = ('text', 'template', 'lookup', 'none')
+
+
+def compute_hover(scalars, hover_mode='template', exact_intensity=False):
+    """
+    Propriétés de survol du Mesh3d pour un mode de HOVER_MODES.
+
+    Toutes les clés sont toujours présentes (None si inutilisée) pour pouvoir
+    être appliquées telles quelles dans un Patch.
+
+    :param exact_intensity: L'intensité de la trace contient déjà les valeurs réelles par
+                            sommet (non quantifiées) : le mode 'template' l'affiche directement
+                            au lieu d'envoyer une seconde copie des scalars dans customdata.
+    """
+    hover = dict(hoverinfo='skip', hovertext=None, customdata=None, hovertemplate=None)
+    if scalars is None or hover_mode == 'none':
+        return hover
+    if hover_mode == 'text':
+        hover.update(hoverinfo='text', hovertext=[f'Scalar value: {s:.2f}' for s in scalars])
+    elif hover_mode == 'template' and exact_intensity:
+        hover.update(hoverinfo=None, hovertemplate='Scalar value: %{intensity:.2f}<extra></extra>')
+    elif hover_mode == 'template':
+        hover.update(
+            hoverinfo=None,
+            customdata=encode_typed_array(scalars, 'float32'),
+            hovertemplate='Scalar value: %{customdata:.2f}<extra></extra>',
+        )
+    elif hover_mode == 'lookup':
+        hover.update(hoverinfo=None, hovertemplate='Sommet %{pointNumber}<extra></extra>')
+    else:
+        raise ValueError(f"Mode de survol inconnu : {hover_mode}. Choix possibles : {HOVER_MODES}")
+    return hover
+
+
+# Position des traces dans la figure (voir plot_mesh_with_colorbar)
+ISOLINES_TRACE = 1
+COLORBAR_TRACE = 2
+
+# Modes de coloration :
+# - 'intensity' : scalars + colorscale, interpolés par WebGL dans le navigateur
+# - 'vertexcolor' : couleurs calculées côté serveur via la LUT (vertexcolor ou facecolor),
+#   bornes des intervalles exactes ; la barre de couleur est portée par une trace auxiliaire
+COLOR_MODES = ('intensity', 'vertexcolor')
+
+
+@metrics.timed('compute_mesh_style')
+def compute_mesh_style(faces, scalars=None, color_min=None, color_max=None, show_contours=False,
+                       colormap='jet', use_black_intervals=False, center_colormap_on_zero=False,
+                       local_colormaps=None, apply_to_faces=False, transport=None,
+                       lod_pyramid=None, lod=0, hover_mode='template', color_mode='intensity', lut=None,
+                       face_reducer='max', vertices=None, scalars_key=None, contour_levels=None):
+    """
+    Calculer les propriétés de coloration d'un Mesh3d, sans la géométrie.
+
+    Ce sont les seules propriétés qui changent quand on déplace le slider ou qu'on
+    change de colormap : elles peuvent être envoyées seules au navigateur (Patch Dash).
+
+    Args:
+        faces (np.ndarray): Tableau (M, 3) des indices des sommets formant les triangles.
+        scalars (np.ndarray, optional): Tableau (N,) ou (M,) des valeurs scalaires à mapper.
+        Les autres arguments sont ceux de plot_mesh_with_colorbar.
+
+    Avec un transport quantifié, cmin/cmax et les graduations de la barre de couleur
+    sont exprimés dans l'espace des codes, avec des libellés en valeurs réelles.
+
+    `lut` est la colormap déjà compilée (voir compile_colormap, colormap_registry) ; sinon
+    elle est compilée à partir de colormap, use_black_intervals et local_colormaps.
+    `face_reducer`, `vertices` et `scalars_key` sont transmis à display_scalars.
+
+    En mode 'vertexcolor', le dict contient vertexcolor/facecolor (l'un des deux à None)
+    et 'colorbar_marker', le marker de la trace auxiliaire portant la barre de couleur.
+
+    'isolines' est la trace des isolignes (voir isolines_trace), calculées sur les scalars
+    des sommets aux niveaux `contour_levels` (automatiques si None) quand show_contours est vrai.
+
+    Returns:
+        dict: Propriétés Mesh3d (intensity, intensitymode, cmin, cmax, colorscale...) et 'isolines'.
+    """
+    contour_points = None
+    if show_contours and scalars is not None and vertices is not None:
+        contour_points = isolines(vertices, faces, scalars, contour_levels, lod_pyramid, lod, scalars_key)
+    contour = isolines_trace(contour_points, transport)
+    faces, scalars = display_scalars(faces, scalars, apply_to_faces, lod_pyramid, lod,
+                                     face_reducer, vertices, scalars_key)
+
+    if scalars is None:
+        return dict(color='lightgray', opacity=1, isolines=contour, **compute_hover(None))
+
+    # Gestion des plages de couleurs
+    color_min = color_min if color_min is not None else np.min(scalars)
+    color_max = color_max if color_max is not None else np.max(scalars)
+
+    if center_colormap_on_zero:
+        max_abs_value = max(abs(color_min), abs(color_max))
+        color_min, color_max = -max_abs_value, max_abs_value
+
+    colorbar = dict(
+        title="Scalars",
+        tickformat=".2f",
+        thickness=30,
+        len=0.9
+    )
+    if lut is None:
+        lut = compile_colormap(colormap, use_black_intervals, local_colormaps)
+    if color_mode == 'vertexcolor':
+        colors = map_colors(scalars, lut, color_min, color_max)
+        return dict(
+            vertexcolor=None if apply_to_faces else colors,
+            facecolor=colors if apply_to_faces else None,
+            isolines=contour,
+            colorbar_marker=dict(
+                color=[float(color_min), float(color_max)],
+                cmin=float(color_min),
+                cmax=float(color_max),
+                colorscale=lut['colorscale'],
+                showscale=True,
+                colorbar=colorbar,
+            ),
+            **compute_hover(scalars, hover_mode),
+        )
+
+    intensity, offset, scale = encode_scalars(scalars, transport)
+    if scale != 1.0 or offset != 0.0:
+        # Graduations en valeurs réelles sur une intensité quantifiée
+        ticks = np.linspace(color_min, color_max, 6)
+        colorbar.update(tickvals=(ticks - offset) / scale, ticktext=[f'{t:.2f}' for t in ticks])
+
+    return dict(
+        intensity=intensity,
+        intensitymode='cell' if apply_to_faces else 'vertex',
+        cmin=(color_min - offset) / scale,
+        cmax=(color_max - offset) / scale,
+        colorscale=lut['colorscale'],
+        showscale=True,
+        colorbar=colorbar,
+        isolines=contour,
+        **compute_hover(scalars, hover_mode,
+                        exact_intensity=not apply_to_faces and scale == 1.0 and offset == 0.0),
+    )
+
+
+@metrics.timed('plot_mesh_with_colorbar')
 def plot_mesh_with_colorbar(vertices, faces, scalars=None, color_min=None, color_max=None, camera=None,
                             show_contours=False, colormap='jet', use_black_intervals=False,
-                            center_colormap_on_zero=False, local_colormaps=None, apply_to_faces=False):
+                            center_colormap_on_zero=False, local_colormaps=None, apply_to_faces=False,
+                            transport=None, lod_pyramid=None, lod=0, hover_mode='template',
+                            color_mode='intensity', lut=None, face_reducer='max', scalars_key=None,
+                            contour_levels=None):
     """
     Générer un graphique 3D de maillage avec une barre de couleur et options avancées.
 
@@ -218,35 +1022,39 @@ def plot_mesh_with_colorbar(vertices, faces, scalars=None, color_min=None, color
         color_min (float, optional): Valeur minimale pour l'échelle des couleurs.
         color_max (float, optional): Valeur maximale pour l'échelle des couleurs.
         camera (dict, optional): Paramètres de la caméra 3D.
-        show_contours (bool, optional): Afficher ou non les contours des triangles.
+        show_contours (bool, optional): Afficher ou non les isolignes des scalars.
+        contour_levels (sequence, optional): Valeurs des isolignes (ISOLINE_COUNT niveaux
+            automatiques si None).
         colormap (str, optional): Nom de la colormap à utiliser.
         use_black_intervals (bool, optional): Ajouter des intervalles noirs dans la colormap.
         center_colormap_on_zero (bool, optional): Centrer la colormap autour de zéro.
         local_colormaps (dict, optional): Colormaps personnalisées au format Plotly.
         apply_to_faces (bool, optional): Si True, les scalars sont convertis pour être appliqués aux faces.
+        face_reducer (str, optional): Réduction sommets -> faces (voir FACE_REDUCERS).
+        scalars_key (hashable, optional): Identifiant du contenu des scalars ; active le cache
+            des scalars affichés (voir display_scalars).
+        transport (str or dict, optional): Encodage des tableaux envoyés au navigateur
+            (voir TRANSPORT_PRESETS). Les formats binaires nécessitent plotly >= 6.
+        lod_pyramid (list, optional): Pyramide de niveaux de détail (voir build_lod_pyramid).
+        lod (int, optional): Niveau à afficher (0 = pleine résolution) ; les scalars des
+            sommets complets sont ré-échantillonnés sur ce niveau.
+        hover_mode (str, optional): Mode de survol (voir HOVER_MODES).
+        color_mode (str, optional): Mode de coloration (voir COLOR_MODES).
+        lut (dict, optional): Colormap déjà compilée (voir compile_colormap).
+
+    Les traces sont toujours dans le même ordre : le Mesh3d, les isolignes (ISOLINES_TRACE),
+    puis en mode 'vertexcolor' la trace de la barre de couleur (COLORBAR_TRACE).
 
     Returns:
         go.Figure: Figure Plotly contenant le maillage 3D.
     """
+    import plotly.graph_objects as go
 
-    def scalars_vertices_to_faces(scalars, faces):
-        """Convertit les scalars définis sur les sommets en scalars définis sur les faces."""
-        return np.max(scalars[faces], axis=1)
-
-    def compute_colorscale():
-        """Retourne une colormap adaptée selon les paramètres."""
-        if local_colormaps and colormap in local_colormaps:
-            return convert_custom_colormap_to_plotly(local_colormaps[colormap]["data"])
-        elif use_black_intervals:
-            return create_colormap_with_black_stripes(colormap)
-        else:
-            return pc.get_colorscale(colormap)
+    lod_vertices, lod_faces, _ = select_lod(vertices, faces, None, lod_pyramid, lod)
 
     fig_data = dict(
-        x=vertices[:, 0], y=vertices[:, 1], z=vertices[:, 2],
-        i=faces[:, 0], j=faces[:, 1], k=faces[:, 2],
+        **encode_geometry(lod_vertices, lod_faces, transport),
         flatshading=False,
-        hoverinfo='text',
         lighting=dict(
             ambient=0.3,
             diffuse=0.7,
@@ -257,47 +1065,36 @@ def plot_mesh_with_colorbar(vertices, faces, scalars=None, color_min=None, color
         lightposition=dict(x=100, y=200, z=300)
     )
 
-    if scalars is not None:
-        # Convertir les scalars pour les faces si demandé
-        if apply_to_faces:
-            scalars = scalars_vertices_to_faces(scalars, faces)
-
-        # Gestion des plages de couleurs
-        color_min = color_min if color_min is not None else np.min(scalars)
-        color_max = color_max if color_max is not None else np.max(scalars)
-
-        if center_colormap_on_zero:
-            max_abs_value = max(abs(color_min), abs(color_max))
-            color_min, color_max = -max_abs_value, max_abs_value
-
-        # Appliquer la colormap
-        colorscale = compute_colorscale()
-
-        fig_data.update(
-            intensity=scalars,
-            intensitymode='cell' if apply_to_faces else 'vertex',
-            cmin=color_min,
-            cmax=color_max,
-            colorscale=colorscale,
-            showscale=True,
-            colorbar=dict(
-                title="Scalars",
-                tickformat=".2f",
-                thickness=30,
-                len=0.9
-            ),
-            hovertext=[f'Scalar value: {s:.2f}' for s in scalars]
-        )
-    else:
-        fig_data.update(
-            color='lightgray',
-            opacity=1
-        )
+    fig_data.update(compute_mesh_style(
+        faces, scalars,
+        color_min=color_min,
+        color_max=color_max,
+        show_contours=show_contours,
+        colormap=colormap,
+        use_black_intervals=use_black_intervals,
+        center_colormap_on_zero=center_colormap_on_zero,
+        local_colormaps=local_colormaps,
+        apply_to_faces=apply_to_faces,
+        transport=transport,
+        hover_mode=hover_mode,
+        color_mode=color_mode,
+        lut=lut,
+        lod_pyramid=lod_pyramid,
+        lod=lod,
+        face_reducer=face_reducer,
+        vertices=vertices,
+        scalars_key=scalars_key,
+        contour_levels=contour_levels,
+    ))
+    colorbar_marker = fig_data.pop('colorbar_marker', None)
+    contour = fig_data.pop('isolines')
 
-    fig = go.Figure(data=[go.Mesh3d(**fig_data)])
-
-    if show_contours:
-        fig.data[0].update(contour=dict(show=True, color='black', width=2))
+    traces = [go.Mesh3d(**fig_data), go.Scatter3d(contour)]
+    if colorbar_marker is not None:
+        # Trace sans point visible, uniquement pour afficher la barre de couleur
+        traces.append(go.Scatter3d(x=[None], y=[None], z=[None], mode='markers', marker=colorbar_marker,
+                                   hoverinfo='skip', showlegend=False))
+    fig = go.Figure(data=traces)
 
     fig.update_layout(scene=dict(
         xaxis=dict(visible=False),
@@ -306,6 +1103,8 @@ def plot_mesh_with_colorbar(vertices, faces, scalars=None, color_min=None, color
         camera=camera,
         aspectmode='data',
     ),
+    # Conserver la caméra lors des mises à jour partielles de la figure
+    uirevision='mesh',
     height=900,
     width=1000,
     margin=dict(l=10, r=10, b=10, t=10))
@@ -318,4 +1117,46 @@ def plot_mesh_with_colorbar(vertices, faces, scalars=None, color_min=None, color
 
 # Créer des ticks clairs pour le slider
 def create_slider_marks(color_min_default, color_max_default):
-    return {str(i): f'{i:.2f}' for i in np.linspace(color_min_default, color_max_default, 10)}
\ No newline at end of file
+    return {str(i): f'{i:.2f}' for i in np.linspace(color_min_default, color_max_default, 10)}
+
+def plot_texture_histogram(stats=None, color_min=None, color_max=None, height=500):
+    """
+    Histogramme vertical des valeurs d'une texture, à placer à côté du slider de plage.
+
+    La plage de couleurs affichée est la première forme (layout.shapes[0]) : un Patch sur
+    ses bornes y0/y1 suffit quand le slider bouge.
+
+    :param stats: Statistiques de la texture (voir texture_stats), figure vide si None.
+    """
+    import plotly.graph_objects as go
+
+    layout = dict(
+        height=height,
+        width=140,
+        margin=dict(l=0, r=0, t=0, b=0),
+        xaxis=dict(visible=False),
+        yaxis=dict(visible=False),
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        showlegend=False,
+    )
+    if stats is None:
+        return go.Figure(layout=layout)
+
+    edges = np.asarray(stats['edges'])
+    layout['yaxis'].update(range=[float(edges[0]), float(edges[-1])])
+    layout['shapes'] = [dict(
+        type='rect', xref='paper', x0=0, x1=1, yref='y',
+        y0=stats['min'] if color_min is None else color_min,
+        y1=stats['max'] if color_max is None else color_max,
+        fillcolor='rgba(62, 76, 109, 0.2)', line=dict(width=0), layer='below',
+    )]
+    bars = go.Bar(
+        x=np.asarray(stats['histogram']).tolist(),
+        y=((edges[:-1] + edges[1:]) / 2).tolist(),
+        width=float(edges[1] - edges[0]),
+        orientation='h',
+        marker=dict(color='#3e4c6d'),
+        hovertemplate='%{y:.2f} : %{x}<extra></extra>',
+    )
+    return go.Figure(data=[bars], layout=layout)
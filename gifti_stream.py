@@ -0,0 +1,233 @@
+"""
+Lecture en flux des fichiers GIfTI, à faible empreinte mémoire.
+
+nib.load construit tout l'arbre XML puis garde en mémoire, pour chaque data array, le
+texte base64, le tampon décompressé et le tableau final. Ici le XML est lu par blocs
+avec expat : le base64 est décodé et décompressé au fil de l'eau directement dans le
+tableau de destination, alloué une seule fois à partir des dimensions déclarées.
+
+- Seules les data arrays dont l'intention est demandée sont décodées.
+- Les data arrays ExternalFileBinary sont ouvertes en memory-map, sans copie.
+"""
+import binascii
+import os
+import zlib
+from xml.parsers import expat
+
+import numpy as np
+
+CHUNK_SIZE = 1 << 18  # Taille des blocs lus dans le fichier XML
+DECODE_SIZE = 1 << 18  # Nombre de caractères base64 accumulés avant décodage
+
+DATA_TYPES = {
+    'NIFTI_TYPE_UINT8': np.uint8,
+    'NIFTI_TYPE_INT8': np.int8,
+    'NIFTI_TYPE_UINT16': np.uint16,
+    'NIFTI_TYPE_INT16': np.int16,
+    'NIFTI_TYPE_UINT32': np.uint32,
+    'NIFTI_TYPE_INT32': np.int32,
+    'NIFTI_TYPE_UINT64': np.uint64,
+    'NIFTI_TYPE_INT64': np.int64,
+    'NIFTI_TYPE_FLOAT32': np.float32,
+    'NIFTI_TYPE_FLOAT64': np.float64,
+}
+ENDIANS = {'LittleEndian': '<', 'BigEndian': '>'}
+ENCODINGS = ('ASCII', 'Base64Binary', 'GZipBase64Binary', 'ExternalFileBinary')
+
+
+class _DataArrayDecoder:
+    """Décode le contenu de l'élément <Data> d'une data array dans un tableau préalloué."""
+
+    def __init__(self, attrs, directory):
+        self.encoding = attrs.get('Encoding', 'GZipBase64Binary')
+        if self.encoding not in ENCODINGS:
+            raise ValueError(f"Encodage GIfTI non supporté : {self.encoding}")
+        data_type = attrs.get('DataType')
+        if data_type not in DATA_TYPES:
+            raise ValueError(f"Type de données GIfTI non supporté : {data_type}")
+        self.dtype = np.dtype(DATA_TYPES[data_type]).newbyteorder(ENDIANS.get(attrs.get('Endian'), '='))
+        n_dims = int(attrs.get('Dimensionality', 1))
+        self.shape = tuple(int(attrs[f'Dim{i}']) for i in range(n_dims))
+        self.order = 'F' if attrs.get('ArrayIndexingOrder') == 'ColumnMajorOrder' else 'C'
+        self.size = int(np.prod(self.shape))
+
+        self.data = None
+        if self.encoding == 'ExternalFileBinary':
+            self.data = np.memmap(
+                os.path.join(directory, attrs['ExternalFileName']), dtype=self.dtype, mode='r',
+                offset=int(attrs.get('ExternalFileOffset') or 0), shape=self.shape, order=self.order,
+            )
+            return
+        self.pending = []  # Texte pas encore décodé
+        self.pending_size = 0
+        if self.encoding == 'ASCII':
+            return
+        # Tableau final alloué une fois ; les octets décodés y sont écrits au fil de l'eau
+        self.flat = np.empty(self.size, dtype=self.dtype)
+        self.buffer = memoryview(self.flat).cast('B')
+        self.offset = 0
+        self.decompressor = zlib.decompressobj() if self.encoding == 'GZipBase64Binary' else None
+
+    def feed(self, text):
+        """Recevoir un morceau du texte de l'élément <Data>."""
+        if self.data is not None:
+            return
+        if self.encoding != 'ASCII':
+            text = ''.join(text.split())
+        self.pending.append(text)
+        self.pending_size += len(text)
+        if self.encoding != 'ASCII' and self.pending_size >= DECODE_SIZE:
+            self._decode(final=False)
+
+    def _write(self, raw):
+        end = self.offset + len(raw)
+        if end > len(self.buffer):
+            raise ValueError("Data array plus longue que ses dimensions déclarées.")
+        self.buffer[self.offset:end] = raw
+        self.offset = end
+
+    def _decode(self, final):
+        text = ''.join(self.pending)
+        # Le base64 se décode par groupes de 4 caractères : garder le reste pour la suite
+        cut = len(text) if final else len(text) - len(text) % 4
+        self.pending = [text[cut:]] if cut < len(text) else []
+        self.pending_size = len(text) - cut
+        raw = binascii.a2b_base64(text[:cut])
+        self._write(raw if self.decompressor is None else self.decompressor.decompress(raw))
+
+    def finish(self):
+        """Terminer le décodage et retourner le tableau aux dimensions déclarées."""
+        if self.data is not None:
+            return self.data
+        if self.encoding == 'ASCII':
+            flat = np.asarray(''.join(self.pending).split(), dtype=self.dtype)
+            if flat.size != self.size:
+                raise ValueError("Data array ASCII de taille incohérente avec ses dimensions.")
+            # Comme nibabel, le texte ASCII est lu ligne par ligne quel que soit l'ordre déclaré
+            return flat.astype(flat.dtype.newbyteorder('='), copy=False).reshape(self.shape)
+        else:
+            self._decode(final=True)
+            if self.decompressor is not None:
+                self._write(self.decompressor.flush())
+            if self.offset != len(self.buffer):
+                raise ValueError("Data array plus courte que ses dimensions déclarées.")
+            flat = self.flat
+        if not flat.dtype.isnative:
+            flat = flat.byteswap(inplace=True).view(flat.dtype.newbyteorder('='))
+        return flat.reshape(self.shape, order=self.order)
+
+
+class _GiftiParser:
+    """Gestionnaires expat : métadonnées du fichier et data arrays demandées."""
+
+    def __init__(self, path, intents):
+        self.directory = os.path.dirname(os.path.abspath(path))
+        self.intents = None if intents is None else set(intents)
+        self.metadata = {}
+        self.count = None
+        self.intents_found = []  # Intention de chaque data array rencontrée
+        self.completed = []  # Data arrays décodées pas encore transmises
+        self.index = -1
+        self.darray = None  # Data array en cours (dict) ou None
+        self.decoder = None  # Décodeur de la data array en cours si son intention est demandée
+        self.in_data = False
+        self.md_field = None  # 'Name' ou 'Value' pendant la lecture d'une métadonnée
+        self.md = {}
+
+    def start(self, name, attrs):
+        if name == 'GIFTI':
+            self.count = int(attrs.get('NumberOfDataArrays', 0)) or None
+        elif name == 'DataArray':
+            self.index += 1
+            intent = attrs.get('Intent', 'NIFTI_INTENT_NONE')
+            self.intents_found.append(intent)
+            self.darray = {'index': self.index, 'intent': intent, 'metadata': {}, 'count': self.count}
+            if self.intents is None or intent in self.intents:
+                self.decoder = _DataArrayDecoder(attrs, self.directory)
+        elif name == 'Data':
+            self.in_data = self.decoder is not None
+        elif name == 'MD':
+            self.md = {'Name': [], 'Value': []}
+        elif name in ('Name', 'Value'):
+            self.md_field = name
+
+    def end(self, name):
+        if name == 'Data':
+            self.in_data = False
+        elif name == 'DataArray':
+            if self.decoder is not None:
+                self.darray['data'] = self.decoder.finish()
+                self.completed.append(self.darray)
+            self.darray = self.decoder = None
+        elif name in ('Name', 'Value'):
+            self.md_field = None
+        elif name == 'MD':
+            target = self.metadata if self.darray is None else self.darray['metadata']
+            target[''.join(self.md['Name'])] = ''.join(self.md['Value'])
+
+    def characters(self, text):
+        if self.in_data:
+            self.decoder.feed(text)
+        elif self.md_field is not None:
+            self.md[self.md_field].append(text)
+
+
+def _parse(path, intents, chunk_size):
+    """Générateur interne : (parser, data arrays terminées depuis le bloc précédent)."""
+    handler = _GiftiParser(path, intents)
+    parser = expat.ParserCreate()
+    parser.StartElementHandler = handler.start
+    parser.EndElementHandler = handler.end
+    parser.CharacterDataHandler = handler.characters
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            parser.Parse(chunk, False)
+            completed, handler.completed = handler.completed, []
+            yield handler, completed
+        parser.Parse(b'', True)
+    yield handler, handler.completed
+
+
+def iter_data_arrays(path, intents=None, chunk_size=CHUNK_SIZE):
+    """
+    Lire les data arrays d'un fichier GIfTI une par une.
+
+    Chaque data array est transmise dès qu'elle est décodée ; l'appelant peut la copier
+    puis la libérer avant que la suivante soit lue.
+
+    :param path: Chemin vers le fichier GIfTI.
+    :param intents: Intentions à décoder (ex. {'NIFTI_INTENT_POINTSET'}), toutes si None.
+    :param chunk_size: Taille des blocs lus dans le fichier.
+    :return: Générateur de dicts {'index', 'intent', 'metadata', 'count', 'data'} où
+             'count' est le nombre total de data arrays déclaré par le fichier.
+    :raises ValueError: Si une data array utilise un encodage ou un type non supporté.
+    """
+    for _, completed in _parse(path, intents, chunk_size):
+        yield from completed
+
+
+def read_gifti(path, intents=None, chunk_size=CHUNK_SIZE):
+    """
+    Lire un fichier GIfTI.
+
+    :param path: Chemin vers le fichier GIfTI.
+    :param intents: Intentions à décoder, toutes si None.
+    :return: Tuple (métadonnées du fichier, liste des data arrays, voir iter_data_arrays).
+    """
+    darrays = []
+    handler = None
+    for handler, completed in _parse(path, intents, chunk_size):
+        darrays.extend(completed)
+    return handler.metadata, darrays
+
+
+def read_intents(path, chunk_size=CHUNK_SIZE):
+    """
+    Intentions des data arrays d'un fichier GIfTI, sans décoder leurs données.
+
+    :return: Liste des intentions, dans l'ordre des data arrays.
+    """
+    handler = None
+    for handler, _ in _parse(path, (), chunk_size):
+        pass
+    return handler.intents_found
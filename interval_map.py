@@ -0,0 +1,109 @@
+"""
+Intervalles colorés triés, pour l'éditeur de colormap de la page 2.
+
+Les intervalles sont stockés sous forme de deux listes parallèles : les bornes triées
+(`edges`, n + 1 valeurs) et la couleur de chaque bande (`colors`, n valeurs, None pour un
+trou). Une modification localise ses bornes par recherche dichotomique (bisect) puis ne
+remplace que la tranche concernée ; les bandes voisines de même couleur sont fusionnées.
+"""
+from bisect import bisect_left
+
+
+class IntervalMap:
+    """Partition colorée d'une plage de valeurs, sans chevauchement."""
+
+    def __init__(self):
+        self.edges = []
+        self.colors = []
+
+    @classmethod
+    def from_entries(cls, entries):
+        """Construire à partir d'une liste de dicts {'color', 'min', 'max'} (format enregistré)."""
+        intervals = cls()
+        for entry in sorted(entries, key=lambda entry: entry["min"]):
+            intervals.paint(entry["min"], entry["max"], entry["color"])
+        return intervals
+
+    def to_entries(self):
+        """Liste de dicts {'color', 'min', 'max'} triée, sans les trous."""
+        return [
+            {"color": color, "min": low, "max": high}
+            for low, high, color in zip(self.edges[:-1], self.edges[1:], self.colors)
+            if color is not None
+        ]
+
+    def __len__(self):
+        return sum(color is not None for color in self.colors)
+
+    def bounds(self):
+        """Tuple (min, max) de la plage couverte, ou None si vide."""
+        return (self.edges[0], self.edges[-1]) if self.colors else None
+
+    def _split(self, value):
+        """Ajouter une borne à `value` (dans la plage couverte) et retourner son indice."""
+        index = bisect_left(self.edges, value)
+        if index < len(self.edges) and self.edges[index] == value:
+            return index
+        # La bande index - 1 est coupée en deux bandes de même couleur
+        self.edges.insert(index, value)
+        self.colors.insert(index, self.colors[index - 1])
+        return index
+
+    def _merge_at(self, index):
+        """Fusionner les bandes index - 1 et index si elles ont la même couleur."""
+        if 0 < index < len(self.colors) and self.colors[index - 1] == self.colors[index]:
+            del self.edges[index]
+            del self.colors[index]
+
+    def _strip_gaps(self):
+        """Retirer les trous aux extrémités."""
+        while self.colors and self.colors[0] is None:
+            del self.edges[0]
+            del self.colors[0]
+        while self.colors and self.colors[-1] is None:
+            del self.edges[-1]
+            del self.colors[-1]
+        if not self.colors:
+            self.edges = []
+
+    def paint(self, start, stop, color):
+        """Colorer [start, stop] : les bandes recouvertes sont coupées ou remplacées."""
+        if not start < stop:
+            return
+        if not self.colors:
+            self.edges, self.colors = [start, stop], [color]
+            return
+        # Étendre la plage par des trous, remplacés ensuite
+        if start < self.edges[0]:
+            self.edges.insert(0, start)
+            self.colors.insert(0, None)
+        if stop > self.edges[-1]:
+            self.edges.append(stop)
+            self.colors.append(None)
+        first = self._split(start)
+        last = self._split(stop)
+        self.edges[first + 1:last] = []
+        self.colors[first:last] = [color]
+        self._merge_at(first + 1)
+        self._merge_at(first)
+
+    def clip(self, start, stop):
+        """Restreindre les intervalles à [start, stop]."""
+        if not self.colors or stop <= self.edges[0] or start >= self.edges[-1]:
+            self.edges, self.colors = [], []
+            return
+        if start > self.edges[0]:
+            first = self._split(start)
+            del self.edges[:first]
+            del self.colors[:first]
+        if stop < self.edges[-1]:
+            last = self._split(stop)
+            del self.edges[last + 1:]
+            del self.colors[last:]
+        self._strip_gaps()
+
+    def recolor(self, old_color, new_color):
+        """Remplacer une couleur dans toutes les bandes (ex. couleur de fond)."""
+        self.colors = [new_color if color == old_color else color for color in self.colors]
+        for index in range(len(self.colors) - 1, 0, -1):
+            self._merge_at(index)
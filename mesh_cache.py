@@ -0,0 +1,149 @@
+"""
+Cache disque des maillages et textures GIfTI déjà décodés.
+
+Chaque fichier est identifié par le hash de son contenu : ses tableaux décodés sont
+stockés en .npy (avec les métadonnées en JSON) et rechargés en memory-map lors des
+chargements suivants. La taille totale du cache est bornée avec une éviction LRU.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+
+DEFAULT_CACHE_DIRECTORY = os.environ.get('NEUROMESH_CACHE_DIR', './.mesh_cache')
+DEFAULT_MAX_BYTES = int(os.environ.get('NEUROMESH_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+HASH_CHUNK_SIZE = 1 << 20
+
+
+def new_digest():
+    """Hash incrémental utilisé pour les clés du cache (voir upload_store)."""
+    return hashlib.blake2b(digest_size=20)
+
+
+def hash_file(path, chunk_size=HASH_CHUNK_SIZE):
+    """Calculer le hash (BLAKE2b) du contenu d'un fichier, lu par blocs."""
+    digest = new_digest()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class MeshCache:
+    """
+    Cache adressé par contenu de tableaux numpy.
+
+    Une entrée est un répertoire `<hash>-<type>/` contenant un .npy par tableau et
+    un fichier meta.json. La date de modification du répertoire sert de date de
+    dernier accès pour l'éviction LRU.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIRECTORY, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # (chemin, taille, mtime) -> hash, pour ne pas relire un fichier inchangé
+        self._keys = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _stamp(path):
+        stat = os.stat(path)
+        return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+    def key_for(self, path):
+        """Retourne le hash du contenu de `path` (mémorisé tant que le fichier ne change pas)."""
+        stamp = self._stamp(path)
+        key = self._keys.get(stamp)
+        if key is None:
+            key = hash_file(path)
+            self._keys[stamp] = key
+        return key
+
+    def remember(self, path, key):
+        """Associer à `path` un hash déjà calculé (ex. pendant l'import), sans relire le fichier."""
+        self._keys[self._stamp(path)] = key
+
+    def entry_path(self, key, kind):
+        return os.path.join(self.directory, f'{key}-{kind}')
+
+    def get(self, key, kind):
+        """
+        Charger une entrée du cache.
+
+        :param key: Hash du contenu du fichier source.
+        :param kind: Type d'entrée ('mesh', 'texture', ...).
+        :return: Tuple (dict nom -> tableau memory-mappé, métadonnées) ou None si absente.
+        """
+        entry = self.entry_path(key, kind)
+        try:
+            with open(os.path.join(entry, 'meta.json'), 'r') as file:
+                meta = json.load(file)
+            arrays = {
+                name: np.load(os.path.join(entry, f'{name}.npy'), mmap_mode='r')
+                for name in meta['arrays']
+            }
+            os.utime(entry)  # Marquer l'entrée comme récemment utilisée
+        except (OSError, ValueError, KeyError):
+            return None
+        return arrays, meta['metadata']
+
+    def put(self, key, kind, arrays, metadata=None):
+        """
+        Enregistrer des tableaux dans le cache puis les recharger en memory-map.
+
+        L'écriture se fait dans un répertoire temporaire renommé atomiquement : un
+        lecteur concurrent ne voit jamais d'entrée incomplète.
+
+        :return: Même format que get().
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix='.tmp-', dir=self.directory)
+        try:
+            for name, array in arrays.items():
+                np.save(os.path.join(tmp, f'{name}.npy'), np.ascontiguousarray(array))
+            with open(os.path.join(tmp, 'meta.json'), 'w') as file:
+                json.dump({'arrays': list(arrays), 'metadata': metadata or {}}, file, default=str)
+            try:
+                os.rename(tmp, self.entry_path(key, kind))
+            except OSError:
+                # Entrée déjà écrite par un autre processus
+                shutil.rmtree(tmp, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        self.evict()
+        return self.get(key, kind)
+
+    def evict(self):
+        """Supprimer les entrées les moins récemment utilisées au-delà de max_bytes."""
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.directory):
+                if not entry.is_dir() or entry.name.startswith('.tmp-'):
+                    continue
+                size = sum(f.stat().st_size for f in os.scandir(entry.path) if f.is_file())
+                entries.append((entry.stat().st_mtime, size, entry.path))
+                total += size
+
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                # Sous Linux, les memory-maps déjà ouverts restent valides après suppression
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+
+
+_default_cache = None
+
+
+def get_cache():
+    """Retourne l'instance de cache partagée (créée au premier appel)."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = MeshCache()
+    return _default_cache
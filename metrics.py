@@ -0,0 +1,168 @@
+"""
+Mesures de temps et de taille des réponses, exposées au format texte Prometheus sur /metrics.
+
+Activées avec NEUROMESH_METRICS=1. Désactivées (par défaut), `timed` retourne la fonction
+telle quelle et aucun hook n'est ajouté au serveur Flask : le surcoût est nul.
+
+- neuromesh_function_duration_seconds{function} : durée des fonctions décorées par `timed`
+  (lecture GIfTI, construction de la figure, callbacks) ;
+- neuromesh_request_duration_seconds{output} : durée totale d'une requête de callback Dash,
+  sérialisation JSON comprise ;
+- neuromesh_response_bytes{output} : taille des réponses envoyées au navigateur.
+
+Avec NEUROMESH_TRACE_LOG=<fichier>, chaque requête de callback ajoute aussi une ligne JSON
+(sortie, durée, taille, durée de chaque fonction décorée appelée pendant la requête).
+
+Les mesures sont propres à chaque processus : avec plusieurs workers, chacun expose les
+siennes ; les fonctions exécutées dans les tâches de fond (lecture des fichiers importés)
+ne sont pas comptées.
+"""
+import functools
+import json
+import os
+import threading
+import time
+
+from flask import Response, g, has_request_context, request
+
+ENABLED = os.environ.get('NEUROMESH_METRICS', '').lower() in ('1', 'true', 'yes', 'on')
+TRACE_LOG = os.environ.get('NEUROMESH_TRACE_LOG') if ENABLED else None
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = tuple(float(4 ** k) for k in range(5, 14))  # 1 Kio à 64 Mio
+
+
+class Histogram:
+    """Histogramme Prometheus (buckets cumulés, somme, nombre) par valeur d'étiquette."""
+
+    def __init__(self, name, help_text, label, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = buckets
+        self._series = {}  # valeur d'étiquette -> [comptes par bucket..., somme, nombre]
+        self._lock = threading.Lock()
+
+    def observe(self, value, label_value):
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        """Lignes du format texte Prometheus."""
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for label_value, values in sorted(series.items()):
+            label = f'{self.label}="{_escape(label_value)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label},le="{bound:g}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label},le="+Inf"}} {values[-1]}')
+            lines.append(f'{self.name}_sum{{{label}}} {values[-2]:.6f}')
+            lines.append(f'{self.name}_count{{{label}}} {values[-1]}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+FUNCTION_DURATION = Histogram(
+    'neuromesh_function_duration_seconds', "Durée des fonctions instrumentées.", 'function', DURATION_BUCKETS)
+REQUEST_DURATION = Histogram(
+    'neuromesh_request_duration_seconds', "Durée des requêtes de callback Dash.", 'output', DURATION_BUCKETS)
+RESPONSE_BYTES = Histogram(
+    'neuromesh_response_bytes', "Taille des réponses des callbacks Dash.", 'output', SIZE_BUCKETS)
+HISTOGRAMS = (FUNCTION_DURATION, REQUEST_DURATION, RESPONSE_BYTES)
+
+_trace_lock = threading.Lock()
+
+
+def timed(name):
+    """
+    Décorateur mesurant la durée d'une fonction sous l'étiquette `name`.
+
+    Sans NEUROMESH_METRICS, la fonction est retournée sans enveloppe.
+    """
+    def decorate(function):
+        if not ENABLED:
+            return function
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                duration = time.perf_counter() - start
+                FUNCTION_DURATION.observe(duration, name)
+                if TRACE_LOG and has_request_context():
+                    g.setdefault('metrics_spans', []).append((name, duration))
+        return wrapper
+    return decorate
+
+
+def _output_label():
+    """Première sortie du callback Dash de la requête courante (ex. '3d-mesh.figure')."""
+    body = request.get_json(silent=True) or {}
+    outputs = body.get('outputs')
+    if isinstance(outputs, list):
+        outputs = outputs[0] if outputs else None
+    if not isinstance(outputs, dict):
+        return 'inconnue'
+    component = outputs.get('id')
+    if isinstance(component, dict):
+        component = json.dumps(component, sort_keys=True)
+    return f"{component}.{outputs.get('property')}"
+
+
+def _start_request():
+    g.metrics_start = time.perf_counter()
+
+
+def _end_request(response):
+    if not request.path.endswith('/_dash-update-component') or 'metrics_start' not in g:
+        return response
+    duration = time.perf_counter() - g.metrics_start
+    output = _output_label()
+    size = response.calculate_content_length()
+    REQUEST_DURATION.observe(duration, output)
+    if size is not None:
+        RESPONSE_BYTES.observe(size, output)
+    if TRACE_LOG:
+        record = dict(
+            time=time.time(), output=output, status=response.status_code, duration_s=round(duration, 6),
+            bytes=size, spans=[dict(function=name, duration_s=round(d, 6)) for name, d in g.get('metrics_spans', [])],
+        )
+        with _trace_lock, open(TRACE_LOG, 'a') as file:
+            file.write(json.dumps(record) + '\n')
+    return response
+
+
+def render():
+    """Contenu de /metrics."""
+    lines = []
+    for histogram in HISTOGRAMS:
+        lines += histogram.render()
+    return '\n'.join(lines) + '\n'
+
+
+def init_app(server):
+    """Ajouter les hooks de mesure et la route /metrics au serveur Flask (si activé)."""
+    if not ENABLED:
+        return
+    server.before_request(_start_request)
+    server.after_request(_end_request)
+    server.add_url_rule(
+        '/metrics', 'metrics',
+        lambda: Response(render(), content_type='text/plain; version=0.0.4; charset=utf-8'),
+    )
@@ -1,120 +1,287 @@
 from dash import html, dcc
 import dash_uploader as du
-import fonctions as fct
+import colormap_registry
+import session_store
 import numpy as np
 
 # Chemins par défaut
 DEFAULT_MESH_PATH = './data/mesh.gii'
-colorscale_names = fct.get_colorscale_names('./custom_colormap')
-
-# Charger les données par défaut
-mesh = fct.load_mesh(DEFAULT_MESH_PATH)
-vertices = mesh.vertices
-faces = mesh.faces
 
 # Définir les plages par défaut
 default_min, default_max = 0, 1
 default_marks = {i: f"{i:.2f}" for i in np.linspace(default_min, default_max, 5)}
 
-# Layout pour la page 1
-layout = html.Div(
-    style={
-        "display": "flex",
-        "flexDirection": "column",
-        "alignItems": "center",
-        "backgroundColor": "#ffffff",
-        "padding": "20px",
-        "height": "calc(100vh - 60px)",
-        "boxSizing": "border-box",
-    },
-    children=[
-        # Contenu principal
-        html.Div(
-            style={
-                "display": "flex",
-                "flexGrow": 1,
-                "width": "100%",
-                "gap": "20px",
-            },
-            children=[
-                # Panneau gauche : Options
-                html.Div(
-                    style={
-                        "flex": "1",
-                        "backgroundColor": "#f9f9f9",
-                        "padding": "20px",
-                        "borderRadius": "8px",
-                        "boxShadow": "0px 4px 8px rgba(0, 0, 0, 0.1)",
-                        "display": "flex",
-                        "flexDirection": "column",
-                        "gap": "20px",
-                    },
-                    children=[
-                        html.Label("Importer un nouveau maillage :", style={"fontWeight": "bold", "fontSize": "16px"}),
-                        du.Upload(id='upload-mesh', text="Importer un maillage", default_style={"padding": "10px"}),
 
-                        html.Label("Importer une texture :", style={"fontWeight": "bold", "fontSize": "16px"}),
-                        du.Upload(id='upload-texture', text="Importer une texture", default_style={"padding": "10px"}),
+def layout():
+    """Construire le layout de la page 1 (appelé à chaque affichage de la page)."""
+    colorscale_names = colormap_registry.get_registry().names()
+
+    # Layout pour la page 1
+    return html.Div(
+        style={
+            "display": "flex",
+            "flexDirection": "column",
+            "alignItems": "center",
+            "backgroundColor": "#ffffff",
+            "padding": "20px",
+            "minHeight": "calc(100vh - 60px)",
+            "boxSizing": "border-box",
+        },
+        children=[
+            # Identifiant de session : le stockage 'session' conserve la valeur déjà attribuée à l'onglet
+            dcc.Store(id='session-id', storage_type='session', data=session_store.new_session_id()),
+            # Contenu principal
+            html.Div(
+                style={
+                    "display": "flex",
+                    "flexGrow": 1,
+                    "width": "100%",
+                    "gap": "20px",
+                },
+                children=[
+                    # Panneau gauche : Options
+                    html.Div(
+                        style={
+                            "flex": "1",
+                            "backgroundColor": "#f9f9f9",
+                            "padding": "20px",
+                            "borderRadius": "8px",
+                            "boxShadow": "0px 4px 8px rgba(0, 0, 0, 0.1)",
+                            "display": "flex",
+                            "flexDirection": "column",
+                            "gap": "20px",
+                        },
+                        children=[
+                            html.Label("Importer un nouveau maillage :", style={"fontWeight": "bold", "fontSize": "16px"}),
+                            du.Upload(id='upload-mesh', text="Importer un maillage", default_style={"padding": "10px"}),
+
+                            html.Label("Importer une texture :", style={"fontWeight": "bold", "fontSize": "16px"}),
+                            du.Upload(id='upload-texture', text="Importer une texture", default_style={"padding": "10px"}),
 
-                        html.Label("Sélectionner une colormap", style={"fontWeight": "bold", "fontSize": "16px"}),
-                        dcc.Dropdown( id='colormap-dropdown', options=[{'label': cmap, 'value': cmap} for cmap in colorscale_names],
-                                     value='Viridis',clearable=False),    
-                        html.Label("Appliquer valeur max sommet aux faces", style={"fontWeight": "bold", "fontSize": "16px"}),
-                        dcc.Checklist(id='toggle-triangle', options=[{'label': 'Oui', 'value': 'on'}], value=[]),
-                        html.Label("Afficher les isolignes", style={"fontWeight": "bold", "fontSize": "16px"}),
-                        dcc.Checklist(id='toggle-contours', options=[{'label': 'Oui', 'value': 'on'}], value=[]),
-                        html.Label("Activer traits noirs", style={"fontWeight": "bold", "fontSize": "16px"}),
-                        dcc.Checklist(id='toggle-black-intervals', options=[{'label': 'Oui', 'value': 'on'}], value=[]),
-                        html.Label("Centrer la colormap sur 0", style={"fontWeight": "bold", "fontSize": "16px"}),
-                        dcc.Checklist(id='toggle-center-colormap', options=[{'label': 'Oui', 'value': 'on'}], value=[]),
-                    ],
-                ),
-                # Zone centrale : Visualisation
-                html.Div(
-                    style={
-                        "flex": "2",
-                        "backgroundColor": "#ffffff",
-                        "padding": "20px",
-                        "borderRadius": "8px",
-                        "boxShadow": "0px 4px 8px rgba(0, 0, 0, 0.1)",
-                        "display": "flex",
-                        "justifyContent": "center",
-                        "alignItems": "center",
-                    },
-                    children=[
-                        dcc.Graph(id='3d-mesh', style={"width": "100%", "height": "100%"}),
-                    ],
-                ),
-                # Panneau droit : Slider
-                html.Div(
-                    style={
-                        "flex": "1",
-                        "backgroundColor": "#f9f9f9",
-                        "padding": "20px",
-                        "borderRadius": "8px",
-                        "boxShadow": "0px 4px 8px rgba(0, 0, 0, 0.1)",
-                        "display": "flex",
-                        "flexDirection": "column",
-                        "justifyContent": "center",
-                        "alignItems": "center",
-                    },
-                    children=[
-                        html.Label("Ajuster la plage de valeurs", style={"fontWeight": "bold", "fontSize": "16px"}),
-                        dcc.RangeSlider(
-                            id='range-slider',
-                            min=default_min,
-                            max=default_max,
-                            step=0.01,
-                            value=[default_min, default_max],
-                            marks=default_marks,
-                            vertical=True,
-                            verticalHeight=500,
-                            tooltip={"placement": "right", "always_visible": True},
-                        ),
-                        html.Div(id='upload-status', style={"color": "green", "marginTop": "10px"}),
-                    ],
-                ),
-            ],
-        ),
-    ],
-)
\ No newline at end of file
+                            html.Label("Sélectionner une colormap", style={"fontWeight": "bold", "fontSize": "16px"}),
+                            dcc.Dropdown( id='colormap-dropdown', options=[{'label': cmap, 'value': cmap} for cmap in colorscale_names],
+                                         value='Viridis',clearable=False),    
+                            html.Label("Appliquer les valeurs des sommets aux faces", style={"fontWeight": "bold", "fontSize": "16px"}),
+                            dcc.Checklist(id='toggle-triangle', options=[{'label': 'Oui', 'value': 'on'}], value=[]),
+                            dcc.Dropdown(
+                                id='face-reducer',
+                                options=[
+                                    {'label': 'Maximum des sommets', 'value': 'max'},
+                                    {'label': 'Minimum des sommets', 'value': 'min'},
+                                    {'label': 'Moyenne des sommets', 'value': 'mean'},
+                                    {'label': 'Médiane des sommets', 'value': 'median'},
+                                    {'label': "Moyenne pondérée par l'aire", 'value': 'area'},
+                                ],
+                                value='max',
+                                clearable=False,
+                            ),
+                            html.Label("Lissage de la texture", style={"fontWeight": "bold", "fontSize": "16px"}),
+                            dcc.RadioItems(
+                                id='smoothing-method',
+                                options=[
+                                    {'label': 'Aucun', 'value': 'none'},
+                                    {'label': 'Laplacien itératif', 'value': 'iterative'},
+                                    {'label': 'Noyau de chaleur (FWHM)', 'value': 'heat'},
+                                ],
+                                value='none',
+                            ),
+                            dcc.RadioItems(
+                                id='smoothing-weights',
+                                options=[
+                                    {'label': 'Poids uniformes', 'value': 'uniform'},
+                                    {'label': 'Poids cotangents', 'value': 'cotangent'},
+                                ],
+                                value='uniform',
+                            ),
+                            html.Div(
+                                style={"display": "flex", "gap": "10px"},
+                                children=[
+                                    dcc.Input(id='smoothing-iterations', type='number', min=1, step=1, value=10,
+                                              debounce=True, placeholder="Itérations"),
+                                    dcc.Input(id='smoothing-fwhm', type='number', min=0, step=0.5, value=5,
+                                              debounce=True, placeholder="FWHM (mm)"),
+                                ],
+                            ),
+                            html.Label("Afficher les isolignes", style={"fontWeight": "bold", "fontSize": "16px"}),
+                            dcc.Checklist(id='toggle-contours', options=[{'label': 'Oui', 'value': 'on'}], value=[]),
+                            dcc.Input(
+                                id='isoline-levels',
+                                type='text',
+                                placeholder="Niveaux (ex. 0.5, 1, 2) ; vide = automatiques",
+                                debounce=True,
+                                style={"width": "100%"},
+                            ),
+                            html.Label("Distance géodésique au clic", style={"fontWeight": "bold", "fontSize": "16px"}),
+                            dcc.Checklist(id='toggle-geodesic', options=[{'label': 'Oui', 'value': 'on'}], value=[]),
+                            html.Label("Activer traits noirs", style={"fontWeight": "bold", "fontSize": "16px"}),
+                            dcc.Checklist(id='toggle-black-intervals', options=[{'label': 'Oui', 'value': 'on'}], value=[]),
+                            html.Label("Centrer la colormap sur 0", style={"fontWeight": "bold", "fontSize": "16px"}),
+                            dcc.Checklist(id='toggle-center-colormap', options=[{'label': 'Oui', 'value': 'on'}], value=[]),
+                            html.Label("Survol", style={"fontWeight": "bold", "fontSize": "16px"}),
+                            dcc.RadioItems(
+                                id='hover-mode',
+                                options=[
+                                    {'label': 'Valeur au survol', 'value': 'template'},
+                                    {'label': 'Valeur calculée par le serveur', 'value': 'lookup'},
+                                    {'label': 'Aucun survol (rapide)', 'value': 'none'},
+                                ],
+                                value='template',
+                            ),
+                            html.Label("Coloration", style={"fontWeight": "bold", "fontSize": "16px"}),
+                            dcc.RadioItems(
+                                id='color-mode',
+                                options=[
+                                    {'label': 'Colorscale (navigateur)', 'value': 'intensity'},
+                                    {'label': 'Couleurs calculées par le serveur (bornes exactes)', 'value': 'vertexcolor'},
+                                ],
+                                value='intensity',
+                            ),
+                            html.Label("Niveau de détail", style={"fontWeight": "bold", "fontSize": "16px"}),
+                            dcc.RadioItems(
+                                id='lod-level',
+                                options=[
+                                    {'label': 'Grossier (interaction)', 'value': 2},
+                                    {'label': 'Intermédiaire', 'value': 1},
+                                    {'label': 'Pleine résolution', 'value': 0},
+                                ],
+                                # Pleine résolution par défaut ; le niveau grossier est utilisé pendant la lecture
+                                value=0,
+                            ),
+                            html.Button(
+                                "Afficher en pleine résolution",
+                                id='full-resolution-btn',
+                                n_clicks=0,
+                                style={"backgroundColor": "#3e4c6d", "color": "white"},
+                            ),
+                        ],
+                    ),
+                    # Zone centrale : Visualisation
+                    html.Div(
+                        style={
+                            "flex": "2",
+                            "backgroundColor": "#ffffff",
+                            "padding": "20px",
+                            "borderRadius": "8px",
+                            "boxShadow": "0px 4px 8px rgba(0, 0, 0, 0.1)",
+                            "display": "flex",
+                            "justifyContent": "center",
+                            "alignItems": "center",
+                        },
+                        children=[
+                            dcc.Graph(id='3d-mesh', style={"width": "100%", "height": "100%"}),
+                        ],
+                    ),
+                    # Panneau droit : Slider
+                    html.Div(
+                        style={
+                            "flex": "1",
+                            "backgroundColor": "#f9f9f9",
+                            "padding": "20px",
+                            "borderRadius": "8px",
+                            "boxShadow": "0px 4px 8px rgba(0, 0, 0, 0.1)",
+                            "display": "flex",
+                            "flexDirection": "column",
+                            "justifyContent": "center",
+                            "alignItems": "center",
+                        },
+                        children=[
+                            html.Label("Ajuster la plage de valeurs", style={"fontWeight": "bold", "fontSize": "16px"}),
+                            # Slider de plage et histogramme des valeurs de la texture, côte à côte
+                            html.Div(
+                                style={"display": "flex", "alignItems": "center", "gap": "10px"},
+                                children=[
+                                    dcc.RangeSlider(
+                                        id='range-slider',
+                                        min=default_min,
+                                        max=default_max,
+                                        step=0.01,
+                                        value=[default_min, default_max],
+                                        marks=default_marks,
+                                        vertical=True,
+                                        verticalHeight=500,
+                                        tooltip={"placement": "right", "always_visible": True},
+                                    ),
+                                    dcc.Graph(id='texture-histogram', config={'displayModeBar': False}),
+                                ],
+                            ),
+                            html.Label("Frame de la texture", style={"fontWeight": "bold", "fontSize": "16px", "marginTop": "20px"}),
+                            html.Div(
+                                style={"width": "100%"},
+                                children=[
+                                    dcc.Slider(
+                                        id='frame-slider', min=0, max=0, step=1, value=0,
+                                        marks=None, tooltip={"placement": "bottom", "always_visible": True},
+                                    ),
+                                ],
+                            ),
+                            html.Button(
+                                "Lecture",
+                                id='play-btn',
+                                n_clicks=0,
+                                style={"backgroundColor": "#3e4c6d", "color": "white"},
+                            ),
+                            dcc.Interval(id='play-interval', interval=200, disabled=True),
+                            # Niveau de détail choisi avant la lecture, rétabli à la pause
+                            dcc.Store(id='lod-before-playback'),
+                            # Lecture en tâche de fond des fichiers importés (visible pendant la tâche)
+                            dcc.Store(id='upload-job'),
+                            html.Div(
+                                id='job-panel',
+                                style={"display": "none"},
+                                children=[
+                                    html.Div(id='job-status'),
+                                    html.Progress(id='job-progress', value='0', max='1', style={"width": "100%"}),
+                                    html.Button(
+                                        "Annuler",
+                                        id='cancel-job-btn',
+                                        n_clicks=0,
+                                        style={"backgroundColor": "#3e4c6d", "color": "white"},
+                                    ),
+                                ],
+                            ),
+                            html.Div(id='upload-status', style={"color": "green", "marginTop": "10px"}),
+                            html.Div(id='hover-info', style={"marginTop": "10px"}),
+                        ],
+                    ),
+                ],
+            ),
+            # Régions au-dessus d'un seuil : composantes connexes de la texture affichée
+            html.Div(
+                style={
+                    "display": "flex",
+                    "width": "100%",
+                    "gap": "20px",
+                    "marginTop": "20px",
+                    "backgroundColor": "#f9f9f9",
+                    "padding": "20px",
+                    "borderRadius": "8px",
+                    "boxShadow": "0px 4px 8px rgba(0, 0, 0, 0.1)",
+                    "boxSizing": "border-box",
+                },
+                children=[
+                    html.Div(
+                        style={"flex": "1", "display": "flex", "flexDirection": "column", "gap": "10px"},
+                        children=[
+                            html.Label("Régions au-dessus du seuil", style={"fontWeight": "bold", "fontSize": "16px"}),
+                            dcc.Checklist(id='toggle-roi', options=[{'label': 'Afficher', 'value': 'on'}], value=[]),
+                            dcc.Checklist(id='roi-two-sided', options=[{'label': 'Valeur absolue', 'value': 'on'}], value=[]),
+                            html.Label("Seuil"),
+                            dcc.Slider(
+                                id='roi-threshold', min=default_min, max=default_max, step=0.01, value=default_max,
+                                marks=None, tooltip={"placement": "bottom", "always_visible": True},
+                            ),
+                            html.Label("Taille minimale (sommets)"),
+                            dcc.Input(id='roi-min-size', type='number', min=1, step=1, value=10, debounce=True),
+                            html.Div(id='roi-table', style={"maxHeight": "300px", "overflowY": "auto"}),
+                        ],
+                    ),
+                    html.Div(
+                        style={"flex": "2"},
+                        children=[
+                            dcc.Graph(id='roi-graph', style={"width": "100%"}),
+                        ],
+                    ),
+                ],
+            ),
+        ],
+    )
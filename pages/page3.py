@@ -0,0 +1,137 @@
+from dash import html, dcc
+import glob
+import os
+from xml.parsers import expat
+import colormap_registry
+import gifti_stream
+import upload_store
+
+# Données de l'application ; les fichiers importés viennent du stockage (upload_store.list_files)
+DATA_DIRECTORIES = ('./data',)
+
+
+def list_gifti_files():
+    """Fichiers GIfTI disponibles (données de l'application et fichiers importés)."""
+    paths = []
+    for directory in DATA_DIRECTORIES:
+        paths += sorted(glob.glob(os.path.join(directory, '*.gii')))
+    paths += [path for path in upload_store.get_store().list_files() if path.endswith('.gii')]
+    return paths
+
+
+# Un maillage contient des sommets (POINTSET) et des triangles (TRIANGLE)
+SURFACE_INTENTS = {'NIFTI_INTENT_POINTSET', 'NIFTI_INTENT_TRIANGLE'}
+SURFACE_CACHE_SIZE = 256
+# (chemin, taille, mtime) -> le fichier est-il un maillage
+_surface_cache = {}
+
+
+def is_surface(path):
+    """Le fichier contient-il un maillage (intentions lues sans décoder les données) ?"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    stamp = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if stamp not in _surface_cache:
+        try:
+            intents = set(gifti_stream.read_intents(path))
+        except (OSError, ValueError, expat.ExpatError):
+            intents = set()
+        if len(_surface_cache) >= SURFACE_CACHE_SIZE:
+            _surface_cache.pop(next(iter(_surface_cache)))
+        _surface_cache[stamp] = SURFACE_INTENTS <= intents
+    return _surface_cache[stamp]
+
+
+def layout():
+    """Construire le layout de la page 3 (appelé à chaque affichage de la page)."""
+    colorscale_names = colormap_registry.get_registry().names()
+    paths = list_gifti_files()
+    meshes = [{'label': path, 'value': path} for path in paths if is_surface(path)]
+    textures = [{'label': path, 'value': path} for path in paths if not is_surface(path)]
+
+    return html.Div(
+        style={
+            "display": "flex",
+            "flexDirection": "column",
+            "alignItems": "center",
+            "backgroundColor": "#ffffff",
+            "padding": "20px",
+            "minHeight": "calc(100vh - 60px)",
+            "boxSizing": "border-box",
+        },
+        children=[
+            # Données partagées avec l'assemblage de la figure côté navigateur (assets/compare.js) :
+            # la géométrie n'est envoyée qu'une fois par maillage, chaque panneau n'ajoute que son intensité
+            dcc.Store(id='compare-geometry'),
+            dcc.Store(id='compare-geometry-key'),
+            dcc.Store(id='compare-panels', data={}),
+            dcc.Store(id='compare-order', data=[]),
+            dcc.Store(id='compare-colorscale'),
+            dcc.Store(id='compare-camera'),
+            html.Div(
+                style={
+                    "display": "flex",
+                    "flexGrow": 1,
+                    "width": "100%",
+                    "gap": "20px",
+                },
+                children=[
+                    # Panneau gauche : Options
+                    html.Div(
+                        style={
+                            "flex": "1",
+                            "backgroundColor": "#f9f9f9",
+                            "padding": "20px",
+                            "borderRadius": "8px",
+                            "boxShadow": "0px 4px 8px rgba(0, 0, 0, 0.1)",
+                            "display": "flex",
+                            "flexDirection": "column",
+                            "gap": "20px",
+                        },
+                        children=[
+                            html.Label("Maillage commun", style={"fontWeight": "bold", "fontSize": "16px"}),
+                            dcc.Dropdown(id='compare-mesh', options=meshes, value='./data/mesh.gii', clearable=False),
+                            html.Label("Textures à comparer", style={"fontWeight": "bold", "fontSize": "16px"}),
+                            dcc.Dropdown(id='compare-textures', options=textures, value=[], multi=True),
+                            html.Label("Sélectionner une colormap", style={"fontWeight": "bold", "fontSize": "16px"}),
+                            dcc.Dropdown(id='compare-colormap', options=[{'label': cmap, 'value': cmap} for cmap in colorscale_names],
+                                         value='Viridis', clearable=False),
+                            html.Label("Activer traits noirs", style={"fontWeight": "bold", "fontSize": "16px"}),
+                            dcc.Checklist(id='compare-black-intervals', options=[{'label': 'Oui', 'value': 'on'}], value=[]),
+                            html.Label("Niveau de détail", style={"fontWeight": "bold", "fontSize": "16px"}),
+                            dcc.RadioItems(
+                                id='compare-lod',
+                                options=[
+                                    {'label': 'Grossier (interaction)', 'value': 2},
+                                    {'label': 'Intermédiaire', 'value': 1},
+                                    {'label': 'Pleine résolution', 'value': 0},
+                                ],
+                                value=1,
+                            ),
+                            html.Label("Plage de valeurs commune", style={"fontWeight": "bold", "fontSize": "16px"}),
+                            dcc.RangeSlider(
+                                id='compare-range', min=0, max=1, step=0.01, value=[0, 1],
+                                marks=None, tooltip={"placement": "bottom", "always_visible": True},
+                            ),
+                            html.Div(id='compare-status', style={"color": "green"}),
+                        ],
+                    ),
+                    # Zone centrale : grille des panneaux (caméras synchronisées)
+                    html.Div(
+                        style={
+                            "flex": "3",
+                            "backgroundColor": "#ffffff",
+                            "padding": "20px",
+                            "borderRadius": "8px",
+                            "boxShadow": "0px 4px 8px rgba(0, 0, 0, 0.1)",
+                        },
+                        children=[
+                            dcc.Graph(id='compare-graph', style={"width": "100%"}),
+                        ],
+                    ),
+                ],
+            ),
+        ],
+    )
@@ -0,0 +1,289 @@
+"""
+Stockage côté serveur de l'état de chaque session navigateur.
+
+Chaque onglet reçoit un identifiant de session (dcc.Store 'session-id') ; les callbacks
+lisent et écrivent leur état (tableaux du maillage, texture, colormap en cours...)
+dans un SessionStore au lieu de variables globales partagées par tous les utilisateurs.
+
+Deux backends :
+- MemoryBackend : LRU dans la mémoire du processus (un seul worker) ;
+- DiskBackend : un répertoire par session, partagé entre workers ; les tableaux sont
+  stockés en .npy (liens physiques vers le cache des maillages quand c'est possible)
+  et relus en memory-map.
+Les deux appliquent une durée de vie (TTL) et un budget mémoire/disque.
+"""
+import os
+import pickle
+import re
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+SESSION_ID_PATTERN = re.compile(r'[0-9a-f]{32}')
+DEFAULT_TTL = float(os.environ.get('NEUROMESH_SESSION_TTL', 3600))
+DEFAULT_MAX_BYTES = int(os.environ.get('NEUROMESH_SESSION_MAX_BYTES', 2 * 1024 ** 3))
+DEFAULT_DIRECTORY = os.environ.get('NEUROMESH_SESSION_DIR', './.sessions')
+
+
+def new_session_id():
+    """Générer un identifiant de session."""
+    return uuid.uuid4().hex
+
+
+def estimate_size(value):
+    """Estimer la mémoire occupée par une valeur d'état (les memory-maps ne comptent pas)."""
+    if isinstance(value, np.memmap):
+        return 0
+    if isinstance(value, np.ndarray):
+        return 0 if isinstance(value.base, np.memmap) else value.nbytes
+    if isinstance(value, dict):
+        return sum(estimate_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_size(v) for v in value)
+    if hasattr(value, 'data') and hasattr(value, 'indices'):  # Matrice creuse scipy
+        return value.data.nbytes + value.indices.nbytes
+    return sys.getsizeof(value)
+
+
+class MemoryBackend:
+    """LRU en mémoire avec TTL et budget mémoire."""
+
+    def __init__(self, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # clé -> (dernier accès, taille, état)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry[0] > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries[key] = (time.time(), entry[1], entry[2])
+            self._entries.move_to_end(key)
+            return dict(entry[2])
+
+    def update(self, key, fields):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            state = dict(entry[2]) if entry is not None else {}
+            state.update(fields)
+            self._entries[key] = (time.time(), estimate_size(state), state)
+            self._evict()
+            return dict(state)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def _evict(self):
+        now = time.time()
+        for key in [k for k, (accessed, _, _) in self._entries.items() if now - accessed > self.ttl]:
+            del self._entries[key]
+        total = sum(size for _, size, _ in self._entries.values())
+        # Toujours garder l'entrée la plus récente (celle qui vient d'être écrite)
+        while total > self.max_bytes and len(self._entries) > 1:
+            _, (_, size, _) = self._entries.popitem(last=False)
+            total -= size
+
+
+def find_npy_source(array):
+    """
+    Retourne le fichier .npy dont `array` est une vue complète en memory-map, ou None.
+
+    Permet au DiskBackend de lier un tableau du cache des maillages au lieu de le copier.
+    """
+    base = array
+    while base is not None:
+        if isinstance(base, np.memmap) and base.filename and str(base.filename).endswith('.npy'):
+            try:
+                source = np.load(base.filename, mmap_mode='r')
+            except (OSError, ValueError):
+                return None
+            if (source.shape == array.shape and source.dtype == array.dtype
+                    and source.offset == base.offset and array.flags['C_CONTIGUOUS']
+                    and array.__array_interface__['data'][0] == base.__array_interface__['data'][0]):
+                return str(base.filename)
+            return None
+        base = getattr(base, 'base', None)
+    return None
+
+
+class DiskBackend:
+    """
+    Un répertoire par session ; un fichier par champ d'état.
+
+    Les tableaux sont écrits en .npy et relus en memory-map ; un tableau qui provient déjà
+    d'un .npy en memory-map (cache des maillages) devient un lien physique vers ce fichier :
+    pas de copie, et le tableau reste lisible après l'éviction de l'entrée du cache. Les
+    autres valeurs sont picklées. La date de modification du répertoire sert de dernier
+    accès pour le TTL et l'éviction LRU.
+    """
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if time.time() - os.stat(path).st_mtime > self.ttl:
+                shutil.rmtree(path, ignore_errors=True)
+                return None
+            os.utime(path)
+            names = os.listdir(path)
+        except OSError:
+            return None
+
+        state = {}
+        for name in names:
+            field, ext = os.path.splitext(name)
+            filepath = os.path.join(path, name)
+            try:
+                if ext == '.npy':
+                    state[field] = np.load(filepath, mmap_mode='r')
+                elif ext == '.pkl':
+                    with open(filepath, 'rb') as file:
+                        state[field] = pickle.load(file)
+            except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+                # Champ en cours de réécriture : ignoré
+                continue
+        return state
+
+    def update(self, key, fields):
+        path = self._path(key)
+        os.makedirs(path, exist_ok=True)
+        for field, value in fields.items():
+            if isinstance(value, np.ndarray):
+                ext = '.npy'
+                source = find_npy_source(value)
+                if source is None or not self._link_atomic(source, path, field + ext):
+                    self._write_atomic(path, field + ext, lambda f: np.save(f, np.ascontiguousarray(value)))
+            else:
+                ext = '.pkl'
+                self._write_atomic(path, field + ext, lambda f: pickle.dump(value, f))
+            # Supprimer l'ancienne version du champ si elle était dans un autre format
+            for other in {'.npy', '.pkl'} - {ext}:
+                try:
+                    os.remove(os.path.join(path, field + other))
+                except FileNotFoundError:
+                    pass
+        os.utime(path)
+        self._evict()
+        return self.get(key)
+
+    def delete(self, key):
+        shutil.rmtree(self._path(key), ignore_errors=True)
+
+    @staticmethod
+    def _write_atomic(directory, name, write):
+        fd, tmp = tempfile.mkstemp(prefix='.tmp-', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                write(file)
+            os.replace(tmp, os.path.join(directory, name))
+        except Exception:
+            os.remove(tmp)
+            raise
+
+    @staticmethod
+    def _link_atomic(source, directory, name):
+        """Lien physique `directory/name` vers `source` ; False si impossible (autre système de fichiers...)."""
+        target = os.path.join(directory, name)
+        try:
+            if os.path.samefile(source, target):
+                return True  # Déjà lié (tableau relu depuis la session)
+        except OSError:
+            pass
+        tmp = os.path.join(directory, f'.tmp-{uuid.uuid4().hex}')
+        try:
+            os.link(source, tmp)
+        except OSError:
+            return False
+        os.replace(tmp, target)
+        return True
+
+    def _evict(self):
+        now = time.time()
+        entries = []
+        total = 0
+        for entry in os.scandir(self.directory):
+            if not entry.is_dir():
+                continue
+            accessed = entry.stat().st_mtime
+            if now - accessed > self.ttl:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                continue
+            size = sum(f.stat().st_size for f in os.scandir(entry.path) if f.is_file())
+            entries.append((accessed, size, entry.path))
+            total += size
+        for _, size, path in sorted(entries)[:-1]:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+
+class SessionStore:
+    """
+    État par session pour une page de l'application.
+
+    :param backend: MemoryBackend ou DiskBackend (peut être partagé entre plusieurs stores).
+    :param namespace: Préfixe des clés, pour séparer l'état de chaque page.
+    """
+
+    def __init__(self, backend, namespace):
+        self.backend = backend
+        self.namespace = namespace
+
+    def _key(self, session_id):
+        if not isinstance(session_id, str) or not SESSION_ID_PATTERN.fullmatch(session_id):
+            raise ValueError(f"Identifiant de session invalide : {session_id!r}")
+        return f'{self.namespace}-{session_id}'
+
+    def get(self, session_id):
+        """Retourne l'état de la session (dict vide si inconnue ou expirée)."""
+        return self.backend.get(self._key(session_id)) or {}
+
+    def update(self, session_id, **fields):
+        """Mettre à jour certains champs de l'état et retourner l'état complet."""
+        return self.backend.update(self._key(session_id), fields)
+
+    def delete(self, session_id):
+        self.backend.delete(self._key(session_id))
+
+
+_default_backend = None
+
+
+def get_backend():
+    """
+    Backend partagé, choisi par la variable d'environnement NEUROMESH_SESSION_BACKEND
+    ('memory' par défaut, 'disk' pour plusieurs workers).
+    """
+    global _default_backend
+    if _default_backend is None:
+        if os.environ.get('NEUROMESH_SESSION_BACKEND', 'memory') == 'disk':
+            _default_backend = DiskBackend()
+        else:
+            _default_backend = MemoryBackend()
+    return _default_backend
+
+
+def create_store(namespace):
+    """Créer un SessionStore sur le backend partagé."""
+    return SessionStore(get_backend(), namespace)
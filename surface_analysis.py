@@ -0,0 +1,489 @@
+"""
+Analyses sur la surface du maillage : graphe d'adjacence des sommets, régions au-dessus
+d'un seuil (composantes connexes), extraction de sous-maillages, lissage des textures et
+distance géodésique (méthode de la chaleur).
+
+La matrice d'adjacence (CSR scipy) et les aires des triangles sont construites une fois
+par maillage puis gardées en mémoire (voir get_mesh_topology) : déplacer le slider du
+seuil ne refait que des opérations vectorisées sur les sommets et les faces.
+"""
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse import csgraph
+from scipy.sparse import linalg as sparse_linalg
+
+import fonctions as fct
+import metrics
+
+TOPOLOGY_CACHE_SIZE = 4
+# Nombre maximal de régions affichées (les plus grandes)
+MAX_DISPLAYED_CLUSTERS = 20
+# Palette qualitative des régions (plotly.colors.qualitative.Plotly)
+CLUSTER_COLORS = ('#636EFA', '#EF553B', '#00CC96', '#AB63FA', '#FFA15A',
+                  '#19D3F3', '#FF6692', '#B6E880', '#FF97FF', '#FECB52')
+_topology_cache = {}
+_topology_lock = threading.Lock()
+
+# Lissage des textures : poids de l'opérateur et méthodes (voir smooth_scalars)
+SMOOTHING_WEIGHTS = ('uniform', 'cotangent')
+SMOOTHING_METHODS = ('iterative', 'heat')
+# Poids du voisinage à chaque itération du lissage laplacien itératif
+ITERATIVE_STEP = 0.5
+# Nombre maximal de pas du lissage par la chaleur (FWHM trop grande pour le maillage au-delà)
+HEAT_MAX_STEPS = 2000
+# Le pas de temps suit ce quantile de 'rate' : les quelques sommets quasi dégénérés (aire
+# minuscule) diffusent un peu moins vite au lieu d'imposer des centaines de pas
+HEAT_RATE_QUANTILE = 0.99
+OPERATOR_CACHE_SIZE = 4
+_operator_cache = {}
+SMOOTHED_CACHE_SIZE = 16
+_smoothed_cache = {}
+_smoothing_lock = threading.Lock()
+
+# Distance géodésique : facteur du pas de temps t = GEODESIC_TIME_FACTOR * h² (Crane et al. 2013)
+GEODESIC_TIME_FACTOR = 1.0
+# Les factorisations occupent plusieurs centaines de Mo pour un maillage de 150k sommets
+GEODESIC_CACHE_SIZE = 2
+_geodesic_cache = {}
+# Constructions en cours : content_hash -> Future du solveur
+_geodesic_builds = {}
+_geodesic_lock = threading.Lock()
+
+
+def vertex_adjacency(faces, n_vertices):
+    """
+    Matrice d'adjacence (CSR, symétrique, booléenne) des sommets reliés par une arête.
+
+    :param faces: Tableau (M, 3) des indices des triangles.
+    :param n_vertices: Nombre de sommets du maillage.
+    """
+    faces = np.asarray(faces)
+    rows = np.concatenate([faces[:, 0], faces[:, 1], faces[:, 2]])
+    cols = np.concatenate([faces[:, 1], faces[:, 2], faces[:, 0]])
+    data = np.ones(len(rows), dtype=bool)
+    adjacency = sparse.coo_matrix((data, (rows, cols)), shape=(n_vertices, n_vertices)).tocsr()
+    # Une arête intérieure apparaît dans deux triangles, une fois dans chaque sens
+    adjacency = (adjacency + adjacency.T).tocsr()
+    adjacency.sum_duplicates()
+    return adjacency
+
+
+def get_mesh_topology(vertices, faces, content_hash=None):
+    """
+    Retourne {'adjacency', 'triangle_areas'} du maillage, calculés une seule fois par maillage.
+
+    Sans `content_hash` (mesh.metadata['content_hash']), rien n'est mis en cache.
+    """
+    if content_hash is not None:
+        cached = _topology_cache.get(content_hash)
+        if cached is not None:
+            return cached
+
+    vertices, faces = np.asarray(vertices), np.asarray(faces)
+    topology = dict(
+        adjacency=vertex_adjacency(faces, len(vertices)),
+        triangle_areas=fct.triangle_areas(vertices, faces),
+    )
+    if content_hash is not None:
+        with _topology_lock:
+            if len(_topology_cache) >= TOPOLOGY_CACHE_SIZE:
+                _topology_cache.pop(next(iter(_topology_cache)))
+            _topology_cache[content_hash] = topology
+    return topology
+
+
+@metrics.timed('threshold_clusters')
+def threshold_clusters(faces, scalars, threshold, topology, min_vertices=1, two_sided=False):
+    """
+    Régions connexes de sommets au-dessus d'un seuil.
+
+    :param faces: Tableau (M, 3) des indices des triangles.
+    :param scalars: Tableau (N,) des valeurs aux sommets.
+    :param threshold: Seuil ; un sommet est retenu si sa valeur est >= threshold
+                      (|valeur| >= threshold si two_sided).
+    :param topology: Résultat de get_mesh_topology pour ce maillage.
+    :param min_vertices: Les régions plus petites sont ignorées.
+    :return: Tuple (labels, clusters) :
+        labels : tableau (N,) int32, numéro de région de chaque sommet (-1 hors région),
+                 les régions étant numérotées par taille décroissante ;
+        clusters : liste de dicts {'label', 'vertices', 'area', 'peak', 'peak_vertex'}, où
+                   'area' est l'aire des triangles dont les trois sommets sont dans la région
+                   et 'peak' la valeur extrême (en valeur absolue si two_sided).
+    """
+    scalars = np.asarray(scalars)
+    values = np.abs(scalars) if two_sided else scalars
+    mask = values >= threshold  # Les NaN ne sont jamais retenus
+    labels = np.full(len(scalars), -1, dtype=np.int32)
+    selected = np.flatnonzero(mask)
+    if not len(selected):
+        return labels, []
+
+    # Composantes connexes du graphe restreint aux sommets retenus
+    adjacency = topology['adjacency']
+    n_components, components = csgraph.connected_components(
+        adjacency[selected][:, selected], directed=False)
+    sizes = np.bincount(components, minlength=n_components)
+
+    # Numérotation par taille décroissante, régions trop petites écartées
+    order = np.argsort(-sizes, kind='stable')
+    order = order[sizes[order] >= min_vertices]
+    relabel = np.full(n_components, -1, dtype=np.int32)
+    relabel[order] = np.arange(len(order), dtype=np.int32)
+    labels[selected] = relabel[components]
+    if not len(order):
+        return labels, []
+
+    kept = labels[selected] >= 0
+    vertex_ids, vertex_labels = selected[kept], labels[selected][kept]
+
+    # Aire : triangles dont les trois sommets sont dans la même région
+    face_labels = labels[faces]
+    inside = (face_labels[:, 0] >= 0) & (face_labels[:, 0] == face_labels[:, 1]) & (face_labels[:, 1] == face_labels[:, 2])
+    areas = np.bincount(face_labels[inside, 0], weights=topology['triangle_areas'][inside], minlength=len(order))
+
+    # Pic : dernier sommet de chaque région une fois triés par (région, valeur)
+    by_value = np.lexsort((values[vertex_ids], vertex_labels))
+    last = np.flatnonzero(np.diff(vertex_labels[by_value], append=len(order)))
+    peak_vertices = vertex_ids[by_value[last]]
+
+    clusters = [
+        dict(label=int(label), vertices=int(count), area=float(area),
+             peak=float(scalars[peak]), peak_vertex=int(peak))
+        for label, (count, area, peak) in enumerate(zip(sizes[order], areas, peak_vertices))
+    ]
+    return labels, clusters
+
+
+def extract_submesh(vertices, faces, vertex_mask):
+    """
+    Sous-maillage formé des triangles dont les trois sommets sont sélectionnés.
+
+    :param vertex_mask: Tableau (N,) booléen des sommets à garder.
+    :return: Tuple (sommets, faces réindexées, indices des sommets gardés dans le maillage d'origine).
+    """
+    vertex_mask = np.asarray(vertex_mask, dtype=bool)
+    face_mask = vertex_mask[faces].all(axis=1)
+    indices = np.flatnonzero(vertex_mask)
+    new_index = np.full(len(vertex_mask), -1, dtype=np.int64)
+    new_index[indices] = np.arange(len(indices))
+    return np.asarray(vertices)[indices], new_index[faces[face_mask]], indices
+
+
+def plot_clusters(vertices, faces, labels, clusters, max_clusters=MAX_DISPLAYED_CLUSTERS, transport=None,
+                  height=400):
+    """
+    Figure 3D des régions au-dessus du seuil : sous-maillage coloré par région et pic de chaque région.
+
+    Seules les `max_clusters` plus grandes régions sont envoyées au navigateur.
+
+    :param labels: Numéro de région de chaque sommet (voir threshold_clusters).
+    :param clusters: Régions retournées par threshold_clusters.
+    :param transport: Encodage des tableaux envoyés au navigateur (voir fct.TRANSPORT_PRESETS).
+    """
+    import plotly.graph_objects as go
+
+    layout = dict(
+        scene=dict(xaxis=dict(visible=False), yaxis=dict(visible=False), zaxis=dict(visible=False),
+                   aspectmode='data'),
+        uirevision='roi',
+        height=height,
+        margin=dict(l=0, r=0, t=0, b=0),
+        showlegend=False,
+    )
+    shown = clusters[:max_clusters]
+    if not shown:
+        return go.Figure(layout=layout)
+
+    labels = np.asarray(labels)
+    sub_vertices, sub_faces, indices = extract_submesh(vertices, faces, (labels >= 0) & (labels < len(shown)))
+    # Couleur par région : numéro de région en intensité, colorscale en paliers sur la palette
+    steps = []
+    for label in range(len(shown)):
+        color = CLUSTER_COLORS[label % len(CLUSTER_COLORS)]
+        steps += [[label / len(shown), color], [(label + 1) / len(shown), color]]
+    intensity = labels[indices].astype(np.uint8)
+    if fct.get_transport(transport)['geometry'] is not None:
+        intensity = fct.encode_typed_array(intensity, 'uint8')
+    mesh = go.Mesh3d(
+        **fct.encode_geometry(sub_vertices, sub_faces, transport),
+        intensity=intensity,
+        intensitymode='vertex',
+        colorscale=steps,
+        cmin=-0.5,
+        cmax=len(shown) - 0.5,
+        showscale=False,
+        flatshading=False,
+        lighting=dict(ambient=0.3, diffuse=0.7, specular=0.1, roughness=0.8, fresnel=0.5),
+        hoverinfo='skip',
+    )
+    peaks = np.asarray(vertices)[[cluster['peak_vertex'] for cluster in shown]]
+    markers = go.Scatter3d(
+        x=peaks[:, 0].tolist(), y=peaks[:, 1].tolist(), z=peaks[:, 2].tolist(),
+        mode='markers+text',
+        text=[str(cluster['label'] + 1) for cluster in shown],
+        customdata=[cluster['peak'] for cluster in shown],
+        marker=dict(size=4, color='black'),
+        hovertemplate='Région %{text} : pic %{customdata:.3f}<extra></extra>',
+    )
+    return go.Figure(data=[mesh, markers], layout=layout)
+
+
+def cotangent_weights(vertices, faces, clamp=True):
+    """
+    Matrice (CSR, symétrique) des poids cotangents : w_ij = (cot α + cot β) / 2.
+
+    Avec `clamp`, les poids négatifs (triangles obtus) sont ramenés à 0 : le lissage reste
+    une moyenne pondérée des voisins, sans oscillation.
+    """
+    vertices, faces = np.asarray(vertices, dtype=np.float64), np.asarray(faces)
+    rows, cols, weights = [], [], []
+    for corner in range(3):
+        # Angle au sommet `corner`, opposé à l'arête (i, j)
+        k, i, j = faces[:, corner], faces[:, (corner + 1) % 3], faces[:, (corner + 2) % 3]
+        u, v = vertices[i] - vertices[k], vertices[j] - vertices[k]
+        sine = np.linalg.norm(np.cross(u, v), axis=1)
+        cot = np.einsum('ij,ij->i', u, v) / np.maximum(sine, np.finfo(np.float64).tiny)
+        rows += [i, j]
+        cols += [j, i]
+        weights += [(np.maximum(cot, 0) if clamp else cot) / 2] * 2
+    n = len(vertices)
+    return sparse.csr_matrix((np.concatenate(weights), (np.concatenate(rows), np.concatenate(cols))), shape=(n, n))
+
+
+def smoothing_operator(vertices, faces, weights='uniform', content_hash=None):
+    """
+    Opérateur de lissage du maillage, construit une seule fois par maillage et par type de poids.
+
+    L'opérateur de Laplace-Beltrami s'écrit Δf = rate * (neighbors @ f - f) :
+    'neighbors' est la moyenne pondérée des voisins (CSR, lignes de somme 1) et 'rate'
+    (mm^-2, par sommet) le facteur d'échelle. Poids 'uniform' : rate = 4 / h² (h : longueur
+    moyenne des arêtes) ; 'cotangent' : rate = somme des poids / aire du sommet.
+
+    :return: Dict {'neighbors', 'rate'}.
+    """
+    if weights not in SMOOTHING_WEIGHTS:
+        raise ValueError(f"Poids inconnus : {weights}. Choix possibles : {SMOOTHING_WEIGHTS}")
+    key = (content_hash, weights)
+    if content_hash is not None:
+        cached = _operator_cache.get(key)
+        if cached is not None:
+            return cached
+
+    vertices, faces = np.asarray(vertices), np.asarray(faces)
+    if weights == 'uniform':
+        matrix = get_mesh_topology(vertices, faces, content_hash)['adjacency'].astype(np.float64)
+    else:
+        matrix = cotangent_weights(vertices, faces)
+    degree = np.asarray(matrix.sum(axis=1)).ravel()
+    isolated = degree == 0
+    # Sommets sans voisin : valeur conservée
+    neighbors = sparse.diags(1 / np.where(isolated, 1, degree)) @ matrix + sparse.diags(isolated.astype(np.float64))
+    if weights == 'uniform':
+        edges = matrix.tocoo()
+        edge_length = np.linalg.norm(vertices[edges.row] - vertices[edges.col], axis=1).mean()
+        rate = np.where(isolated, 0, 4 / edge_length ** 2)
+    else:
+        area = fct.vertex_areas(vertices, faces)
+        rate = np.where(isolated | (area == 0), 0, degree / np.where(area == 0, 1, area))
+    operator = dict(neighbors=neighbors.tocsr(), rate=rate)
+
+    if content_hash is not None:
+        with _smoothing_lock:
+            if len(_operator_cache) >= OPERATOR_CACHE_SIZE:
+                _operator_cache.pop(next(iter(_operator_cache)))
+            _operator_cache[key] = operator
+    return operator
+
+
+def heat_steps(operator, fwhm):
+    """
+    Pas de temps et nombre de pas explicites pour un noyau de chaleur de largeur `fwhm` (mm).
+
+    Diffuser pendant t = σ² / 2 équivaut à un noyau gaussien d'écart type σ = FWHM / sqrt(8 ln 2).
+    Le pas vérifie dt * rate <= 1 pour (presque) tous les sommets, voir HEAT_RATE_QUANTILE.
+    """
+    sigma = fwhm / np.sqrt(8 * np.log(2))
+    duration = sigma ** 2 / 2
+    n_steps = max(int(np.ceil(duration * np.quantile(operator['rate'], HEAT_RATE_QUANTILE))), 1)
+    if n_steps > HEAT_MAX_STEPS:
+        raise ValueError(f"FWHM de {fwhm} mm trop grande pour ce maillage ({n_steps} pas nécessaires, "
+                         f"maximum {HEAT_MAX_STEPS}).")
+    return duration / n_steps, n_steps
+
+
+@metrics.timed('smooth_scalars')
+def smooth_scalars(vertices, faces, scalars, method='iterative', weights='uniform', amount=1,
+                   content_hash=None, scalars_key=None):
+    """
+    Lisser une texture sur le maillage.
+
+    - 'iterative' : `amount` itérations de f <- (1 - λ) f + λ * moyenne des voisins (λ = ITERATIVE_STEP) ;
+    - 'heat' : diffusion équivalente à un noyau gaussien de largeur à mi-hauteur `amount` (mm).
+
+    L'opérateur est mis en cache par maillage (`content_hash`) : chaque itération n'est
+    qu'un produit matrice creuse - vecteur. Avec `scalars_key` (identifiant du contenu des
+    scalars), le résultat est mis en cache pour chaque jeu de paramètres.
+    Les valeurs NaN sont ignorées (moyenne normalisée sur les valeurs valides) et restent NaN.
+
+    :return: Tableau (N,) float32 des valeurs lissées.
+    :raises ValueError: Si la méthode ou les poids sont inconnus, ou la FWHM trop grande.
+    """
+    if method not in SMOOTHING_METHODS:
+        raise ValueError(f"Méthode de lissage inconnue : {method}. Choix possibles : {SMOOTHING_METHODS}")
+    key = (scalars_key, method, weights, amount)
+    if scalars_key is not None:
+        cached = _smoothed_cache.get(key)
+        if cached is not None:
+            return cached
+
+    operator = smoothing_operator(vertices, faces, weights, content_hash)
+    neighbors = operator['neighbors']
+    scalars = np.asarray(scalars, dtype=np.float64)
+    valid = np.isfinite(scalars)
+    # Valeurs et masque des valeurs valides lissés ensemble : un produit par itération
+    values = np.column_stack([np.where(valid, scalars, 0), valid])
+    if method == 'iterative':
+        for _ in range(int(amount)):
+            values = (1 - ITERATIVE_STEP) * values + ITERATIVE_STEP * (neighbors @ values)
+    elif amount > 0:
+        dt, n_steps = heat_steps(operator, amount)
+        # Chaque pas reste une moyenne pondérée des voisins : schéma explicite stable
+        step = np.minimum(dt * operator['rate'], 1)[:, None]
+        for _ in range(n_steps):
+            values = values + step * (neighbors @ values - values)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        smoothed = np.where(valid, values[:, 0] / values[:, 1], np.nan).astype(np.float32)
+
+    if scalars_key is not None:
+        with _smoothing_lock:
+            if len(_smoothed_cache) >= SMOOTHED_CACHE_SIZE:
+                _smoothed_cache.pop(next(iter(_smoothed_cache)))
+            _smoothed_cache[key] = smoothed
+    return smoothed
+
+
+def geodesic_solver(vertices, faces, content_hash=None):
+    """
+    Systèmes de la méthode de la chaleur factorisés une seule fois par maillage.
+
+    - chaleur : (M - t L) u = δ, M matrice de masse (aires des sommets), L laplacien cotangent ;
+    - Poisson : -L φ = -div X, régularisé par ε M (L est singulière).
+    Chaque distance ne coûte ensuite que deux résolutions triangulaires (voir geodesic_distance).
+    Les factorisations SuperLU ne sont pas sérialisables : le cache est en mémoire, par maillage.
+    Une seule construction par maillage : un appel pendant sa factorisation (lancée à l'avance
+    en tâche de fond) attend son résultat au lieu de la refaire. Le verrou global ne protège
+    que les dictionnaires : les autres maillages, déjà en cache ou non, n'attendent pas.
+
+    :return: Dict {'heat', 'poisson'} (fonctions de résolution) et données géométriques des faces.
+    """
+    if content_hash is None:
+        return build_geodesic_solver(vertices, faces)
+    cached = _geodesic_cache.get(content_hash)
+    if cached is not None:
+        return cached
+    with _geodesic_lock:
+        cached = _geodesic_cache.get(content_hash)
+        if cached is not None:
+            return cached
+        future = _geodesic_builds.get(content_hash)
+        building = future is None
+        if building:
+            future = _geodesic_builds[content_hash] = Future()
+    if not building:
+        return future.result()
+
+    try:
+        solver = build_geodesic_solver(vertices, faces)
+    except BaseException as e:
+        with _geodesic_lock:
+            del _geodesic_builds[content_hash]
+        future.set_exception(e)
+        raise
+    with _geodesic_lock:
+        if len(_geodesic_cache) >= GEODESIC_CACHE_SIZE:
+            _geodesic_cache.pop(next(iter(_geodesic_cache)))
+        _geodesic_cache[content_hash] = solver
+        del _geodesic_builds[content_hash]
+    future.set_result(solver)
+    return solver
+
+
+@metrics.timed('build_geodesic_solver')
+def build_geodesic_solver(vertices, faces):
+    """Factoriser les systèmes de la méthode de la chaleur (voir geodesic_solver)."""
+    vertices, faces = np.asarray(vertices, dtype=np.float64), np.asarray(faces)
+    weights = cotangent_weights(vertices, faces, clamp=False)
+    laplacian = weights - sparse.diags(np.asarray(weights.sum(axis=1)).ravel())
+    mass = sparse.diags(fct.vertex_areas(vertices, faces))
+    edges = weights.tocoo()
+    time_step = GEODESIC_TIME_FACTOR * np.linalg.norm(vertices[edges.row] - vertices[edges.col], axis=1).mean() ** 2
+    epsilon = 1e-8 * abs(laplacian.diagonal()).mean() / mass.diagonal().mean()
+
+    # Gradient par face : ∇u = Σ u_i (N × e_i) / (2 A), e_i arête opposée au sommet i
+    corners = vertices[faces]
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    double_areas = np.linalg.norm(normals, axis=1)
+    normals /= np.maximum(double_areas, np.finfo(np.float64).tiny)[:, None]
+    opposite = np.stack([corners[:, 2] - corners[:, 1], corners[:, 0] - corners[:, 2],
+                         corners[:, 1] - corners[:, 0]], axis=1)
+    gradient_basis = np.cross(normals[:, None, :], opposite) / np.maximum(double_areas, np.finfo(np.float64).tiny)[:, None, None]
+
+    return dict(
+        heat=sparse_linalg.factorized((mass - time_step * laplacian).tocsc()),
+        poisson=sparse_linalg.factorized((epsilon * mass - laplacian).tocsc()),
+        gradient_basis=gradient_basis,
+        opposite=opposite,
+        n_vertices=len(vertices),
+        # Composante connexe de chaque sommet (sommets non atteignables, voir geodesic_distance)
+        components=csgraph.connected_components(vertex_adjacency(faces, len(vertices)), directed=False)[1],
+    )
+
+
+@metrics.timed('geodesic_distance')
+def geodesic_distance(vertices, faces, source, content_hash=None):
+    """
+    Distance géodésique (mm) de chaque sommet au sommet `source`, par la méthode de la chaleur.
+
+    Les sommets d'une autre composante connexe que la source (autre hémisphère) valent NaN.
+
+    :return: Tableau (N,) float32.
+    """
+    faces = np.asarray(faces)
+    solver = geodesic_solver(vertices, faces, content_hash)
+    impulse = np.zeros(solver['n_vertices'])
+    impulse[source] = 1
+    heat = solver['heat'](impulse)
+
+    # Champ de vecteurs unitaires X = -∇u / |∇u| sur chaque face
+    gradient = np.einsum('fi,fid->fd', heat[faces], solver['gradient_basis'])
+    norm = np.linalg.norm(gradient, axis=1, keepdims=True)
+    field = -gradient / np.where(norm > 0, norm, 1)
+
+    # Divergence intégrée aux sommets : ½ Σ cot θ_k (e_k · X) sur les arêtes de chaque face
+    opposite = solver['opposite']
+    divergence = np.zeros(solver['n_vertices'])
+    for corner in range(3):
+        i, j = (corner + 1) % 3, (corner + 2) % 3
+        # Arête de i vers j, opposée au coin `corner` : cot de l'angle en ce coin
+        u, v = opposite[:, j], -opposite[:, i]
+        sine = np.linalg.norm(np.cross(u, v), axis=1)
+        cot = np.einsum('fd,fd->f', u, v) / np.maximum(sine, np.finfo(np.float64).tiny)
+        flux = 0.5 * cot * np.einsum('fd,fd->f', opposite[:, corner], field)
+        divergence += np.bincount(faces[:, i], weights=flux, minlength=len(divergence))
+        divergence -= np.bincount(faces[:, j], weights=flux, minlength=len(divergence))
+
+    distance = solver['poisson'](-divergence)
+    distance -= distance[source]
+
+    # Sommets non atteignables : autre composante connexe que la source
+    components = solver['components']
+    distance[components != components[source]] = np.nan
+    return distance.astype(np.float32)
+
+
+def nearest_vertex(vertices, point):
+    """Indice du sommet le plus proche d'un point (x, y, z), ex. le point cliqué sur la figure."""
+    return int(np.argmin(((np.asarray(vertices) - np.asarray(point, dtype=np.float64)) ** 2).sum(axis=1)))
@@ -0,0 +1,45 @@
+"""
+Budget de temps d'import : un worker doit pouvoir servir sans payer le chargement du
+maillage par défaut ni l'import des bibliothèques lourdes (voir fonctions.py).
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Temps d'import cumulé (ms) de nos modules, dash étant déjà importé
+IMPORT_BUDGET_MS = 400
+MODULES = ('fonctions', 'pages.page1', 'pages.page2', 'pages.page3')
+HEAVY_MODULES = ('nibabel', 'trimesh', 'matplotlib', 'scipy')
+
+
+def run_importtime():
+    """Importer MODULES dans un nouvel interpréteur avec -X importtime."""
+    code = (
+        "import sys, dash\n"
+        f"import {', '.join(MODULES)}\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    # Lignes 'import time: <self µs> | <cumulé µs> | <module>'
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, total, name = line[len('import time:'):].split('|')
+            if total.strip().isdigit():
+                cumulative[name.strip()] = int(total)
+    return cumulative, result.stdout.strip()
+
+
+def test_import_time_budget():
+    cumulative, _ = run_importtime()
+    total_ms = sum(cumulative.get(name, 0) for name in MODULES) / 1000
+    assert total_ms < IMPORT_BUDGET_MS, f"import de {MODULES} : {total_ms:.0f} ms (budget {IMPORT_BUDGET_MS} ms)"
+
+
+def test_no_heavy_import():
+    _, heavy = run_importtime()
+    assert heavy == '', f"modules lourds importés au démarrage : {heavy}"
@@ -0,0 +1,258 @@
+"""
+Stockage des fichiers importés (page 1), adressé par le contenu.
+
+- Hash incrémental : chaque bloc envoyé par dash-uploader est ajouté au fichier assemblé
+  et au hash dès que les blocs précédents sont arrivés ; à la fin de l'envoi, le fichier
+  est complet et son hash connu, sans relecture.
+- Déduplication : un fichier est rangé sous `<hash>/<nom>` ; un contenu déjà présent n'est
+  pas stocké une seconde fois, et deux fichiers différents de même nom ne s'écrasent plus.
+- Reçus : `.receipts/<upload_id>/<nom>.json` donne le chemin et le hash du dernier fichier
+  importé sous ce nom par ce composant ; la tâche de fond (parse_upload) les lit au lieu de
+  recalculer le hash, et retrouve ainsi directement les tableaux du cache (mesh_cache) :
+  un fichier déjà importé n'est pas relu.
+- Quota : au-delà de NEUROMESH_UPLOAD_MAX_BYTES, les fichiers importés le moins récemment
+  sont supprimés (LRU sur la date de modification du répertoire).
+
+Les blocs sont écrits de façon atomique et conservés jusqu'à la fin de l'envoi : si les
+requêtes d'un même envoi sont servies par plusieurs workers, celui qui reçoit le dernier
+bloc relit simplement ceux qu'il n'a pas encore ajoutés.
+"""
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from flask import request
+from dash_uploader import HttpRequestHandler
+
+import mesh_cache
+
+UPLOAD_DIRECTORY = os.environ.get('NEUROMESH_UPLOAD_DIR', './uploaded_files')
+DEFAULT_MAX_BYTES = int(os.environ.get('NEUROMESH_UPLOAD_MAX_BYTES', 2 * 1024 ** 3))
+PARTS_DIRECTORY = '.parts'
+RECEIPTS_DIRECTORY = '.receipts'
+# Âge (s) au-delà duquel un envoi interrompu ou un reçu est supprimé
+STALE_AGE = 24 * 3600
+
+
+def safe_name(name):
+    """Nom de fichier sans composante de chemin (les noms viennent du navigateur)."""
+    name = os.path.basename(name or '')
+    return name if name not in ('', '.', '..') else 'upload'
+
+
+class UploadStore:
+    """
+    Fichiers importés, un répertoire `<hash>/` par contenu.
+
+    :param directory: Répertoire des fichiers importés.
+    :param max_bytes: Taille totale maximale des fichiers importés.
+    """
+
+    def __init__(self, directory=UPLOAD_DIRECTORY, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def parts_directory(self, upload_id, identifier):
+        """Répertoire des blocs d'un envoi en cours."""
+        return os.path.join(self.directory, PARTS_DIRECTORY, f'{safe_name(upload_id)}_{safe_name(identifier)}')
+
+    def _receipt_path(self, upload_id, file_name):
+        return os.path.join(self.directory, RECEIPTS_DIRECTORY, safe_name(upload_id), f'{safe_name(file_name)}.json')
+
+    @staticmethod
+    def _entry_file(entry):
+        """Fichier contenu dans le répertoire `entry`, ou None s'il n'existe pas."""
+        try:
+            names = os.listdir(entry)
+        except OSError:
+            return None
+        return os.path.join(entry, names[0]) if names else None
+
+    def add(self, data_path, key, file_name):
+        """
+        Ranger un fichier assemblé sous son hash (il est déplacé, ou supprimé s'il est déjà présent).
+
+        :return: Chemin du fichier stocké.
+        """
+        entry = os.path.join(self.directory, key)
+        existing = self._entry_file(entry)
+        if existing is None:
+            staging = tempfile.mkdtemp(prefix='.tmp-', dir=self.directory)
+            os.replace(data_path, os.path.join(staging, safe_name(file_name)))
+            try:
+                os.rename(staging, entry)
+            except OSError:
+                # Même contenu rangé entre-temps par un autre processus
+                shutil.rmtree(staging, ignore_errors=True)
+            existing = self._entry_file(entry)
+        else:
+            os.remove(data_path)
+        os.utime(entry)  # Marquer l'entrée comme récemment importée
+        return existing
+
+    def write_receipt(self, upload_id, file_name, key, path):
+        """Enregistrer le résultat d'un envoi (écriture atomique)."""
+        receipt = self._receipt_path(upload_id, file_name)
+        os.makedirs(os.path.dirname(receipt), exist_ok=True)
+        tmp = f'{receipt}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as file:
+            json.dump({'key': key, 'path': path}, file)
+        os.replace(tmp, receipt)
+
+    def receipt(self, upload_id, file_name):
+        """
+        Résultat du dernier envoi de `file_name` par le composant `upload_id`.
+
+        :return: Dict {'key', 'path'}, ou None si le reçu ou le fichier n'existe plus.
+        """
+        try:
+            with open(self._receipt_path(upload_id, file_name), 'r') as file:
+                receipt = json.load(file)
+        except (OSError, ValueError):
+            return None
+        return receipt if os.path.exists(receipt['path']) else None
+
+    def list_files(self):
+        """Chemins des fichiers importés, triés par nom."""
+        paths = []
+        for entry in os.scandir(self.directory):
+            if entry.is_dir() and not entry.name.startswith('.'):
+                path = self._entry_file(entry.path)
+                if path is not None:
+                    paths.append(path)
+        return sorted(paths, key=os.path.basename)
+
+    def _prune(self, directory, max_age):
+        """Supprimer les sous-répertoires de `directory` inchangés depuis `max_age` secondes."""
+        limit = time.time() - max_age
+        try:
+            entries = list(os.scandir(directory))
+        except OSError:
+            return
+        for entry in entries:
+            if entry.is_dir() and entry.stat().st_mtime < limit:
+                shutil.rmtree(entry.path, ignore_errors=True)
+
+    def evict(self, keep=None):
+        """
+        Supprimer les fichiers importés le moins récemment au-delà de max_bytes,
+        ainsi que les envois interrompus et les reçus anciens.
+
+        :param keep: Hash à ne jamais supprimer (le fichier qui vient d'être importé).
+        """
+        with self._lock:
+            entries = []
+            total = 0
+            for entry in os.scandir(self.directory):
+                if not entry.is_dir() or entry.name.startswith('.'):
+                    continue
+                size = sum(f.stat().st_size for f in os.scandir(entry.path) if f.is_file())
+                total += size
+                if entry.name != keep:
+                    entries.append((entry.stat().st_mtime, size, entry.path))
+
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(path, ignore_errors=True)
+                total -= size
+
+            self._prune(os.path.join(self.directory, PARTS_DIRECTORY), STALE_AGE)
+            self._prune(os.path.join(self.directory, RECEIPTS_DIRECTORY), STALE_AGE)
+
+
+_default_store = None
+
+
+def get_store():
+    """Retourne le stockage partagé (créé au premier appel)."""
+    global _default_store
+    if _default_store is None:
+        _default_store = UploadStore()
+    return _default_store
+
+
+class PartialUpload:
+    """Envoi en cours : fichier assemblé et hash des blocs déjà ajoutés, dans l'ordre."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.data_path = os.path.join(directory, f'data-{os.getpid()}')
+        self.digest = mesh_cache.new_digest()
+        self.next_chunk = 1
+        self.done = False
+        self.lock = threading.Lock()
+
+    def chunk_path(self, number):
+        return os.path.join(self.directory, f'{number:06d}.part')
+
+    def advance(self, total_chunks):
+        """
+        Ajouter au fichier assemblé les blocs arrivés à la suite des précédents.
+
+        :return: True si tous les blocs ont été ajoutés.
+        """
+        with open(self.data_path, 'ab') as target:
+            while self.next_chunk <= total_chunks:
+                try:
+                    with open(self.chunk_path(self.next_chunk), 'rb') as file:
+                        data = file.read()
+                except FileNotFoundError:
+                    break
+                self.digest.update(data)
+                target.write(data)
+                self.next_chunk += 1
+        return self.next_chunk > total_chunks
+
+
+class UploadHandler(HttpRequestHandler):
+    """Réception des blocs de dash-uploader vers le stockage adressé par contenu (voir UploadStore)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.store = get_store()
+        # Répertoire des blocs -> PartialUpload, pour les envois reçus par ce processus
+        self._uploads = {}
+        self._lock = threading.Lock()
+
+    def _post(self):
+        total_chunks = request.form.get('resumableTotalChunks', type=int)
+        chunk_number = request.form.get('resumableChunkNumber', default=1, type=int)
+        file_name = safe_name(request.form.get('resumableFilename', default='', type=str))
+        identifier = request.form.get('resumableIdentifier', default='', type=str)
+        upload_id = request.form.get('upload_id', default='', type=str)
+
+        directory = self.store.parts_directory(upload_id, identifier)
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            upload = self._uploads.get(directory)
+            if upload is None:
+                # Oublier les envois terminés par un autre processus
+                for stale in [d for d in self._uploads if not os.path.isdir(d)]:
+                    del self._uploads[stale]
+                upload = self._uploads[directory] = PartialUpload(directory)
+
+        # Écriture atomique : un bloc visible est toujours complet
+        chunk_path = upload.chunk_path(chunk_number)
+        request.files['file'].save(f'{chunk_path}.{os.getpid()}.tmp')
+        os.replace(f'{chunk_path}.{os.getpid()}.tmp', chunk_path)
+
+        with upload.lock:
+            if upload.done or not upload.advance(total_chunks):
+                return file_name
+            upload.done = True
+        with self._lock:
+            self._uploads.pop(directory, None)
+
+        key = upload.digest.hexdigest()
+        path = self.store.add(upload.data_path, key, file_name)
+        self.store.write_receipt(upload_id, file_name, key, path)
+        shutil.rmtree(directory, ignore_errors=True)
+        mesh_cache.get_cache().remember(path, key)
+        self.store.evict(keep=key)
+        return file_name